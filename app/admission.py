@@ -0,0 +1,80 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+from app.metrics import COALESCED, LLM_INFLIGHT
+
+T = TypeVar("T")
+
+class Overloaded(Exception):
+    """Admission control refused the work: all slots busy and the wait queue full"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Service is overloaded")
+        self.retry_after = retry_after
+
+
+class SingleFlight:
+    """Coalesces identical in-flight calls: concurrent callers with the same key share one execution
+
+    The call runs as its own task, so a caller that disconnects (is cancelled)
+    does not cancel the work for the others. Keys are dropped as soon as the
+    call finishes; nothing is cached beyond that.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            COALESCED.inc(stage=self.stage)
+        return await asyncio.shield(task)
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded wait queue
+
+    At most `max_concurrent` holders at a time and at most `max_queue` waiting;
+    further callers are refused immediately with Overloaded instead of piling up.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, retry_after: int = 1):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        # Created lazily so it binds to the server's event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise Overloaded(self.retry_after)
+
+        self.waiting += 1
+        LLM_INFLIGHT.inc(state="waiting")
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            LLM_INFLIGHT.dec(state="waiting")
+
+        self.active += 1
+        LLM_INFLIGHT.inc(state="active")
+        try:
+            yield
+        finally:
+            self.active -= 1
+            LLM_INFLIGHT.dec(state="active")
+            self._semaphore.release()
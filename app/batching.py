@@ -0,0 +1,91 @@
+import asyncio
+import contextvars
+import time
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Set, TypeVar
+from app.metrics import add_request_timings, record_stage, start_request
+
+J = TypeVar("J")
+R = TypeVar("R")
+
+class _Pending:
+    __slots__ = ("job", "future", "enqueued", "started", "timings")
+
+    def __init__(self, job, future: asyncio.Future):
+        self.job = job
+        self.future = future
+        self.enqueued = time.perf_counter()
+        self.started: Optional[float] = None
+        self.timings: Optional[Dict[str, float]] = None
+
+
+class MicroBatcher(Generic[J, R]):
+    """Collects concurrent jobs and runs them together
+
+    Jobs submitted within `window` seconds of the first pending one (or until
+    `max_jobs` are pending) go to one `run_batch` call, which returns one result
+    per job, in order; an exception instance in that list fails only its job, and
+    jobs left without a result (a short list) fail with a RuntimeError.
+    A caller that gives up (is cancelled) does not affect the other jobs.
+
+    Each batch runs in a fresh context, so the stages it times belong to no
+    single request; every job's request then gets the batch's stage timings
+    once, plus its wait for the batch to start as `queue_stage`.
+    """
+
+    def __init__(self, run_batch: Callable[[List[J]], Awaitable[List[R]]], window: float, max_jobs: int,
+                 queue_stage: str = "batch_queue"):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_jobs = max_jobs
+        self.queue_stage = queue_stage
+        self._pending: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()  # Strong references until each batch finishes
+
+    async def submit(self, job: J) -> R:
+        loop = asyncio.get_running_loop()
+        pending = _Pending(job, loop.create_future())
+        self._pending.append(pending)
+        if len(self._pending) >= self.max_jobs:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        try:
+            return await pending.future
+        finally:
+            if pending.started is not None:
+                record_stage(self.queue_stage, pending.started - pending.enqueued)
+            if pending.timings is not None:
+                add_request_timings(pending.timings)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # A task copies the context it is created in: start it from an empty one
+            task = contextvars.Context().run(asyncio.ensure_future, self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[_Pending]):
+        timings = start_request()
+        started = time.perf_counter()
+        for pending in batch:
+            pending.started = started
+        try:
+            results = list(await self.run_batch([pending.job for pending in batch]))
+        except Exception as e:
+            results = [e] * len(batch)
+        if len(results) != len(batch):
+            mismatch = RuntimeError(f"Batch returned {len(results)} results for {len(batch)} jobs")
+            results = results[:len(batch)] + [mismatch] * (len(batch) - len(results))
+        for pending, result in zip(batch, results):
+            pending.timings = timings
+            if pending.future.done():
+                continue
+            if isinstance(result, BaseException):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
@@ -0,0 +1,121 @@
+"""Benchmark vector search backends: Chroma HNSW vs exact NumPy search
+
+Catalog embeddings come from the configured collection; --synthetic N grows
+the catalog to N rows by jittering those vectors so larger scales can be measured.
+
+Usage:
+    python -m app.benchmark [--synthetic 50000] [--queries 200] [--top-k 10] [--output results.json]
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+import chromadb
+import numpy as np
+from app.config import settings
+from app.database import VectorDB, hnsw_metadata, load_hnsw_params
+from app.numpy_index import DTYPES, NumpyIndex
+
+def jitter(base: np.ndarray, n: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """Sample n unit vectors around random rows of base"""
+    rows = base[rng.integers(len(base), size=n)] + noise * rng.standard_normal((n, base.shape[1]))
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+def recall_at_k(predicted: List[List[str]], expected: List[List[str]]) -> float:
+    hits = [len(set(p) & set(e)) / len(e) for p, e in zip(predicted, expected) if e]
+    return float(np.mean(hits)) if hits else 0.0
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    ms = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+def build_chroma(ids: List[str], embeddings: np.ndarray, metadata: dict):
+    client = chromadb.EphemeralClient()
+    name = f"benchmark_{time.time_ns()}"
+    collection = client.create_collection(name=name, embedding_function=None, metadata=metadata)
+    batch_size = client.get_max_batch_size()
+    for start in range(0, len(ids), batch_size):
+        collection.add(ids=ids[start:start + batch_size], embeddings=embeddings[start:start + batch_size])
+    return collection
+
+def run(catalog: np.ndarray, queries: np.ndarray, top_k: int, dtypes: List[str]) -> dict:
+    ids = [f"doc{i}" for i in range(len(catalog))]
+    results = {"catalog_size": len(ids), "queries": len(queries), "top_k": top_k, "backends": {}}
+
+    exact = NumpyIndex("float32").build(ids, catalog)
+    expected = [[doc_id for doc_id, _ in ranked] for ranked in exact.search(queries, top_k)]
+
+    started = time.perf_counter()
+    collection = build_chroma(ids, catalog, hnsw_metadata(load_hnsw_params(settings)))
+    build_seconds = time.perf_counter() - started
+    latencies, predicted = [], []
+    for query in queries:
+        started = time.perf_counter()
+        found = collection.query(query_embeddings=[query], n_results=top_k, include=["distances"])
+        latencies.append(time.perf_counter() - started)
+        predicted.append(found["ids"][0])
+    results["backends"]["chroma_hnsw"] = {
+        "build_seconds": round(build_seconds, 3),
+        f"recall@{top_k}": round(recall_at_k(predicted, expected), 4),
+        **latency_summary(latencies),
+    }
+
+    for dtype in dtypes:
+        started = time.perf_counter()
+        index = NumpyIndex(dtype).build(ids, catalog)
+        build_seconds = time.perf_counter() - started
+        latencies, predicted = [], []
+        for query in queries:
+            started = time.perf_counter()
+            ranked = index.search(query[None, :], top_k)[0]
+            latencies.append(time.perf_counter() - started)
+            predicted.append([doc_id for doc_id, _ in ranked])
+
+        # Whole query set as one matrix-matrix product
+        started = time.perf_counter()
+        index.search(queries, top_k)
+        batch_seconds = time.perf_counter() - started
+
+        results["backends"][f"numpy_{dtype}"] = {
+            "build_seconds": round(build_seconds, 3),
+            "index_mb": round(index.nbytes / 1024 / 1024, 2),
+            f"recall@{top_k}": round(recall_at_k(predicted, expected), 4),
+            **latency_summary(latencies),
+            "batch_queries_per_second": round(len(queries) / batch_seconds, 1),
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma HNSW against exact NumPy search")
+    parser.add_argument("--synthetic", type=int, default=0, help="Grow the catalog to N jittered rows")
+    parser.add_argument("--queries", type=int, default=200, help="Number of synthetic query vectors")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.05, help="Jitter applied to synthetic rows and queries")
+    parser.add_argument("--dtypes", nargs="+", default=list(DTYPES), choices=DTYPES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    stored = VectorDB().collection.get(include=["embeddings"])
+    catalog = np.asarray(stored["embeddings"], dtype=np.float32)
+    if args.synthetic > len(catalog):
+        catalog = np.vstack([catalog, jitter(catalog, args.synthetic - len(catalog), args.noise, rng)])
+    queries = jitter(catalog, args.queries, args.noise, rng)
+
+    results = run(catalog, queries, args.top_k, args.dtypes)
+    print(f"Catalog: {results['catalog_size']} rows, {results['queries']} queries, top_k={results['top_k']}")
+    for name, stats in results["backends"].items():
+        print(f"  {name:<14} " + "  ".join(f"{key}={value}" for key, value in stats.items()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
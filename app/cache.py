@@ -0,0 +1,202 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different inputs share cache entries"""
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional TTL and memory bound
+
+    Entries are evicted least-recently-used first when either `maxsize`
+    entries or `max_bytes` (as measured by `sizeof`) would be exceeded.
+    Hit/miss/eviction counters are kept for monitoring.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # Never cache an entry larger than the whole budget
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self.current_bytes += size
+            while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self.current_bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._data.pop(key)
+        self.current_bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SQLiteCache:
+    """Persistent JSON key/value cache backed by SQLite
+
+    Survives restarts and is safe to share between uvicorn worker processes
+    (WAL journal, busy timeout). Entries expire after `ttl` seconds and the
+    least recently accessed ones are evicted once `max_entries` is exceeded.
+    Counters are per process.
+    """
+
+    _EVICT_EVERY = 100  # Check the size cap every N writes
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: int = 50000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return default
+                value, created_at = row
+                if self.ttl and created_at + self.ttl < now:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self.expirations += 1
+                    self.misses += 1
+                    return default
+                self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self.hits += 1
+            return json.loads(value)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache read failed: {str(e)}")
+            self.misses += 1
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now)
+                )
+                self._writes += 1
+                if self._writes % self._EVICT_EVERY == 0:
+                    self._evict(now)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed: {str(e)}")
+
+    def _evict(self, now: float) -> None:
+        if self.ttl:
+            cursor = self._conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl,))
+            self.expirations += max(cursor.rowcount, 0)
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self.max_entries:
+            cursor = self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,108 @@
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+import re
+
+AGGREGATIONS = ("max", "mean", "weighted")
+
+# Headings that open the part of a job description listing what the candidate needs
+_REQUIREMENTS_HEADING_RE = re.compile(
+    r"^\W*(requirements?|qualifications?|(key |technical |required |core )?skills|"
+    r"what you('ll| will) (need|bring)|must[- ]haves?|who you are|about you|you have|"
+    r"experience|competencies)\b",
+    re.IGNORECASE
+)
+# Any other heading ends the section
+_OTHER_HEADING_RE = re.compile(
+    r"^\W*(responsibilities|duties|what you('ll| will) do|the role|about (us|the company|the team)|"
+    r"benefits|perks|what we offer|compensation|salary|how to apply|location)\b",
+    re.IGNORECASE
+)
+_MAX_HEADING_CHARS = 60
+
+def _is_heading(line: str) -> bool:
+    if len(line) > _MAX_HEADING_CHARS or line[0] in "-*•·" or line.endswith("."):
+        return False
+    return line.endswith(":") or line.isupper() or len(line.split()) <= 4
+
+def extract_requirements(text: str) -> Tuple[str, str]:
+    """
+    Split a job description into its requirements/skills section and the rest
+
+    Returns:
+        (requirements, rest); requirements is empty when no such heading is found
+    """
+    requirements, rest = [], []
+    in_section = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped and _is_heading(stripped):
+            if _REQUIREMENTS_HEADING_RE.match(stripped):
+                if not in_section:
+                    in_section = True
+                    continue
+            if _OTHER_HEADING_RE.match(stripped) or stripped.endswith(":"):
+                in_section = False
+        (requirements if in_section else rest).append(line)
+    return "\n".join(requirements).strip(), "\n".join(rest).strip()
+
+def chunk_words(text: str, max_words: int, overlap: int) -> List[str]:
+    """Overlapping windows of at most max_words words"""
+    words = text.split()
+    if len(words) <= max_words:
+        return [" ".join(words)] if words else []
+    step = max(1, max_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
+
+def split_query(text: str, max_words: int, overlap: int, extract: bool = False,
+                requirements_weight: float = 1.0) -> List[Tuple[str, float]]:
+    """
+    Split a query into (chunk, weight) pairs that each fit the embedding model's window
+
+    Short queries come back as a single chunk. With `extract`, chunks of the
+    requirements/skills section come first and carry `requirements_weight`.
+    """
+    if extract:
+        requirements, rest = extract_requirements(text)
+        if requirements:
+            return (
+                [(chunk, requirements_weight) for chunk in chunk_words(requirements, max_words, overlap)] +
+                [(chunk, 1.0) for chunk in chunk_words(rest, max_words, overlap)]
+            )
+    return [(chunk, 1.0) for chunk in chunk_words(text, max_words, overlap)] or [(text, 1.0)]
+
+def aggregate_rankings(rankings: Sequence[Sequence[Tuple[str, float]]], weights: Sequence[float],
+                       mode: str = "max") -> Tuple[Tuple[str, float], ...]:
+    """
+    Merge per-chunk (id, similarity) rankings into one ranking for the whole query
+
+    Args:
+        rankings: One ranking per chunk
+        weights: Weight per chunk
+        mode: "max" (best chunk), "mean" (average over chunks, missing = 0)
+            or "weighted" (weighted average over chunks, missing = 0)
+
+    Returns:
+        (id, score) pairs, best first
+    """
+    if mode not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation {mode}, expected one of {AGGREGATIONS}")
+    if len(rankings) == 1:
+        return tuple(rankings[0])
+
+    weights = [1.0] * len(rankings) if mode == "mean" else [float(weight) for weight in weights]
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for doc_id, score in ranking:
+            if mode == "max":
+                scores[doc_id] = max(scores[doc_id], score)
+            else:
+                scores[doc_id] += weight * score
+    if mode != "max":
+        total = sum(weights)
+        scores = {doc_id: score / total for doc_id, score in scores.items()}
+    return tuple(sorted(scores.items(), key=lambda item: item[1], reverse=True))
@@ -1,9 +1,171 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Optional
 
 class Settings(BaseSettings):
-    gemini_api_key: str
+    gemini_api_key: Optional[str] = None  # Only required for the Gemini reranker
     chroma_db_path: str = str(Path(__file__).parent.parent / "chroma_db")
+
+    # Embedding backend: "sentence-transformers" (torch) or "onnx" (onnxruntime, faster cold start)
+    embedding_backend: str = "sentence-transformers"
+    embedding_model: str = "all-MiniLM-L6-v2"
+
+    # Vector search backend: "chroma" (persistent HNSW) or "numpy" (exact in-memory matmul
+    # over embeddings loaded from the collection; dtype float32, float16 or int8)
+    search_backend: str = "chroma"
+    numpy_index_dtype: str = "float32"
+
+    # Multi-process serving (python -m app.serve): the parent syncs Chroma and exports a
+    # memory-mapped catalog snapshot; forked workers serve it read-only without opening Chroma
+    serve_from_snapshot: bool = False
+    snapshot_path: str = str(Path(__file__).parent.parent / "cache" / "catalog_snapshot")
+    worker_threads: int = 1  # torch intra-op threads per worker
+
+    # Per-stage latency histograms and counters at GET /metrics, echoed as Server-Timing headers
+    metrics_enabled: bool = True
+
+    # Startup: models load in the lifespan hook; in the background (GET /ready reports
+    # when done) unless background_startup is off. The warmup query primes the search path.
+    background_startup: bool = True
+    # A failed load is retried with backoff; after the last attempt the process exits
+    startup_attempts: int = 3
+    startup_retry_base_delay: float = 1.0
+    startup_retry_max_delay: float = 30.0
+    warmup_query: Optional[str] = "cognitive test for software engineers"
+
+    # Catalog sync on startup: "incremental" (embed only new/changed assessments),
+    # "if_empty" (load only into an empty collection) or "off". if_empty by default so the
+    # checked-in chroma_db/ is not rewritten on first boot (see "Catalog Sync" in the README)
+    catalog_sync: str = "if_empty"
+    sync_batch_size: int = 256
+
+    # Second-stage reranker: "gemini" (network), "cross-encoder" (local, offline),
+    # "stub" (deterministic term-overlap stand-in with a fixed latency, for benchmarks) or
+    # "fake-gemini" (the Gemini path against a local fake model with injected latency/failures)
+    reranker: str = "gemini"
+    cross_encoder_model: str = "cross-encoder/ms-marco-MiniLM-L6-v2"
+    cross_encoder_device: str = "cpu"
+    cross_encoder_batch_size: int = 32
+    stub_rerank_latency_ms: float = 0.0
+    fake_llm_latency_ms: float = 800
+    fake_llm_error_rate: float = 0.0
+    fake_llm_hang_rate: float = 0.0
+
+    # Async request path: embedding/ANN search runs on a bounded thread pool,
+    # Gemini calls go through the async client. Each stage has its own limit.
+    search_workers: int = 4
+    search_concurrency: int = 16
+    llm_concurrency: int = 8
+    batch_max_queries: int = 500
+    # Load shedding: identical in-flight searches/reranks are coalesced; beyond llm_concurrency
+    # running and llm_max_queue waiting reranks, requests get vector-only results ("degrade")
+    # or 429 with Retry-After ("reject")
+    coalesce_requests: bool = True
+    llm_max_queue: int = 32
+    overload_policy: str = "degrade"
+    overload_retry_after: int = 2
+    # Batch reranks skip admission control: they queue for their own batch_llm_concurrency
+    # slots and are never shed or cut short by the default latency budget
+    batch_llm_concurrency: int = 4
+
+    # Rerank deadlines: once latency_budget_ms (from the start of the search; 0 = none,
+    # Query.latency_budget_ms overrides it) has passed, the vector search results are returned.
+    # Each Gemini attempt times out after llm_timeout seconds; transient errors are retried
+    # with jittered exponential backoff; with llm_hedging, an attempt still running after the
+    # recent llm_hedge_quantile latency gets a second, competing request.
+    latency_budget_ms: float = 10000
+    llm_timeout: float = 15.0
+    llm_max_retries: int = 2
+    llm_retry_base_delay: float = 0.2
+    llm_retry_max_delay: float = 2.0
+    llm_hedging: bool = False
+    llm_hedge_quantile: float = 0.95
+    llm_hedge_min_delay: float = 0.2
+    # Micro-batching: concurrent Gemini reranks arriving within llm_batch_window_ms of each other
+    # (up to llm_batch_max_jobs) share one prompt; jobs missing from the combined reply run alone
+    llm_batching: bool = False
+    llm_batch_window_ms: float = 10
+    llm_batch_max_jobs: int = 8
+    # Circuit breaker: Gemini is skipped for llm_breaker_cooldown seconds once llm_breaker_failure_ratio
+    # of the last llm_breaker_window calls (at least llm_breaker_min_calls) failed, then probed
+    llm_breaker_window: int = 20
+    llm_breaker_failure_ratio: float = 0.5
+    llm_breaker_min_calls: int = 10
+    llm_breaker_cooldown: float = 30.0
+
+    # Chroma HNSW index: hnsw_m and hnsw_construction_ef apply when the collection is created,
+    # hnsw_search_ef on startup. python -m app.hnsw_tuning writes measured values to
+    # hnsw_params_path, which override these when present. Query.search_ef widens single requests
+    hnsw_m: int = 16
+    hnsw_construction_ef: int = 100
+    hnsw_search_ef: int = 10
+    hnsw_num_threads: int = 4
+    hnsw_params_path: str = str(Path(__file__).parent.parent / "cache" / "hnsw_params.json")
+
+    # Query caches in VectorDB.search (query text -> embedding, embedding -> ranked ids)
+    embedding_cache_size: int = 10000
+    embedding_cache_max_mb: float = 64
+    result_cache_size: int = 10000
+    result_cache_ttl: float = 3600
+
+    # Hybrid retrieval: BM25 over the document text fused with ANN results (reciprocal rank fusion)
+    hybrid_search: bool = True
+    rrf_k: int = 60
+    vector_weight: float = 1.0
+    lexical_weight: float = 1.0
+    # Long queries: split into overlapping word windows that fit the embedding model
+    # (~256 wordpieces for all-MiniLM-L6-v2), searched together and merged per assessment
+    # with "max", "mean" or "weighted" (requirements-section chunks count
+    # query_requirements_weight times; needs query_extract_requirements)
+    query_chunking: bool = True
+    query_chunk_words: int = 150
+    query_chunk_overlap: int = 30
+    query_chunk_aggregation: str = "max"
+    query_extract_requirements: bool = False
+    query_requirements_weight: float = 2.0
+
+    # Candidates passed to the reranker: min(max_candidates, candidate_multiplier * top_k), at least top_k.
+    # Rerankers return the top_k best of the candidates they are given.
+    candidate_multiplier: float = Field(2.0, ge=1.0)
+    max_candidates: int = 20
+
+    # Confidence-gated reranking (see app.routing): skip the reranker when the first-stage
+    # ranking is decisive, or with rerank_gate_shrink rerank only what follows a decisive head.
+    # Thresholds come from rerank_gate_path when it exists (python -m app.routing), else below
+    rerank_gate: bool = False
+    rerank_gate_path: str = str(Path(__file__).parent.parent / "cache" / "rerank_gate.json")
+    rerank_gate_min_margin: float = 0.04
+    rerank_gate_max_entropy: float = 0.5
+    rerank_gate_max_query_words: int = 12
+    rerank_gate_shrink: bool = True
+
+    # Approximate prompt size for Gemini reranks; candidate descriptions are trimmed to fit
+    rerank_token_budget: int = 1200
+
+    # Job posting URLs (Query.url): pooled async fetching with per-host limits and a size cap.
+    # Extracted text is cached with its ETag/Last-Modified; after fetch_cache_max_age seconds
+    # the page is revalidated with a conditional request.
+    fetch_timeout: float = 10
+    fetch_max_bytes: int = 2 * 1024 * 1024
+    fetch_max_connections: int = 32
+    fetch_per_host: int = 4
+    fetch_max_text_chars: int = 8000
+    fetch_cache_enabled: bool = True
+    fetch_cache_path: str = str(Path(__file__).parent.parent / "cache" / "page_cache.sqlite3")
+    fetch_cache_max_age: float = 3600
+    fetch_cache_ttl: float = 7 * 24 * 3600
+    # Posting URLs (and every redirect hop) resolving to loopback, private, link-local or other
+    # non-public addresses are refused; fetch_allowed_hosts lists exceptions, comma-separated
+    # (e.g. "localhost" for local testing)
+    fetch_max_redirects: int = 5
+    fetch_allowed_hosts: str = ""
+
+    # Persistent Gemini rerank cache shared by all workers
+    rerank_cache_enabled: bool = True
+    rerank_cache_path: str = str(Path(__file__).parent.parent / "cache" / "rerank_cache.sqlite3")
+    rerank_cache_ttl: float = 7 * 24 * 3600
+    rerank_cache_max_entries: int = 50000
     
     class Config:
         env_file = Path(__file__).parent.parent / ".env"
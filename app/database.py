@@ -1,7 +1,20 @@
 import chromadb
-from chromadb.utils import embedding_functions
-from typing import List
-from app.models import Assessment
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from app.models import Assessment, QueryFilters
+from app.filters import build_where, filter_fields, filter_mask, filters_key, matches_filters
+from app.numpy_index import NumpyIndex
+from app.snapshot import lexical_index, load_snapshot
+from collections import defaultdict
+from app.cache import LRUCache, normalize_query
+from app.chunking import aggregate_rankings, split_query
+from app.embeddings import collection_name, create_embedding_function
+from app.lexical import BM25Index, reciprocal_rank_fusion
+from app.metrics import record_cache, stage
+from app.serialization import with_json_prefix
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import numpy as np
+import hashlib
 import json
 import os
 from pathlib import Path
@@ -10,141 +23,571 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+def load_hnsw_params(settings) -> dict:
+    """HNSW parameters from the tuning file (see app.hnsw_tuning) when it exists, else from settings"""
+    params = {
+        "m": settings.hnsw_m,
+        "construction_ef": settings.hnsw_construction_ef,
+        "search_ef": settings.hnsw_search_ef,
+        "num_threads": settings.hnsw_num_threads,
+    }
+    path = Path(settings.hnsw_params_path)
+    if path.exists():
+        tuned = json.loads(path.read_text())
+        params.update({key: tuned[key] for key in params if key in tuned})
+        logger.info(f"Loaded HNSW parameters from {path}: {params}")
+    return params
+
+def hnsw_metadata(params: dict) -> dict:
+    """Chroma collection metadata for the given HNSW parameters"""
+    return {
+        "hnsw:space": "cosine",
+        "hnsw:construction_ef": params["construction_ef"],
+        "hnsw:M": params["m"],
+        "hnsw:search_ef": params["search_ef"],
+        "hnsw:num_threads": params["num_threads"],
+        "hnsw:resize_factor": 1.2,
+        "hnsw:batch_size": 100,
+        "hnsw:sync_threshold": 1000
+    }
+
 class VectorDB:
     """ChromaDB wrapper for storing and retrieving SHL assessment embeddings"""
     
-    def __init__(self):
-        self.client = chromadb.PersistentClient(path=settings.chroma_db_path)
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
+    def __init__(self, sync: Optional[str] = None, snapshot_path: Optional[str] = None):
+        self.embedding_function = create_embedding_function(
+            settings.embedding_backend,
+            model_name=settings.embedding_model
         )
+        
+        # Query caches: normalized text -> embedding, (catalog, embedding, top_k) -> ranked ids
+        self.embedding_cache = LRUCache(
+            maxsize=settings.embedding_cache_size,
+            max_bytes=int(settings.embedding_cache_max_mb * 1024 * 1024),
+            sizeof=lambda embedding: embedding.nbytes
+        )
+        self.result_cache = LRUCache(
+            maxsize=settings.result_cache_size,
+            ttl=settings.result_cache_ttl
+        )
+        self._assessments_by_id: Dict[str, Assessment] = {}  # Immutable catalog records, score unset
+        self._filter_fields_by_id: Dict[str, dict] = {}  # Typed filter fields, for the lexical path
+        # False for stores synced before filter support: their metadata lacks the typed
+        # fields, so filters run in Python instead of as a Chroma `where` clause
+        self._stored_filter_fields = True
+        self.catalog_version = None
+        
+        # Lexical (BM25) index over the same document text, queried alongside the ANN search
+        self.lexical_index = BM25Index()
+        self._lexical_documents: Dict[str, str] = {}
+        self._lexical_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lexical-search")
+        
+        if snapshot_path is not None:
+            # Read-only serving worker: catalog from a memory-mapped snapshot, no Chroma client
+            self.client = self.collection = None
+            self._load_snapshot(snapshot_path)
+            return
+        
+        self.client = chromadb.PersistentClient(path=settings.chroma_db_path)
+        self.hnsw_params = load_hnsw_params(settings)
         self.collection = self.client.get_or_create_collection(
-            name="shl_assessments",
+            name=collection_name(settings.embedding_backend),
             embedding_function=self.embedding_function,
-            metadata={
-                "hnsw:space": "cosine",
-                "hnsw:construction_ef": 100,
-                "hnsw:M": 16,
-                "hnsw:search_ef": 10,
-                "hnsw:num_threads": 4,
-                "hnsw:resize_factor": 1.2,
-                "hnsw:batch_size": 100,
-                "hnsw:sync_threshold": 1000
-            }  # Using cosine similarity
+            metadata=hnsw_metadata(self.hnsw_params)  # Using cosine similarity
         )
+        self._apply_hnsw_params()
         
-        # Initialize with data if empty
-        if self.collection.count() == 0:
+        # Optional exact in-memory backend, rebuilt from the collection whenever the catalog changes
+        self.numpy_index = NumpyIndex(settings.numpy_index_dtype) if settings.search_backend == "numpy" else None
+        
+        # Bring the collection in line with the catalog file (see Settings.catalog_sync)
+        sync_mode = sync or settings.catalog_sync
+        if sync_mode == "incremental" or (sync_mode == "if_empty" and self.collection.count() == 0):
             self._initialize_data()
+        else:
+            self._refresh_catalog()
 
-    def _initialize_data(self):
-        """Load initial SHL assessments data into ChromaDB with list support"""
-        try:
-            data_path = Path(__file__).parent.parent / "data" / "shl_assessments.json"
-            with open(data_path, "r") as f:
-                assessments = json.load(f)
-            
-            if not assessments:
-                raise ValueError("No assessments found in the data file")
-            
-            ids = []
-            documents = []
-            metadatas = []
+    def _apply_hnsw_params(self):
+        """
+        Bring an existing collection's HNSW settings in line with hnsw_params
+        
+        get_or_create_collection keeps the configuration a collection was created
+        with. search_ef can be changed in place; M and construction_ef are fixed
+        once the graph is built, so a mismatch only warns (rebuild the collection
+        to apply them).
+        """
+        current = (self.collection.configuration_json or {}).get("hnsw") or {}
+        if current.get("ef_search") not in (None, self.hnsw_params["search_ef"]):
+            self.collection.modify(configuration={"hnsw": {"ef_search": self.hnsw_params["search_ef"]}})
+            logger.info(f"HNSW search_ef changed from {current['ef_search']} to {self.hnsw_params['search_ef']}")
+        built = {"m": current.get("max_neighbors"), "construction_ef": current.get("ef_construction")}
+        stale = {key: value for key, value in built.items() if value not in (None, self.hnsw_params[key])}
+        if stale:
+            logger.warning(
+                f"Collection was built with HNSW {stale}, configured {[(k, self.hnsw_params[k]) for k in stale]}; "
+                f"delete {settings.chroma_db_path} and resync to apply"
+            )
+
+    def _load_snapshot(self, snapshot_path: str):
+        """Serve an exported catalog snapshot (see app.snapshot) through the NumPy backend"""
+        snapshot = load_snapshot(snapshot_path)
+        self.numpy_index = snapshot.index
+        self._assessments_by_id = snapshot.mapping(lambda record: self._parse_metadata(record["metadata"]))
+        if settings.hybrid_search:
+            # Shared with the other workers when app.serve built it before forking
+            self.lexical_index = lexical_index(snapshot)
+        self.catalog_version = snapshot.version
+        logger.info(f"Loaded catalog snapshot {snapshot.version[:12]}: {len(snapshot)} rows, "
+                    f"{snapshot.index.nbytes / 1024 / 1024:.1f} MB memory-mapped")
+
+    def _refresh_catalog(self):
+        """Reload in-memory catalog state from the collection; result caches are dropped whenever it changed"""
+        include = ["documents", "metadatas"]
+        if self.numpy_index is not None:
+            include.append("embeddings")
+        stored = self.collection.get(include=include)
+        digest = hashlib.sha1()
+        for doc_id, document, metadata in sorted(zip(stored['ids'], stored['documents'], stored['metadatas']),
+                                                 key=lambda item: item[0]):
+            digest.update(doc_id.encode())
+            digest.update((metadata.get("content_hash") or document).encode())
+        version = digest.hexdigest()
+        
+        if version != self.catalog_version:
+            self.invalidate_cache()
+            self._load_catalog(stored)
+            self.catalog_version = version
+
+    def invalidate_cache(self):
+        """Drop cached search results (embeddings stay valid)"""
+        self.result_cache.clear()
+
+    def _load_catalog(self, stored: dict):
+        """Parse all stored assessments and bring the lexical index in line with the collection"""
+        assessments_by_id = {}
+        filter_fields_by_id = {}
+        stored_filter_fields = True
+        embeddings = stored.get('embeddings')
+        embedding_rows = []
+        for row, (doc_id, document, metadata) in enumerate(zip(stored['ids'], stored['documents'], stored['metadatas'])):
+            try:
+                assessments_by_id[doc_id] = self._parse_metadata(metadata)
+            except Exception as e:
+                logging.warning(f"Failed to parse assessment metadata: {str(e)}")
+                continue
             
-            for idx, assessment in enumerate(assessments):
-                # Serialize list fields to strings
-                test_type = assessment.get('test_type', [])
-                if isinstance(test_type, list):
-                    test_type = ",".join(test_type)  # Convert list to comma-separated string
-                elif not isinstance(test_type, str):
-                    test_type = str(test_type)
-                
-                # Prepare metadata with list support
-                metadata = {
-                    "url": assessment['url'],
-                    "name": assessment.get('name', ''),
-                    "adaptive_support": assessment['adaptive_support'],
-                    "description": assessment['description'],
-                    "duration": assessment['duration'],
-                    "remote_support": assessment['remote_support'],
-                    "test_type": test_type,  # Now stored as list
-                    "keywords": assessment.get('keywords', '')
-                }
-                
-                # Create document text for embedding
-                document_text = (
-                    f"SHL Assessment: {metadata['description']}\n"
-                    f"Name: {metadata['name']}\n"
-                    f"Types: {', '.join(test_type)}\n"
-                    f"Duration: {metadata['duration']}\n"
-                    f"Remote: {'Yes' if metadata['remote_support'] else 'No'}\n"
-                    f"Adaptive: {'Yes' if metadata['adaptive_support'] else 'No'}"
-                )
-                
-                ids.append(f"id{idx}")
-                documents.append(document_text)
-                metadatas.append(metadata)
+            # Collections created before filter support lack the typed fields; they are
+            # derived in memory only (python -m app.sync stores them)
+            fields = filter_fields(metadata)
+            if any(key not in metadata for key in fields):
+                stored_filter_fields = False
+            filter_fields_by_id[doc_id] = fields
+            embedding_rows.append(row)
             
-            # Batch add to ChromaDB
-            self.collection.add(
-                ids=ids,
-                documents=documents,
-                metadatas=metadatas
+            # Only re-index documents that are new or whose text changed
+            if self._lexical_documents.get(doc_id) != document:
+                self.lexical_index.add(doc_id, document)
+                self._lexical_documents[doc_id] = document
+        
+        for doc_id in set(self._lexical_documents) - set(assessments_by_id):
+            self.lexical_index.remove(doc_id)
+            del self._lexical_documents[doc_id]
+        self._assessments_by_id = assessments_by_id
+        self._filter_fields_by_id = filter_fields_by_id
+        if not stored_filter_fields and self._stored_filter_fields:
+            logger.warning("Stored assessments lack filter fields, filtering in Python; "
+                           "run python -m app.sync to store them")
+        self._stored_filter_fields = stored_filter_fields
+        
+        if self.numpy_index is not None and embeddings is not None:
+            self.numpy_index.build(
+                list(assessments_by_id),
+                np.asarray(embeddings, dtype=np.float32)[embedding_rows],
+                list(filter_fields_by_id.values())
             )
-            logger.info(f"Successfully loaded {len(assessments)} assessments into ChromaDB")
-            
+            logger.info(f"Built {self.numpy_index.dtype} NumPy index: {len(self.numpy_index)} rows, "
+                        f"{self.numpy_index.nbytes / 1024 / 1024:.1f} MB")
+
+    def _initialize_data(self):
+        """Sync the SHL assessments data file into ChromaDB"""
+        try:
+            stats = self.sync_catalog()
+            logger.info(f"Catalog in sync with ChromaDB: {stats}")
         except Exception as e:
             logger.error(f"Failed to initialize data: {str(e)}")
             raise
 
-    def _create_document_text(self, assessment: dict) -> str:
+    def sync_catalog(self, data_path: Optional[str] = None, batch_size: Optional[int] = None,
+                     progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """
+        Incrementally sync a catalog file into ChromaDB
+        
+        Documents are keyed by URL and carry a hash of their content, so only
+        new or changed assessments are embedded and upserted; assessments no
+        longer in the file are deleted.
+        
+        Args:
+            data_path: Catalog JSON file (defaults to data/shl_assessments.json)
+            batch_size: Documents embedded per encoder call / upsert
+            progress: Optional callback receiving (embedded so far, total to embed)
+            
+        Returns:
+            Counts of added, updated, deleted and unchanged assessments
+        """
+        if self.collection is None:
+            raise RuntimeError("Catalog snapshots are read-only; sync the collection with python -m app.sync")
+        data_path = data_path or Path(__file__).parent.parent / "data" / "shl_assessments.json"
+        batch_size = batch_size or settings.sync_batch_size
+        with open(data_path, "r") as f:
+            assessments = json.load(f)
+        
+        if not assessments:
+            raise ValueError("No assessments found in the data file")
+        
+        records = {}
+        for assessment in assessments:
+            doc_id, document_text, metadata = self._prepare_record(assessment)
+            records[doc_id] = (document_text, metadata)  # Duplicate URLs: last entry wins
+        
+        stored = self.collection.get(include=["metadatas"])
+        stored_hashes = {
+            doc_id: metadata.get("content_hash")
+            for doc_id, metadata in zip(stored['ids'], stored['metadatas'])
+        }
+        to_delete = [doc_id for doc_id in stored_hashes if doc_id not in records]
+        to_upsert = [
+            doc_id for doc_id, (_, metadata) in records.items()
+            if stored_hashes.get(doc_id) != metadata["content_hash"]
+        ]
+        
+        for start in range(0, len(to_delete), batch_size):
+            self.collection.delete(ids=to_delete[start:start + batch_size])
+        
+        for start in range(0, len(to_upsert), batch_size):
+            batch_ids = to_upsert[start:start + batch_size]
+            documents = [records[doc_id][0] for doc_id in batch_ids]
+            self.collection.upsert(
+                ids=batch_ids,
+                embeddings=self.embedding_function(documents),
+                documents=documents,
+                metadatas=[records[doc_id][1] for doc_id in batch_ids]
+            )
+            done = start + len(batch_ids)
+            logger.info(f"Embedded {done}/{len(to_upsert)} assessments")
+            if progress is not None:
+                progress(done, len(to_upsert))
+        
+        self._refresh_catalog()
+        added = sum(1 for doc_id in to_upsert if doc_id not in stored_hashes)
+        return {
+            "added": added,
+            "updated": len(to_upsert) - added,
+            "deleted": len(to_delete),
+            "unchanged": len(records) - len(to_upsert),
+        }
+
+    @staticmethod
+    def _prepare_record(assessment: dict) -> Tuple[str, str, dict]:
+        """Build the (id, document text, metadata) stored in ChromaDB for one catalog entry"""
+        # Serialize list fields to strings
+        test_types = assessment.get('test_type', [])
+        if isinstance(test_types, str):
+            test_types = [t.strip() for t in test_types.split(",")]
+        elif not isinstance(test_types, list):
+            test_types = [str(test_types)]
+        
+        metadata = {
+            "url": assessment['url'],
+            "name": assessment.get('name', ''),
+            "adaptive_support": assessment['adaptive_support'],
+            "description": assessment['description'],
+            "duration": assessment['duration'],
+            "remote_support": assessment['remote_support'],
+            "test_type": ",".join(test_types),  # Chroma metadata cannot hold lists
+            "keywords": assessment.get('keywords') or '',
+            # Typed fields for filter pushdown (duration in minutes, flags as bools)
+            **filter_fields(assessment)
+        }
+        document_text = VectorDB._create_document_text(metadata, test_types)
+        
+        content = json.dumps([document_text, metadata], sort_keys=True)
+        metadata["content_hash"] = hashlib.sha256(content.encode()).hexdigest()
+        return assessment['url'], document_text, metadata
+
+    @staticmethod
+    def _create_document_text(metadata: dict, test_types: List[str]) -> str:
         """Create a text representation of an assessment for embedding"""
         return (
-            f"SHL Assessment: {assessment.get('description', '')}\n"
-            f"Type: {assessment.get('test_type', '')[0]}\n"
-            f"Duration: {assessment.get('duration', '')}\n"
-            f"Remote Supported: {'Yes' if assessment.get('remote_support', False) else 'No'}\n"
-            f"Adaptive: {'Yes' if assessment.get('adaptive_support', False) else 'No'}\n"
-            f"Keywords: {assessment.get('keywords', '')}"
-        )        
+            f"SHL Assessment: {metadata['description']}\n"
+            f"Name: {metadata['name']}\n"
+            f"Types: {', '.join(test_types)}\n"
+            f"Duration: {metadata['duration']}\n"
+            f"Remote: {'Yes' if metadata['is_remote'] else 'No'}\n"
+            f"Adaptive: {'Yes' if metadata['is_adaptive'] else 'No'}"
+        )
     
-    def search(self, query: str, top_k: int = 6) -> List[Assessment]:
+    def _embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Embed queries in one encoder pass, reusing cached vectors for previously seen text"""
+        normalized = [normalize_query(q) for q in queries]
+        embeddings = [self.embedding_cache.get(text) for text in normalized]
+        
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        record_cache("embedding", len(queries) - len(missing), len(missing))
+        if missing:
+            texts = list(dict.fromkeys(normalized[i] for i in missing))  # De-duplicate, keep order
+            encoded = {}
+            with stage("embed"):
+                vectors = self.embedding_function(texts)
+            for text, vector in zip(texts, vectors):
+                encoded[text] = np.asarray(vector, dtype=np.float32)
+                self.embedding_cache.set(text, encoded[text])
+            for i in missing:
+                embeddings[i] = encoded[normalized[i]]
+        return embeddings
+
+    def search(self, query: str, top_k: int = 6, filters: Optional[QueryFilters] = None,
+               search_ef: Optional[int] = None) -> List[Assessment]:
         """
         Search for relevant assessments based on query
         
         Args:
             query: Search query or job description
             top_k: Number of results to return
+            filters: Hard constraints, pushed down into the ChromaDB query
+            search_ef: HNSW search breadth for this query (None = the collection's)
             
         Returns:
             List of Assessment objects with relevance scores
         """
+        return self.search_batch([query], top_k=top_k, filters=filters, search_ef=search_ef)[0]
+
+    def search_batch(self, queries: List[str], top_k: Union[int, List[int]] = 6,
+                     filters: Union[None, QueryFilters, List[Optional[QueryFilters]]] = None,
+                     search_ef: Union[None, int, List[Optional[int]]] = None) -> List[List[Assessment]]:
+        """
+        Search for many queries with one batched embedding pass and one ChromaDB query
+        per distinct filter set and search_ef
+        
+        Args:
+            queries: Search queries or job descriptions
+            top_k: Number of results to return, either shared or one per query
+            filters: Hard constraints, either shared or one per query
+            search_ef: HNSW search breadth, either shared or one per query (None = the collection's)
+            
+        Returns:
+            One list of Assessment objects per query, in input order
+        """
+        top_ks = list(top_k) if isinstance(top_k, (list, tuple)) else [top_k] * len(queries)
+        filters_list = list(filters) if isinstance(filters, (list, tuple)) else [filters] * len(queries)
+        filter_keys = [filters_key(f) for f in filters_list]
+        search_efs = list(search_ef) if isinstance(search_ef, (list, tuple)) else [search_ef] * len(queries)
+        if self.numpy_index is not None:
+            search_efs = [None] * len(queries)  # Exact search: nothing to widen
+        query_vectors = self._query_vectors(queries)
+        cache_keys = [
+            (self.catalog_version, self._vectors_key(vectors, weights), k, filter_key, ef)
+            for (vectors, weights), k, filter_key, ef in zip(query_vectors, top_ks, filter_keys, search_efs)
+        ]
+        rankings = [self.result_cache.get(key) for key in cache_keys]
+        misses = sum(1 for ranked in rankings if ranked is None)
+        record_cache("result", len(rankings) - misses, misses)
+        
+        # Chroma takes one `where` per call, so group the misses by filter set (and search_ef)
+        groups = defaultdict(list)
+        for i, ranked in enumerate(rankings):
+            if ranked is None:
+                groups[(filter_keys[i], search_efs[i])].append(i)
+        
+        for missing in groups.values():
+            group_filters, group_ef = filters_list[missing[0]], search_efs[missing[0]]
+            n_results = max(top_ks[i] for i in missing)
+            # BM25 runs on its own thread while Chroma serves the ANN query
+            lexical_future = self._lexical_executor.submit(
+                contextvars.copy_context().run,  # Keeps the request's stage timings
+                self._lexical_search, [queries[i] for i in missing], n_results, group_filters
+            ) if settings.hybrid_search else None
+            fetched = self._multi_vector_search(
+                [query_vectors[i] for i in missing], n_results, group_filters, search_ef=group_ef
+            )
+            if lexical_future is not None:
+                fetched = [
+                    self._fuse(vector_ranked, lexical_ranked)
+                    for vector_ranked, lexical_ranked in zip(fetched, lexical_future.result())
+                ]
+            
+            for i, ranked in zip(missing, fetched):
+                rankings[i] = ranked[:top_ks[i]]
+                self.result_cache.set(cache_keys[i], rankings[i])
+        
+        with stage("hydrate"):
+            return [self._hydrate(ranked) for ranked in rankings]
+
+    def _query_vectors(self, queries: List[str]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Per query: one embedding per chunk and the chunk weights
+        
+        Long queries are split into overlapping chunks that fit the embedding
+        model's window (see app.chunking); all chunks of all queries are
+        embedded in one encoder pass.
+        """
+        if settings.query_chunking:
+            chunked = [
+                split_query(query, settings.query_chunk_words, settings.query_chunk_overlap,
+                            extract=settings.query_extract_requirements,
+                            requirements_weight=settings.query_requirements_weight)
+                for query in queries
+            ]
+        else:
+            chunked = [[(query, 1.0)] for query in queries]
+        
+        embeddings = self._embed_queries([text for chunks in chunked for text, _ in chunks])
+        query_vectors, start = [], 0
+        for chunks in chunked:
+            query_vectors.append((
+                np.stack(embeddings[start:start + len(chunks)]),
+                np.array([weight for _, weight in chunks], dtype=np.float32)
+            ))
+            start += len(chunks)
+        return query_vectors
+
+    def _vectors_key(self, vectors: np.ndarray, weights: np.ndarray) -> bytes:
+        digest = hashlib.sha1(vectors.tobytes())
+        if len(vectors) > 1:
+            digest.update(weights.tobytes())
+            digest.update(settings.query_chunk_aggregation.encode())
+        return digest.digest()
+
+    def _multi_vector_search(self, query_vectors: List[Tuple[np.ndarray, np.ndarray]], top_k: int,
+                             filters: Optional[QueryFilters] = None,
+                             search_ef: Optional[int] = None) -> List[Tuple[Tuple[str, float], ...]]:
+        """One backend call for the chunks of all queries, then per-query aggregation of the chunk rankings"""
+        chunk_rankings = self._vector_search(
+            [vector for vectors, _ in query_vectors for vector in vectors], top_k, filters, search_ef=search_ef
+        )
+        rankings, start = [], 0
+        for vectors, weights in query_vectors:
+            merged = aggregate_rankings(
+                chunk_rankings[start:start + len(vectors)], weights, settings.query_chunk_aggregation
+            )
+            rankings.append(merged[:top_k])
+            start += len(vectors)
+        return rankings
+
+    def _lexical_search(self, queries: List[str], top_k: int,
+                        filters: Optional[QueryFilters] = None) -> List[List[Tuple[str, float]]]:
+        allowed = None
+        if filters is not None and self.numpy_index is not None:
+            mask, rows = filter_mask(self.numpy_index.columns, len(self.numpy_index), filters), self.numpy_index.rows
+            allowed = lambda doc_id: doc_id in rows and bool(mask[rows[doc_id]])
+        elif filters is not None:
+            fields_by_id = self._filter_fields_by_id
+            allowed = lambda doc_id: doc_id in fields_by_id and matches_filters(fields_by_id[doc_id], filters)
+        with stage("lexical_search"):
+            return [self.lexical_index.search(query, top_k, allowed=allowed) for query in queries]
+
+    def _fuse(self, vector_ranked: Tuple[Tuple[str, float], ...],
+              lexical_ranked: List[Tuple[str, float]]) -> Tuple[Tuple[str, float], ...]:
+        """
+        Combine ANN and BM25 rankings with weighted reciprocal rank fusion
+        
+        Returns (id, vector similarity) pairs in fused order: the public score stays
+        the cosine similarity. Documents found only by BM25 have similarity 0.
+        """
+        if not lexical_ranked:
+            return vector_ranked
+        fused = reciprocal_rank_fusion(
+            [[doc_id for doc_id, _ in vector_ranked], [doc_id for doc_id, _ in lexical_ranked]],
+            weights=[settings.vector_weight, settings.lexical_weight],
+            k=settings.rrf_k
+        )
+        similarities = dict(vector_ranked)
+        return tuple((doc_id, similarities.get(doc_id, 0.0)) for doc_id, _ in fused)
+
+    def _hydrate(self, ranked: Tuple[Tuple[str, float], ...]) -> List[Assessment]:
+        """Turn (id, score) pairs into scored Assessment objects"""
+        return [
+            self._assessments_by_id[doc_id].model_copy(update={"score": score})
+            for doc_id, score in ranked if doc_id in self._assessments_by_id
+        ]
+
+    def _vector_search(self, embeddings: List[np.ndarray], top_k: int, filters: Optional[QueryFilters] = None,
+                       search_ef: Optional[int] = None) -> List[Tuple[Tuple[str, float], ...]]:
+        """ANN/exact search on the configured backend: (id, similarity) pairs per query, best first"""
+        with stage("vector_search"):
+            if self.numpy_index is None:
+                if filters is not None and not self._stored_filter_fields:
+                    return self._query_collection_unindexed_filters(embeddings, top_k, filters, search_ef)
+                return self._query_collection(embeddings, top_k, where=build_where(filters), search_ef=search_ef)
+            
+            mask = filter_mask(self.numpy_index.columns, len(self.numpy_index), filters)
+            return [
+                tuple((doc_id, min(1.0, max(0.0, float(score)))) for doc_id, score in ranked)
+                for ranked in self.numpy_index.search(np.stack(embeddings), top_k, mask=mask)
+            ]
+
+    def _query_collection(self, embeddings: List[np.ndarray], top_k: int, where: Optional[dict] = None,
+                          search_ef: Optional[int] = None) -> List[Tuple[Tuple[str, float], ...]]:
+        """
+        Run one ANN query for all embeddings and return (id, similarity) pairs per query, best first
+        
+        Only ids and distances are fetched; results are hydrated from the in-memory catalog.
+        Chroma cannot change ef on a loaded index per query, but hnswlib searches with
+        max(ef, n_results), so search_ef is applied by asking for that many results
+        and keeping the top_k.
+        """
         results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k,
-            include=["metadatas", "distances"]
+            query_embeddings=embeddings,
+            n_results=max(top_k, search_ef or 0),
+            where=where,
+            include=["distances"]
         )
         
-        assessments = []
-        for metadata, distance in zip(results['metadatas'][0], results['distances'][0]):
-            try:
-                # Convert test_type to list if it's stored as string in ChromaDB
-                test_type = metadata['test_type']
-                if isinstance(test_type, str):
-                    test_type = [t.strip() for t in test_type.split(",")]
-                
-                assessment = Assessment(
-                    url=metadata['url'],
-                    name=metadata.get('name'),
-                    adaptive_support=metadata['adaptive_support'],
-                    description=metadata['description'],
-                    duration=metadata['duration'],
-                    remote_support=metadata['remote_support'],
-                    test_type=test_type,
-                    score=1 - distance  # Convert to similarity score
-                )
-                assessments.append(assessment)
-            except Exception as e:
-                logging.warning(f"Failed to parse assessment metadata: {str(e)}")
+        # Convert to similarity score; model_copy skips validation so clamp to [0, 1]
+        return [
+            tuple(sorted(
+                ((doc_id, min(1.0, max(0.0, 1 - distance))) for doc_id, distance in zip(ids, distances)),
+                key=lambda item: item[1], reverse=True
+            )[:top_k])
+            for ids, distances in zip(results['ids'], results['distances'])
+        ]
+
+    def _query_collection_unindexed_filters(self, embeddings: List[np.ndarray], top_k: int, filters: QueryFilters,
+                                            search_ef: Optional[int] = None) -> List[Tuple[Tuple[str, float], ...]]:
+        """
+        Filtered search on a store without typed filter metadata: rank the whole
+        collection and keep the rows whose in-memory filter fields match
+        """
+        fields_by_id = self._filter_fields_by_id
+        ranked = self._query_collection(embeddings, max(top_k, len(fields_by_id)), search_ef=search_ef)
+        return [
+            tuple(item for item in items if item[0] in fields_by_id and matches_filters(fields_by_id[item[0]], filters))[:top_k]
+            for items in ranked
+        ]
+
+    def _parse_metadata(self, metadata: dict) -> Assessment:
+        """Build the catalog record (an Assessment without score, JSON prebuilt) from ChromaDB metadata"""
+        # Convert test_type to list if it's stored as string in ChromaDB
+        test_type = metadata['test_type']
+        if isinstance(test_type, str):
+            test_type = [t.strip() for t in test_type.split(",")]
         
-        return sorted(assessments, key=lambda x: x.score, reverse=True)
\ No newline at end of file
+        return with_json_prefix(Assessment(
+            url=metadata['url'],
+            name=metadata.get('name'),
+            adaptive_support=metadata['adaptive_support'],
+            description=metadata['description'],
+            duration=metadata['duration'],
+            remote_support=metadata['remote_support'],
+            test_type=test_type
+        ))
+
+    def close(self):
+        """Stop the lexical search threads"""
+        self._lexical_executor.shutdown(wait=False)
+
+    def cache_stats(self) -> dict:
+        return {
+            "catalog_version": self.catalog_version,
+            "embedding_cache": self.embedding_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+        }
@@ -0,0 +1,32 @@
+from chromadb.utils import embedding_functions
+import logging
+
+logger = logging.getLogger(__name__)
+
+# The ONNX export shipped with Chroma is all-MiniLM-L6-v2, same model as the torch default
+ONNX_MODEL_NAME = "all-MiniLM-L6-v2"
+
+def create_embedding_function(backend: str, model_name: str = "all-MiniLM-L6-v2"):
+    """
+    Build the embedding function used for documents and queries
+    
+    Args:
+        backend: "sentence-transformers" (torch) or "onnx" (onnxruntime, no torch import)
+        model_name: Sentence-transformers model name
+        
+    Returns:
+        A Chroma embedding function
+    """
+    if backend == "sentence-transformers":
+        return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+    if backend == "onnx":
+        if model_name != ONNX_MODEL_NAME:
+            raise ValueError(f"The ONNX backend only provides {ONNX_MODEL_NAME}, got {model_name}")
+        return embedding_functions.ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+def collection_name(backend: str) -> str:
+    """Chroma pins a collection to the embedding function that created it, so each backend gets its own"""
+    if backend == "sentence-transformers":
+        return "shl_assessments"
+    return f"shl_assessments_{backend.replace('-', '_')}"
@@ -1,7 +1,33 @@
-import requests
+"""Benchmark and evaluate the recommendation service in-process
+
+Requests go through the FastAPI app over httpx's ASGI transport, so routing,
+validation and serialization are measured too, with the pipeline stages
+(embedding, vector search, BM25, search, rerank) timed individually. The
+reranker defaults to the deterministic stub, so runs need no Gemini key and
+are comparable between commits.
+
+Usage:
+    python -m app.evaluation [--concurrency 8] [--synthetic-catalog 5000] [--synthetic-queries 500]
+                             [--reranker stub] [--rerank-latency-ms 800] [--output results.json]
+                             [--reranker fake-gemini --llm-error-rate 0.2 --llm-hang-rate 0.05]
+"""
+import argparse
+import asyncio
 import json
+import random
+import resource
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.benchmark import latency_summary
+from app.config import settings
+from app.utils import current_rss_mb
 
 K = 5  # Top-K recommendations to evaluate
+DATA_DIR = Path(__file__).parent.parent / "data"
 
 def precision_at_k(predicted, relevant, k=5):
     predicted_set = set(predicted[:k])
@@ -13,58 +39,234 @@ def recall_at_k(predicted, relevant, k=5):
     relevant_set = set(relevant)
     return len(predicted_set & relevant_set) / len(relevant) if relevant else 0
 
-def evaluate():
-    with open("data/test_queries.json", "r") as f:
-        test_data = json.load(f)
+def mrr_at_k(predicted, relevant, k=5):
+    relevant_set = set(relevant)
+    for rank, url in enumerate(predicted[:k], start=1):
+        if url in relevant_set:
+            return 1 / rank
+    return 0
+
+def normalize_url(url: str) -> str:
+    return url.strip().lower().rstrip("/")
+
+def synthetic_catalog(base: List[dict], size: int, rng: random.Random) -> List[dict]:
+    """The real catalog plus generated entries (fields recombined from real ones) up to size rows"""
+    catalog = list(base)
+    for i in range(len(base), size):
+        source, other = rng.choice(base), rng.choice(base)
+        sentences = (source['description'] + " " + other['description']).split(". ")
+        catalog.append({
+            **source,
+            "url": f"{source['url'].rstrip('/')}-synthetic-{i}/",
+            "name": f"{source.get('name', '')} {other.get('name', '')}".strip(),
+            "description": ". ".join(rng.sample(sentences, k=min(3, len(sentences)))),
+        })
+    return catalog
+
+def synthetic_queries(catalog: List[dict], count: int, rng: random.Random) -> List[dict]:
+    """Queries built from one catalog entry's name and description; that entry is the relevant answer"""
+    queries = []
+    for assessment in rng.sample(catalog, k=min(count, len(catalog))):
+        words = assessment['description'].split()
+        start = rng.randrange(max(1, len(words) - 8))
+        queries.append({
+            "query": f"Looking for {assessment.get('name', '')}: {' '.join(words[start:start + 8])}",
+            "relevant_assessments": [assessment['url']],
+        })
+    return queries
+
+
+class StageTimer:
+    """Collects wall-clock samples per pipeline stage by wrapping methods in place"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
 
-    precision_scores = []
-    recall_scores = []
+    def add(self, stage: str, seconds: float):
+        self.samples[stage].append(seconds)
 
-    for entry in test_data:
-        query = entry["query"]
-        relevant = entry["relevant_assessments"]
+    def wrap(self, obj, attr: str, stage: str):
+        method = getattr(obj, attr)
+        if asyncio.iscoroutinefunction(method):
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - started)
+        else:
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - started)
+        setattr(obj, attr, timed)
 
-        response = requests.post(
-            "http://127.0.0.1:8000/recommend",  # Local development server
-            json={"query": query, "top_k": K}
-        )
+    def summary(self) -> Dict[str, dict]:
+        return {
+            stage: {"count": len(samples), **latency_summary(samples)}
+            for stage, samples in self.samples.items()
+        }
 
+def instrument(pipeline, timer: StageTimer):
+    vector_db = pipeline.vector_db
+    timer.wrap(vector_db, "_embed_queries", "embed")
+    timer.wrap(vector_db, "_vector_search", "vector_search")
+    timer.wrap(vector_db, "_lexical_search", "lexical_search")
+    timer.wrap(vector_db, "search", "search")
+    timer.wrap(pipeline, "refine", "rerank")
+
+async def run_queries(client, entries: List[dict], top_k: int, concurrency: int,
+                      timer: StageTimer) -> List[Optional[List[str]]]:
+    """POST every query to /recommend with at most `concurrency` in flight; None marks a failed request"""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(entry: dict) -> Optional[List[str]]:
+        async with limit:
+            started = time.perf_counter()
+            response = await client.post("/recommend", json={"query": entry["query"], "top_k": top_k})
+            timer.add("request", time.perf_counter() - started)
         if response.status_code != 200:
-            print(f"❌ Failed to get response for query: {query}")
+            print(f"❌ Failed to get response for query: {entry['query']} ({response.status_code})")
+            return None
+        return [normalize_url(item["url"]) for item in response.json()["recommendations"] if item.get("url")]
+
+    return list(await asyncio.gather(*(one(entry) for entry in entries)))
+
+def quality(entries: List[dict], predictions: List[Optional[List[str]]], k: int) -> dict:
+    scores = defaultdict(list)
+    for entry, predicted in zip(entries, predictions):
+        if predicted is None:
             continue
+        relevant = [normalize_url(url) for url in entry["relevant_assessments"]]
+        scores[f"precision@{k}"].append(precision_at_k(predicted, relevant, k=k))
+        scores[f"recall@{k}"].append(recall_at_k(predicted, relevant, k=k))
+        scores[f"mrr@{k}"].append(mrr_at_k(predicted, relevant, k=k))
+    return {
+        "queries": len(entries),
+        **{metric: round(sum(values) / len(values), 4) for metric, values in scores.items() if values},
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def evaluate(args) -> dict:
+    import httpx
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    with open(DATA_DIR / "test_queries.json", "r") as f:
+        labeled = json.load(f)
+    with open(DATA_DIR / "shl_assessments.json", "r") as f:
+        catalog = json.load(f)
+
+    catalog_file = None
+    if args.synthetic_catalog > len(catalog):
+        # Generated catalogs get their own throwaway collection
+        workdir = tempfile.mkdtemp(prefix="shl-eval-")
+        catalog = synthetic_catalog(catalog, args.synthetic_catalog, rng)
+        catalog_file = Path(workdir) / "catalog.json"
+        catalog_file.write_text(json.dumps(catalog))
+        settings.chroma_db_path = str(Path(workdir) / "chroma")
+        settings.catalog_sync = "off"
+    generated = synthetic_queries(catalog, args.synthetic_queries, rng)
 
-        result = response.json()
-        predicted_urls = [
-            item["url"].strip().lower().rstrip("/")
-            for item in result.get("recommendations", [])
-            if item.get("url")
-        ]
+    settings.reranker = args.reranker
+    settings.stub_rerank_latency_ms = args.rerank_latency_ms
+    settings.fake_llm_latency_ms = args.rerank_latency_ms
+    settings.fake_llm_error_rate = args.llm_error_rate
+    settings.fake_llm_hang_rate = args.llm_hang_rate
+    settings.background_startup = False
+    if args.search_backend:
+        settings.search_backend = args.search_backend
 
-        relevant = [
-            url.strip().lower().rstrip("/") for url in relevant
-        ]
+    memory = {"rss_mb_before": round(current_rss_mb(), 1)}
+    timer = StageTimer()
+    async with app.router.lifespan_context(app):
+        pipeline = app.state.pipeline
+        if catalog_file is not None:
+            started = time.perf_counter()
+            pipeline.vector_db.sync_catalog(data_path=str(catalog_file))
+            print(f"Indexed {len(catalog)} synthetic assessments in {time.perf_counter() - started:.1f}s")
+        memory["rss_mb_ready"] = round(current_rss_mb(), 1)
+        instrument(pipeline, timer)
 
-        print(f"   Predicted: {predicted_urls}\n   Relevant: {relevant}")
+        entries = (labeled + generated) * args.repeat
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://evaluation", timeout=None) as client:
+            started = time.perf_counter()
+            predictions = await run_queries(client, entries, args.top_k, args.concurrency, timer)
+            wall = time.perf_counter() - started
 
-        precision = precision_at_k(predicted_urls, relevant, k=K)
-        recall = recall_at_k(predicted_urls, relevant, k=K)
+    memory["rss_mb_after"] = round(current_rss_mb(), 1)
+    memory["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    completed = sum(1 for predicted in predictions if predicted is not None)
+    return {
+        "commit": _git_commit(),
+        "config": {
+            "catalog_size": len(catalog),
+            "concurrency": args.concurrency,
+            "top_k": args.top_k,
+            "repeat": args.repeat,
+            "reranker": settings.reranker,
+            "rerank_latency_ms": args.rerank_latency_ms,
+            "llm_error_rate": args.llm_error_rate,
+            "llm_hang_rate": args.llm_hang_rate,
+            "latency_budget_ms": settings.latency_budget_ms,
+            "search_backend": settings.search_backend,
+            "hybrid_search": settings.hybrid_search,
+            "seed": args.seed,
+        },
+        "startup": app.state.startup,
+        "requests": len(entries),
+        "failed": len(entries) - completed,
+        "wall_seconds": round(wall, 3),
+        "throughput_qps": round(completed / wall, 2) if wall else None,
+        "latency": timer.summary(),
+        "quality": {
+            "labeled": quality(labeled, predictions[:len(labeled)], args.top_k),
+            "synthetic": quality(generated, predictions[len(labeled):len(labeled) + len(generated)], args.top_k),
+        },
+        "memory": memory,
+    }
 
-        precision_scores.append(precision)
-        recall_scores.append(recall)
+def main():
+    parser = argparse.ArgumentParser(description="In-process latency, throughput and quality benchmark")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--top-k", type=int, default=K)
+    parser.add_argument("--synthetic-catalog", type=int, default=0, help="Grow the catalog to N generated rows")
+    parser.add_argument("--synthetic-queries", type=int, default=100, help="Generated queries with a known answer")
+    parser.add_argument("--repeat", type=int, default=1, help="Send the query set this many times (warm caches)")
+    parser.add_argument("--reranker", default="stub", choices=["stub", "fake-gemini", "gemini", "cross-encoder"])
+    parser.add_argument("--rerank-latency-ms", type=float, default=0.0,
+                        help="Simulated latency of the stub / fake-gemini reranker")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of failing fake-gemini calls")
+    parser.add_argument("--llm-hang-rate", type=float, default=0.0, help="Share of fake-gemini calls that never return")
+    parser.add_argument("--search-backend", choices=["chroma", "numpy"], help="Override SEARCH_BACKEND")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
 
-        print(f"\n🔹 Query: {query}")
-        print(f"   Precision@{K}: {precision:.2f}")
-        print(f"   Recall@{K}: {recall:.2f}")
+    results = asyncio.run(evaluate(args))
 
-    if precision_scores:
-        avg_precision = sum(precision_scores) / len(precision_scores)
-        avg_recall = sum(recall_scores) / len(recall_scores)
+    print(f"\n📊 {results['requests']} requests ({results['failed']} failed) in {results['wall_seconds']}s, "
+          f"{results['throughput_qps']} req/s at concurrency {args.concurrency}")
+    for stage, stats in results["latency"].items():
+        print(f"   {stage:<15} " + "  ".join(f"{key}={value}" for key, value in stats.items()))
+    for name, scores in results["quality"].items():
+        print(f"   {name:<15} " + "  ".join(f"{key}={value}" for key, value in scores.items()))
+    print(f"   memory          " + "  ".join(f"{key}={value}" for key, value in results["memory"].items()))
 
-        print("\n📊 Final Evaluation:")
-        print(f"   Average Precision@{K}: {avg_precision:.2f}")
-        print(f"   Average Recall@{K}: {avg_recall:.2f}")
-    else:
-        print("\n⚠️ No successful responses received. Check your API URL or server status.")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
 
 if __name__ == "__main__":
-    evaluate()
\ No newline at end of file
+    main()
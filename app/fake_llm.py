@@ -0,0 +1,83 @@
+"""Local stand-in for the Gemini model with injectable latency and failures
+
+`FakeGenerativeModel` answers single and batched rerank prompts the way Gemini's
+JSON mode does (candidates in prompt order, decreasing scores) after a jittered
+latency; the latency does not grow with the number of batched jobs. A share
+of calls fails with a ConnectionError (`error_rate`) or never returns
+(`hang_rate`), so timeouts, retries, hedging and the circuit breaker can be
+exercised without network access or an API key. Select it with RERANKER=fake-gemini.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Optional
+
+_CANDIDATE_ID_RE = re.compile(r"^(\d+)\|", re.MULTILINE)
+_JOB_RE = re.compile(r"^Job (\d+) \(", re.MULTILINE)
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+
+
+class FakeGenerativeModel:
+    """Drop-in for genai.GenerativeModel in GeminiProcessor"""
+
+    model_name = "models/fake"
+
+    def __init__(self, latency_ms: float = 800, jitter: float = 0.25, error_rate: float = 0.0,
+                 hang_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def _outcome(self) -> str:
+        self.calls += 1
+        roll = self._rng.random()
+        if roll < self.hang_rate:
+            return "hang"
+        if roll < self.hang_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def _delay(self) -> float:
+        return self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _ranking(self, text: str) -> list:
+        ids = [int(i) for i in _CANDIDATE_ID_RE.findall(text)]
+        return [{"id": i, "score": round(1 - rank / max(1, len(ids)), 4)} for rank, i in enumerate(ids)]
+
+    def _reply(self, prompt: str) -> FakeResponse:
+        jobs = list(_JOB_RE.finditer(prompt))
+        if not jobs:
+            return FakeResponse(json.dumps(self._ranking(prompt)))
+        ends = [job.start() for job in jobs[1:]] + [len(prompt)]
+        return FakeResponse(json.dumps([
+            {"job": int(job.group(1)), "ranking": self._ranking(prompt[job.start():end])}
+            for job, end in zip(jobs, ends)
+        ]))
+
+    async def generate_content_async(self, prompt: str, **kwargs) -> FakeResponse:
+        outcome = self._outcome()
+        if outcome == "hang":
+            await asyncio.Event().wait()  # Until the caller times out or cancels
+        await asyncio.sleep(self._delay())
+        if outcome == "error":
+            raise ConnectionError("Injected LLM failure")
+        return self._reply(prompt)
+
+    def generate_content(self, prompt: str, request_options: Optional[dict] = None, **kwargs) -> FakeResponse:
+        outcome = self._outcome()
+        if outcome == "hang":
+            time.sleep((request_options or {}).get("timeout", 60))
+            raise TimeoutError("Injected LLM hang")
+        time.sleep(self._delay())
+        if outcome == "error":
+            raise ConnectionError("Injected LLM failure")
+        return self._reply(prompt)
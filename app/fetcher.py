@@ -0,0 +1,254 @@
+import asyncio
+import ipaddress
+import socket
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+import httpx
+from app.cache import SQLiteCache
+from app.utils import html_to_text
+import logging
+
+logger = logging.getLogger(__name__)
+
+_TEXT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+class FetchError(Exception):
+    """A job posting URL could not be fetched or yielded no text"""
+
+
+class PageFetcher:
+    """Pooled async fetcher for job posting URLs
+
+    One httpx client keeps connections alive across requests; a semaphore per
+    host bounds concurrent requests to any single site. Responses are streamed
+    and abandoned once they exceed `max_bytes`. Extracted text is cached in
+    SQLite together with the ETag / Last-Modified validators: within `max_age`
+    the cached text is used as is, after that the page is revalidated with a
+    conditional request and a 304 reuses the cached text.
+
+    URLs come from users, so redirects are followed here rather than by httpx
+    and every hop's host is resolved first: hosts resolving to loopback,
+    private, link-local or other non-public addresses are refused unless
+    listed in `allowed_hosts`. The connection then goes to the vetted address
+    (Host header and TLS SNI keep the name), so a second, rebound DNS answer
+    is never used.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, timeout: float = 10, max_bytes: int = 2 * 1024 * 1024,
+                 max_connections: int = 32, per_host: int = 4, max_age: float = 3600,
+                 cache_ttl: Optional[float] = None, max_text_chars: int = 8000, max_redirects: int = 5,
+                 allowed_hosts: Iterable[str] = (), transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.max_age = max_age
+        self.max_text_chars = max_text_chars
+        self.max_redirects = max_redirects
+        self.allowed_hosts = {host.lower() for host in allowed_hosts}
+        self.transport = transport
+        self.cache = SQLiteCache(cache_path, ttl=cache_ttl) if cache_path else None
+        # Created lazily so the client and semaphores bind to the server's event loop
+        self._client: Optional[httpx.AsyncClient] = None
+        # host -> [semaphore, requests holding or waiting for it]; dropped when unused,
+        # so the map only holds hosts with requests in flight
+        self._host_limits: Dict[str, list] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=False,  # Followed in _request, checking each hop
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                headers={"User-Agent": "SHL-Assessment-Recommender/1.0"},
+                transport=self.transport
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        entry = self._host_limits.get(host)
+        if entry is None:
+            entry = self._host_limits[host] = [asyncio.Semaphore(self.per_host), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._host_limits[host]
+
+    async def _resolve(self, host: str, port: int) -> List[str]:
+        """Addresses host resolves to"""
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        return [sockaddr[0] for *_, sockaddr in infos]
+
+    async def _check_url(self, url: str) -> Tuple[str, Optional[str]]:
+        """
+        Validate a URL about to be requested
+
+        Returns:
+            (host, vetted address to connect to); the address is None for allowed_hosts
+
+        Raises:
+            FetchError: not http(s), unresolvable, or resolving to a non-public address
+        """
+        try:
+            parsed = urlparse(url)
+            port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        except ValueError:
+            raise FetchError(f"Invalid URL: {url}")
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise FetchError(f"Invalid URL: {url}")
+        host = parsed.hostname.lower()
+        if host in self.allowed_hosts:
+            return host, None
+
+        try:
+            resolved = await self._resolve(host, port)
+        except socket.gaierror as e:
+            raise FetchError(f"Cannot resolve {host}") from e
+        if not resolved:
+            raise FetchError(f"Cannot resolve {host}")
+        addresses = []
+        for resolved_address in resolved:
+            address = ipaddress.ip_address(resolved_address.split("%")[0])
+            if address.version == 6 and address.ipv4_mapped:
+                address = address.ipv4_mapped
+            if not address.is_global:
+                raise FetchError(f"Refusing to fetch {url}: {host} resolves to a non-public address")
+            addresses.append(address)
+        return host, str(addresses[0])
+
+    def _build_request(self, url: str, address: Optional[str], headers: dict) -> httpx.Request:
+        """GET for url; with an address, sent there while the Host header and TLS SNI keep the name"""
+        if address is None:
+            return self._get_client().build_request("GET", url, headers=headers)
+        target = httpx.URL(url)
+        return self._get_client().build_request(
+            "GET",
+            target.copy_with(host=address),
+            headers={**headers, "Host": target.netloc.decode("ascii")},
+            extensions={"sni_hostname": target.host}
+        )
+
+    async def fetch_text(self, url: str) -> str:
+        """
+        Fetch a page and return its readable text
+
+        Args:
+            url: http(s) URL of a job posting
+
+        Returns:
+            Extracted text, cut to max_text_chars
+
+        Raises:
+            FetchError: invalid URL, HTTP error, oversized or non-text response, or no text
+        """
+        cached = await asyncio.to_thread(self.cache.get, url) if self.cache is not None else None
+        if cached is not None and time.time() - cached["fetched_at"] < self.max_age:
+            return cached["text"]
+
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            text, etag, last_modified = await self._request(url, headers, cached)
+        except httpx.HTTPStatusError as e:
+            raise FetchError(f"Fetching {url} failed with HTTP {e.response.status_code}") from e
+        except httpx.HTTPError as e:
+            raise FetchError(f"Fetching {url} failed: {str(e) or type(e).__name__}") from e
+
+        if not text:
+            raise FetchError(f"No text found at {url}")
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.set, url, {
+                "text": text, "etag": etag, "last_modified": last_modified, "fetched_at": time.time()
+            })
+        return text
+
+    async def _request(self, url: str, headers: dict,
+                       cached: Optional[dict]) -> Tuple[str, Optional[str], Optional[str]]:
+        """
+        GET url, following redirects one checked hop at a time; returns (text, etag, last_modified)
+
+        The conditional headers were cached for url itself, so only its request carries them.
+        """
+        requested = url
+        for _ in range(self.max_redirects + 1):
+            host, address = await self._check_url(url)
+            request = self._build_request(url, address, headers if url == requested else {})
+            async with self._host_slot(host):
+                response = await self._get_client().send(request, stream=True)
+                try:
+                    if response.has_redirect_location:
+                        url = urljoin(url, response.headers["Location"])
+                        continue
+                    if response.status_code == 304 and cached is not None and url == requested:
+                        return cached["text"], cached.get("etag"), cached.get("last_modified")
+                    response.raise_for_status()
+                    body = await self._read_capped(response, url)
+                    text = await asyncio.to_thread(self._extract, body, response)
+                    return text, response.headers.get("ETag"), response.headers.get("Last-Modified")
+                finally:
+                    await response.aclose()
+        raise FetchError(f"Too many redirects (more than {self.max_redirects}) for {requested}")
+
+    async def fetch_many(self, urls: List[str]) -> List[str]:
+        """Fetch several pages concurrently (per-host limits still apply); raises on the first failure"""
+        return list(await asyncio.gather(*(self.fetch_text(url) for url in urls)))
+
+    async def _read_capped(self, response: httpx.Response, url: str) -> bytes:
+        content_type = response.headers.get("Content-Type", "text/html").split(";")[0].strip().lower()
+        if content_type not in _TEXT_TYPES:
+            raise FetchError(f"Unsupported content type {content_type} at {url}")
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise FetchError(f"Page at {url} exceeds {self.max_bytes} bytes")
+
+        chunks, size = [], 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise FetchError(f"Page at {url} exceeds {self.max_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _extract(self, body: bytes, response: httpx.Response) -> str:
+        content = body.decode(response.charset_encoding or "utf-8", errors="replace")
+        if response.headers.get("Content-Type", "").startswith("text/plain"):
+            text = content.strip()
+        else:
+            text = html_to_text(content)
+        return text[:self.max_text_chars]
+
+    def stats(self) -> Optional[dict]:
+        return self.cache.stats() if self.cache is not None else None
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_fetcher(settings) -> PageFetcher:
+    return PageFetcher(
+        cache_path=settings.fetch_cache_path if settings.fetch_cache_enabled else None,
+        timeout=settings.fetch_timeout,
+        max_bytes=settings.fetch_max_bytes,
+        max_connections=settings.fetch_max_connections,
+        per_host=settings.fetch_per_host,
+        max_age=settings.fetch_cache_max_age,
+        cache_ttl=settings.fetch_cache_ttl,
+        max_text_chars=settings.fetch_max_text_chars,
+        max_redirects=settings.fetch_max_redirects,
+        allowed_hosts=[host.strip() for host in settings.fetch_allowed_hosts.split(",") if host.strip()]
+    )
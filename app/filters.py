@@ -0,0 +1,133 @@
+from typing import Dict, Optional, Tuple
+from app.models import QueryFilters
+import numpy as np
+import re
+
+UNKNOWN_DURATION = -1  # Chroma metadata cannot hold None
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+def parse_duration(duration) -> Optional[Tuple[int, int]]:
+    """
+    Normalize a catalog duration into (min, max) minutes
+
+    "60 minutes" -> (60, 60), "30-40 minutes" -> (30, 40), "1 hour" -> (60, 60),
+    "N/A" or anything without a number -> None
+    """
+    if isinstance(duration, (int, float)):
+        return int(duration), int(duration)
+    if not isinstance(duration, str):
+        return None
+    numbers = [float(n) for n in _NUMBER_RE.findall(duration)]
+    if not numbers:
+        return None
+    factor = 60 if "hour" in duration.lower() else 1
+    return int(min(numbers) * factor), int(max(numbers) * factor)
+
+def to_bool(value) -> bool:
+    """Catalog flags come as "Yes"/"No" strings or booleans"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("yes", "true", "y", "1")
+    return bool(value)
+
+def type_field(test_type: str) -> str:
+    """Metadata key flagging one test type, e.g. "Technical Skills" -> "type_technical_skills" """
+    return "type_" + _SLUG_RE.sub("_", test_type.lower()).strip("_")
+
+def filter_fields(assessment: dict) -> dict:
+    """Typed, filterable metadata derived from a raw catalog entry"""
+    duration = parse_duration(assessment.get('duration'))
+    test_types = assessment.get('test_type', [])
+    if isinstance(test_types, str):
+        test_types = test_types.split(",")
+
+    fields = {
+        "duration_min": duration[0] if duration else UNKNOWN_DURATION,
+        "duration_max": duration[1] if duration else UNKNOWN_DURATION,
+        "is_remote": to_bool(assessment.get('remote_support')),
+        "is_adaptive": to_bool(assessment.get('adaptive_support')),
+    }
+    for test_type in test_types:
+        if test_type.strip():
+            fields[type_field(test_type.strip())] = True
+    return fields
+
+def _combine(operator: str, conditions: list) -> Optional[dict]:
+    # Chroma requires at least two operands for $and / $or
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {operator: conditions}
+
+def build_where(filters: Optional[QueryFilters]) -> Optional[dict]:
+    """Translate QueryFilters into a Chroma `where` clause (None when unfiltered)"""
+    if filters is None:
+        return None
+
+    conditions = []
+    if filters.max_duration is not None:
+        conditions.append({"duration_max": {"$lte": filters.max_duration}})
+        conditions.append({"duration_min": {"$gte": 0}})  # Exclude unknown durations
+    if filters.min_duration is not None:
+        conditions.append({"duration_min": {"$gte": filters.min_duration}})
+    if filters.remote_support is not None:
+        conditions.append({"is_remote": {"$eq": filters.remote_support}})
+    if filters.adaptive_support is not None:
+        conditions.append({"is_adaptive": {"$eq": filters.adaptive_support}})
+    if filters.test_types:
+        type_condition = _combine("$or", [
+            {type_field(test_type): {"$eq": True}} for test_type in sorted(set(filters.test_types))
+        ])
+        conditions.append(type_condition)
+    return _combine("$and", conditions)
+
+def matches_filters(fields: dict, filters: Optional[QueryFilters]) -> bool:
+    """Evaluate QueryFilters in Python against filter_fields output (same semantics as build_where)"""
+    if filters is None:
+        return True
+    if filters.max_duration is not None and not (0 <= fields["duration_max"] <= filters.max_duration):
+        return False
+    if filters.min_duration is not None and fields["duration_min"] < filters.min_duration:
+        return False
+    if filters.remote_support is not None and fields["is_remote"] != filters.remote_support:
+        return False
+    if filters.adaptive_support is not None and fields["is_adaptive"] != filters.adaptive_support:
+        return False
+    if filters.test_types and not any(fields.get(type_field(t)) for t in filters.test_types):
+        return False
+    return True
+
+def filter_mask(columns: Dict[str, np.ndarray], n_rows: int,
+                filters: Optional[QueryFilters]) -> Optional[np.ndarray]:
+    """Evaluate QueryFilters over columnar filter fields (same semantics as build_where)"""
+    if filters is None:
+        return None
+
+    empty_int = np.full(n_rows, UNKNOWN_DURATION, dtype=np.int32)
+    empty_bool = np.zeros(n_rows, dtype=bool)
+    mask = np.ones(n_rows, dtype=bool)
+    if filters.max_duration is not None:
+        duration_max = columns.get("duration_max", empty_int)
+        mask &= (duration_max >= 0) & (duration_max <= filters.max_duration)
+    if filters.min_duration is not None:
+        mask &= columns.get("duration_min", empty_int) >= filters.min_duration
+    if filters.remote_support is not None:
+        mask &= columns.get("is_remote", empty_bool) == filters.remote_support
+    if filters.adaptive_support is not None:
+        mask &= columns.get("is_adaptive", empty_bool) == filters.adaptive_support
+    if filters.test_types:
+        any_type = np.zeros(n_rows, dtype=bool)
+        for test_type in filters.test_types:
+            any_type |= columns.get(type_field(test_type), empty_bool)
+        mask &= any_type
+    return mask
+
+def filters_key(filters: Optional[QueryFilters]) -> Optional[str]:
+    """Canonical, hashable form of the filters for cache keys and grouping"""
+    if filters is None:
+        return None
+    return filters.model_copy(
+        update={"test_types": sorted(set(filters.test_types)) if filters.test_types else None}
+    ).model_dump_json(exclude_none=True)
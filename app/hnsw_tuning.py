@@ -0,0 +1,196 @@
+"""Tune the Chroma HNSW parameters on synthetic catalogs
+
+Synthetic catalogs of each requested size are generated from the
+data/shl_assessments.json entries (see evaluation.synthetic_catalog) and
+embedded with the configured model, or, with --jitter, grown by jittering the
+embedded real catalog (much faster at large sizes). For every (M, construction_ef)
+pair a collection is built in a temporary directory, recording build time, index
+size on disk and RSS growth; every search_ef is then measured for query latency
+percentiles and recall@k against exact brute-force search.
+
+The cheapest setting reaching --min-recall on the largest catalog is written to
+--output (Settings.hnsw_params_path), which VectorDB loads on startup.
+
+Usage:
+    python -m app.hnsw_tuning [--sizes 1000 10000] [--m 8 16 32] [--construction-ef 64 100 200]
+                              [--search-ef 10 25 50 100 200] [--min-recall 0.95] [--jitter]
+                              [--output cache/hnsw_params.json] [--report results.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+import chromadb
+from chromadb.api.client import SharedSystemClient
+import numpy as np
+from app.benchmark import jitter, latency_summary, recall_at_k
+from app.config import settings
+from app.database import VectorDB, hnsw_metadata
+from app.embeddings import create_embedding_function
+from app.evaluation import DATA_DIR, synthetic_catalog, synthetic_queries
+from app.numpy_index import NumpyIndex
+from app.utils import current_rss_mb
+
+COLLECTION = "hnsw_tuning"
+
+def directory_mb(path: str) -> float:
+    total = sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+    return total / 1024 / 1024
+
+def embed(embedding_function, texts: List[str], batch_size: int = 256) -> np.ndarray:
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embedding_function(texts[start:start + batch_size]))
+    rows = np.asarray(vectors, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+def build_workload(base: List[dict], size: int, queries: int, use_jitter: bool, noise: float,
+                   embedding_function, seed: int):
+    """(catalog ids, catalog embeddings, query embeddings) for a catalog of `size` rows"""
+    rng = random.Random(seed)
+    if use_jitter:
+        documents = [VectorDB._prepare_record(assessment)[1] for assessment in base]
+        real = embed(embedding_function, documents)
+        np_rng = np.random.default_rng(seed)
+        catalog = np.vstack([real, jitter(real, max(0, size - len(real)), noise, np_rng)])[:size]
+        return [f"doc{i}" for i in range(len(catalog))], catalog, jitter(catalog, queries, noise, np_rng)
+
+    entries = synthetic_catalog(base, size, rng)
+    records = [VectorDB._prepare_record(assessment) for assessment in entries]
+    catalog = embed(embedding_function, [document for _, document, _ in records])
+    query_texts = [entry["query"] for entry in synthetic_queries(entries, queries, rng)]
+    return [doc_id for doc_id, _, _ in records], catalog, embed(embedding_function, query_texts)
+
+def open_collection(path: str, search_ef: Optional[int] = None):
+    """A fresh client on `path`, so the index is loaded with the requested ef"""
+    # Chroma shares one system (and its loaded indexes) per path within a process
+    SharedSystemClient.clear_system_cache()
+    collection = chromadb.PersistentClient(path=path).get_collection(COLLECTION)
+    if search_ef is not None:
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+    return collection
+
+def measure(ids: List[str], catalog: np.ndarray, queries: np.ndarray, top_k: int,
+            m: int, construction_ef: int, search_efs: List[int]) -> List[dict]:
+    """Build one collection and measure every search_ef on it"""
+    exact = NumpyIndex("float32").build(ids, catalog)
+    expected = [[doc_id for doc_id, _ in ranked] for ranked in exact.search(queries, top_k)]
+    params = {"m": m, "construction_ef": construction_ef, "search_ef": search_efs[0],
+              "num_threads": settings.hnsw_num_threads}
+
+    with tempfile.TemporaryDirectory(prefix="hnsw_tuning_") as path:
+        SharedSystemClient.clear_system_cache()
+        rss_before = current_rss_mb()
+        started = time.perf_counter()
+        client = chromadb.PersistentClient(path=path)
+        collection = client.create_collection(COLLECTION, embedding_function=None, metadata=hnsw_metadata(params))
+        batch_size = client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            collection.add(ids=ids[start:start + batch_size], embeddings=catalog[start:start + batch_size])
+        build_seconds = time.perf_counter() - started
+        rss_mb = current_rss_mb() - rss_before
+        del client, collection
+        disk_mb = directory_mb(path)
+
+        results = []
+        for search_ef in search_efs:
+            collection = open_collection(path, search_ef)
+            latencies, predicted = [], []
+            for query in queries:
+                started = time.perf_counter()
+                found = collection.query(query_embeddings=[query], n_results=top_k, include=["distances"])
+                latencies.append(time.perf_counter() - started)
+                predicted.append(found["ids"][0])
+            results.append({
+                "catalog_size": len(ids),
+                "m": m,
+                "construction_ef": construction_ef,
+                "search_ef": search_ef,
+                "build_seconds": round(build_seconds, 3),
+                "disk_mb": round(disk_mb, 2),
+                "rss_mb": round(rss_mb, 1),
+                "recall": round(recall_at_k(predicted, expected), 4),
+                **latency_summary(latencies),
+            })
+        SharedSystemClient.clear_system_cache()
+    return results
+
+def recommend(results: List[dict], min_recall: float) -> dict:
+    """
+    Lowest p95 latency among the settings reaching min_recall on the largest catalog
+    (ties: smaller index), or the best recall if none does
+    """
+    largest = max(result["catalog_size"] for result in results)
+    candidates = [result for result in results if result["catalog_size"] == largest]
+    passing = [result for result in candidates if result["recall"] >= min_recall]
+    if passing:
+        return min(passing, key=lambda result: (result["p95_ms"], result["disk_mb"], result["build_seconds"]))
+    return max(candidates, key=lambda result: (result["recall"], -result["p95_ms"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune Chroma HNSW parameters on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Catalog sizes to measure")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[64, 100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    parser.add_argument("--queries", type=int, default=200, help="Queries per catalog")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Required recall@k against exact search")
+    parser.add_argument("--jitter", action="store_true", help="Grow catalogs by jittering embeddings, not text")
+    parser.add_argument("--noise", type=float, default=0.05, help="Jitter applied to synthetic rows and queries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=settings.hnsw_params_path, help="Where the recommended settings go")
+    parser.add_argument("--report", help="Write every measurement as JSON to this file")
+    args = parser.parse_args()
+
+    with open(DATA_DIR / "shl_assessments.json", "r") as f:
+        base = json.load(f)
+    embedding_function = create_embedding_function(settings.embedding_backend, model_name=settings.embedding_model)
+    search_efs = sorted(set(args.search_ef))
+
+    results = []
+    for size in args.sizes:
+        ids, catalog, queries = build_workload(
+            base, size, args.queries, args.jitter, args.noise, embedding_function, args.seed
+        )
+        print(f"Catalog: {len(ids)} rows, {len(queries)} queries, top_k={args.top_k}")
+        for m, construction_ef in itertools.product(args.m, args.construction_ef):
+            for result in measure(ids, catalog, queries, args.top_k, m, construction_ef, search_efs):
+                results.append(result)
+                print("  " + "  ".join(f"{key}={value}" for key, value in result.items() if key != "catalog_size"))
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(results, f, indent=2)
+
+    best = recommend(results, args.min_recall)
+    recommended = {
+        "m": best["m"],
+        "construction_ef": best["construction_ef"],
+        "search_ef": best["search_ef"],
+        "num_threads": settings.hnsw_num_threads,
+        "catalog_size": best["catalog_size"],
+        "top_k": args.top_k,
+        "min_recall": args.min_recall,
+        "recall": best["recall"],
+        "p95_ms": best["p95_ms"],
+        "disk_mb": best["disk_mb"],
+    }
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(recommended, f, indent=2)
+    if best["recall"] < args.min_recall:
+        print(f"No setting reached recall@{args.top_k} {args.min_recall}; wrote the best one")
+    print(f"M={best['m']} construction_ef={best['construction_ef']} search_ef={best['search_ef']}: "
+          f"recall@{args.top_k} {best['recall']}, p95 {best['p95_ms']} ms on {best['catalog_size']} rows")
+    print(f"Settings written to {args.output}; delete the Chroma collection and resync to apply M and construction_ef")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+import math
+import re
+import threading
+
+# Keeps skill tokens such as "c++", "c#" and "sql" intact; single letters are noise
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring
+
+    Documents can be added, replaced and removed one at a time, so the index
+    follows catalog changes without a full rebuild.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)  # term -> {doc_id: tf}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_terms
+
+    def add(self, doc_id: str, text: str) -> None:
+        """Index a document, replacing any previous version with the same id"""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(doc_id)
+            for term, tf in terms.items():
+                self._postings[term][doc_id] = tf
+            self._doc_terms[doc_id] = terms
+            self._doc_lengths[doc_id] = sum(terms.values())
+            self._total_length += self._doc_lengths[doc_id]
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def search(self, query: str, top_k: int,
+               allowed: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """
+        Score documents against the query
+
+        Args:
+            query: Free text query
+            top_k: Number of results to return
+            allowed: Optional predicate on document id (e.g. metadata filters)
+
+        Returns:
+            (doc_id, bm25 score) pairs, best first; documents without a matching term are omitted
+        """
+        query_terms = set(tokenize(query))
+        scores: Dict[str, float] = defaultdict(float)
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs or not query_terms:
+                return []
+            avg_length = self._total_length / n_docs
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if allowed is not None and not allowed(doc_id):
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], weights: List[float],
+                           k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse several rankings with weighted reciprocal rank fusion
+
+    Scores are normalized by the best achievable fused score, so a document
+    ranked first by every input gets 1.0.
+
+    Args:
+        rankings: Document ids per ranking, best first
+        weights: Weight per ranking
+        k: RRF smoothing constant
+
+    Returns:
+        (doc_id, fused score in [0, 1]) pairs, best first
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += weight / (k + rank)
+
+    best = sum(weights) / (k + 1)
+    return sorted(
+        ((doc_id, score / best) for doc_id, score in fused.items()),
+        key=lambda item: item[1],
+        reverse=True
+    )
@@ -1,21 +1,103 @@
-import google.generativeai as genai
-from typing import List
+from typing import List, Optional, Tuple
 from app.models import Assessment
 from app.config import settings
+from app.cache import SQLiteCache, normalize_query
+from app.rerankers import Reranker, keep_count
+from app.batching import MicroBatcher
+from app.metrics import LLM_BATCH_JOBS, LLM_FALLBACKS, LLM_RETRIES, LLM_TOKENS, record_cache, stage
+from app.resilience import CircuitBreaker, CircuitOpen, LatencyWindow, hedged, retry_async
+import asyncio
+import hashlib
 import logging
-import ast
 import json
-from pydantic import ValidationError
+import time
 
 logger = logging.getLogger(__name__)
 
-class GeminiProcessor:
-    """Wrapper for Gemini Pro LLM for refining recommendations"""
+# Bump whenever _create_prompt or _parse_response change meaning, so cached reranks are not reused
+PROMPT_VERSION = "3"
+
+# Failures worth another attempt: timeouts, dropped connections, rate limits and 5xx
+try:
+    from google.api_core import exceptions as google_exceptions
+    _GOOGLE_TRANSIENT_ERRORS = (
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.TooManyRequests,
+    )
+except ImportError:  # Without the Gemini SDK only an injected model (e.g. app.fake_llm) can be used
+    _GOOGLE_TRANSIENT_ERRORS = ()
+TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionError) + _GOOGLE_TRANSIENT_ERRORS
+
+CHARS_PER_TOKEN = 4  # Rough estimate for English text, used for the prompt token budget
+MIN_DESCRIPTION_CHARS = 60
+
+# Gemini JSON mode: the reply is a list of {"id": candidate id, "score": 0-1}
+RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "INTEGER"},
+            "score": {"type": "NUMBER"}
+        },
+        "required": ["id", "score"]
+    }
+}
+
+PROMPT_TEMPLATE = """Rank SHL assessments for a hiring query.
+Query: {query}
+Candidates (id|name|types|duration|remote|adaptive|description):
+{candidates}
+Return the {keep} most relevant candidates as [{{"id": <id>, "score": <0.0-1.0>}}], best first, judged on query relevance, duration requirements and test type."""
+
+# Micro-batched reranks: several jobs in one prompt, the reply keyed by job number
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "job": {"type": "INTEGER"},
+            "ranking": RESPONSE_SCHEMA
+        },
+        "required": ["job", "ranking"]
+    }
+}
+
+BATCH_PROMPT_TEMPLATE = """Rank SHL assessments for {n_jobs} independent hiring queries, each against its own candidates.
+{jobs}
+For every job return {{"job": <job>, "ranking": [{{"id": <id>, "score": <0.0-1.0>}}]}} with the number of candidates it asks for, best first, judged on query relevance, duration requirements and test type."""
+
+JOB_TEMPLATE = """Job {job} (return {keep}):
+Query: {query}
+Candidates (id|name|types|duration|remote|adaptive|description):
+{candidates}"""
+
+def _trim(text: str, max_chars: int) -> str:
+    """Cut text to max_chars at a word boundary"""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "…"
+
+class GeminiProcessor(Reranker):
+    """Wrapper for Gemini Pro LLM for refining recommendations
     
-    def __init__(self):
+    Calls are bounded by settings.llm_timeout, retried on transient errors,
+    optionally hedged, and skipped while the circuit breaker is open. With
+    settings.llm_batching, concurrent async reranks are micro-batched into one
+    call. `model` replaces the Gemini client (e.g. with app.fake_llm.FakeGenerativeModel).
+    """
+    
+    def __init__(self, model=None):
         try:
-            genai.configure(api_key=settings.gemini_api_key)
-            self.model = genai.GenerativeModel()
+            if model is None:
+                # Imported here so the module (and the fake model) works without the Gemini SDK
+                import google.generativeai as genai
+                genai.configure(api_key=settings.gemini_api_key)
+                model = genai.GenerativeModel()
+            self.model = model
             self.safety_settings = [
                 {
                     "category": "HARM_CATEGORY_HARASSMENT",
@@ -34,133 +116,412 @@ class GeminiProcessor:
                     "threshold": "BLOCK_NONE"
                 }
             ]
+            self.rerank_cache = SQLiteCache(
+                settings.rerank_cache_path,
+                ttl=settings.rerank_cache_ttl,
+                max_entries=settings.rerank_cache_max_entries
+            ) if settings.rerank_cache_enabled else None
+            self.breaker = CircuitBreaker(
+                "gemini",
+                window=settings.llm_breaker_window,
+                failure_ratio=settings.llm_breaker_failure_ratio,
+                min_calls=settings.llm_breaker_min_calls,
+                cooldown=settings.llm_breaker_cooldown
+            )
+            self.latencies = LatencyWindow()
+            self.batcher = MicroBatcher(
+                self._rerank_batch,
+                window=settings.llm_batch_window_ms / 1000,
+                max_jobs=settings.llm_batch_max_jobs,
+                queue_stage="llm_queue"
+            ) if settings.llm_batching else None
             logger.info("Gemini processor initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Gemini: {str(e)}")
+            self.close()
             raise
 
-    def refine_recommendations(self, query: str, assessments: List[Assessment]) -> List[Assessment]:
+    def close(self):
+        """Close the rerank cache (also after a failed __init__)"""
+        if getattr(self, "rerank_cache", None) is not None:
+            self.rerank_cache.close()
+            self.rerank_cache = None
+
+    def refine_recommendations(self, query: str, assessments: List[Assessment],
+                               top_k: Optional[int] = None) -> List[Assessment]:
         """
         Refine and re-rank assessments using Gemini LLM
         
         Args:
             query: Original user query
             assessments: List of assessments from vector search
+            top_k: Number of results to return (None = half the candidates)
             
         Returns:
             Refined and re-ranked list of assessments
         """
         if not assessments:
             return assessments
+        keep = keep_count(len(assessments), top_k)
+        
+        # Identical query + candidate set: reuse the stored rerank, skip the network
+        cache_key = self._cache_key(query, assessments, keep)
+        cached_items = self.rerank_cache.get(cache_key) if self.rerank_cache is not None else None
+        if self.rerank_cache is not None:
+            record_cache("rerank", int(cached_items is not None), int(cached_items is None))
+        if cached_items is not None:
+            logger.info("Rerank cache hit")
+            return self._build_assessments(cached_items, assessments, keep)
             
         try:
             # Prepare prompt
-            prompt = self._create_prompt(query, assessments)
+            with stage("prompt"):
+                prompt = self._create_prompt(query, assessments, keep)
             
-            # Call Gemini API
-            response = self.model.generate_content(
-                prompt,
-                safety_settings=self.safety_settings
-            )
+            # Call Gemini API (JSON mode, constrained to RESPONSE_SCHEMA)
+            with stage("llm"):
+                response = self._generate(prompt, self._generation_config(keep))
+            self._record_usage(response)
             
             # Parse response
-            refined_assessments = self._parse_response(response.text, assessments)
+            with stage("parse"):
+                refined_items = self._parse_items(response.text, assessments)
+            if refined_items is None:
+                LLM_FALLBACKS.inc(reason="parse")
+                return assessments[:keep]  # Fallback to the search order
+            if self.rerank_cache is not None:
+                self.rerank_cache.set(cache_key, refined_items)
+            refined_assessments = self._build_assessments(refined_items, assessments, keep)
             logger.info("Successfully refined recommendations with Gemini")
             return refined_assessments
             
+        except CircuitOpen:
+            LLM_FALLBACKS.inc(reason="circuit_open")
+            return assessments[:keep]  # Fallback to the search order
         except Exception as e:
             logger.error(f"Gemini processing failed: {str(e)}")
-            return assessments  # Fallback to original results
-
-    def _create_prompt(self, query: str, assessments: List[Assessment]) -> str:
-        """Create the prompt for Gemini"""
-        assessments_text = "\n\n".join(
-            f"Assessment {i+1}:\n"
-            f"Name: {assess.name}\n"
-            f"Description: {assess.description}\n"
-            f"Type: {assess.test_type}\n"
-            f"Duration: {assess.duration}\n"
-            f"Remote: {'Yes' if assess.remote_support else 'No'}\n"
-            f"Adaptive: {'Yes' if assess.adaptive_support else 'No'}\n"
-            f"URL: {assess.url}\n"
-            f"Current Score: {assess.score:.2f}"
-            for i, assess in enumerate(assessments)
-        )
+            LLM_FALLBACKS.inc(reason="error")
+            return assessments[:keep]  # Fallback to the search order
+
+    async def refine_recommendations_async(self, query: str, assessments: List[Assessment],
+                                           top_k: Optional[int] = None) -> List[Assessment]:
+        """
+        Async variant of refine_recommendations using the non-blocking Gemini client,
+        so a slow LLM call does not stall the event loop
+        
+        Args:
+            query: Original user query
+            assessments: List of assessments from vector search
+            top_k: Number of results to return (None = half the candidates)
+            
+        Returns:
+            Refined and re-ranked list of assessments
+        """
+        if not assessments:
+            return assessments
+        keep = keep_count(len(assessments), top_k)
+        
+        cache_key = self._cache_key(query, assessments, keep)
+        cached_items = await asyncio.to_thread(self.rerank_cache.get, cache_key) if self.rerank_cache is not None else None
+        if self.rerank_cache is not None:
+            record_cache("rerank", int(cached_items is not None), int(cached_items is None))
+        if cached_items is not None:
+            logger.info("Rerank cache hit")
+            return self._build_assessments(cached_items, assessments, keep)
+            
+        try:
+            if self.batcher is not None:
+                # Shares one Gemini call with concurrent reranks (its stages are timed in _rerank_batch)
+                refined_items = await self.batcher.submit((query, assessments, keep))
+            else:
+                refined_items = await self._rerank_items(query, assessments, keep)
+            if refined_items is None:
+                LLM_FALLBACKS.inc(reason="parse")
+                return assessments[:keep]  # Fallback to the search order
+            if self.rerank_cache is not None:
+                await asyncio.to_thread(self.rerank_cache.set, cache_key, refined_items)
+            refined_assessments = self._build_assessments(refined_items, assessments, keep)
+            logger.info("Successfully refined recommendations with Gemini")
+            return refined_assessments
+            
+        except CircuitOpen:
+            LLM_FALLBACKS.inc(reason="circuit_open")
+            return assessments[:keep]  # Fallback to the search order
+        except Exception as e:
+            logger.error(f"Gemini processing failed: {str(e)}")
+            LLM_FALLBACKS.inc(reason="error")
+            return assessments[:keep]  # Fallback to the search order
+
+    async def _rerank_items(self, query: str, assessments: List[Assessment], keep: int) -> Optional[List[dict]]:
+        """One Gemini call for one rerank: [{url, score}], or None if the reply could not be parsed"""
+        with stage("prompt"):
+            prompt = self._create_prompt(query, assessments, keep)
+        
+        with stage("llm"):
+            response = await self._generate_async(prompt, self._generation_config(keep))
+        self._record_usage(response)
+        
+        with stage("parse"):
+            return self._parse_items(response.text, assessments)
+
+    async def _rerank_batch(self, jobs: List[Tuple[str, List[Assessment], int]]) -> list:
+        """
+        One Gemini call for several (query, candidates, keep) rerank jobs
+        
+        Jobs missing from the combined reply or unparseable in it are rerun on their
+        own, concurrently. A failure of the combined call fails every job.
+        
+        Returns:
+            Per job: [{url, score}], None (reply not parseable), or the exception it failed with
+        """
+        LLM_BATCH_JOBS.observe(len(jobs))
+        if len(jobs) == 1:
+            return [await self._rerank_items(*jobs[0])]
+        
+        with stage("prompt"):
+            prompt = self._create_batch_prompt(jobs)
+        with stage("llm"):
+            response = await self._generate_async(prompt, self._batch_generation_config(jobs))
+        self._record_usage(response)
+        with stage("parse"):
+            results = self._parse_batch(response.text, jobs)
         
-        return f"""
-        You are an expert in psychometric assessments and HR technology. 
-        Your task is to refine SHL assessment recommendations based on the user's query.
+        missing = [i for i, items in enumerate(results) if items is None]
+        if missing:
+            logger.warning(f"{len(missing)} of {len(jobs)} jobs missing from the batched rerank, retrying them alone")
+            LLM_FALLBACKS.inc(len(missing), reason="batch")
+            retried = await asyncio.gather(*(self._rerank_items(*jobs[i]) for i in missing), return_exceptions=True)
+            for i, items in zip(missing, retried):
+                results[i] = items
+        return results
 
-        User Query:
-        {query}
+    def _generate(self, prompt: str, generation_config: dict):
+        """One blocking Gemini call through the circuit breaker (no retries: it holds a worker thread)"""
+        if not self.breaker.allow():
+            raise CircuitOpen("Gemini circuit breaker is open")
+        started = time.perf_counter()
+        try:
+            response = self.model.generate_content(
+                prompt,
+                generation_config=generation_config,
+                safety_settings=self.safety_settings,
+                request_options={"timeout": settings.llm_timeout}
+            )
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+        self.latencies.add(time.perf_counter() - started)
+        return response
 
-        Initial Recommendations (from vector search):
-        {assessments_text}
+    async def _generate_async(self, prompt: str, generation_config: dict):
+        """
+        Gemini call with failure handling
+        
+        Each attempt passes the circuit breaker and times out after settings.llm_timeout.
+        Transient errors are retried with jittered backoff; with settings.llm_hedging,
+        an attempt slower than the recent latency quantile is raced by a second one.
+        
+        Raises:
+            CircuitOpen: the breaker refused the call
+        """
+        async def attempt():
+            if not self.breaker.allow():
+                raise CircuitOpen("Gemini circuit breaker is open")
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(
+                        prompt,
+                        generation_config=generation_config,
+                        safety_settings=self.safety_settings,
+                        request_options={"timeout": settings.llm_timeout}
+                    ),
+                    settings.llm_timeout
+                )
+            except Exception:  # Cancellation (lost hedge race, request budget) is not a failure
+                self.breaker.record(False)
+                raise
+            self.breaker.record(True)
+            self.latencies.add(time.perf_counter() - started)
+            return response
+
+        def on_retry(error: BaseException):
+            logger.warning(f"Retrying Gemini call after {type(error).__name__}: {str(error)}")
+            LLM_RETRIES.inc(kind="retry")
+
+        return await retry_async(
+            lambda: hedged(attempt, self._hedge_delay(), on_hedge=lambda: LLM_RETRIES.inc(kind="hedge")),
+            attempts=settings.llm_max_retries + 1,
+            base_delay=settings.llm_retry_base_delay,
+            max_delay=settings.llm_retry_max_delay,
+            retryable=TRANSIENT_ERRORS,
+            on_retry=on_retry
+        )
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds before a hedged second attempt, None while hedging is off or latencies are unknown"""
+        if not settings.llm_hedging:
+            return None
+        delay = self.latencies.quantile(settings.llm_hedge_quantile)
+        return max(settings.llm_hedge_min_delay, delay) if delay is not None else None
 
-        Instructions:
-        1. Filter to only the most relevant {len(assessments)//2} assessments
-        2. Re-score them (0.0-1.0) based on:
-        - Query relevance
-        - Duration requirements
-        - Test type matching
-        3. Return ONLY a JSON list with exactly {len(assessments)//2} items
-        4. Format: [{{"url": "...", "score": 0.95}}
+    def _record_usage(self, response):
+        """Prompt/response token counts reported by Gemini, when present"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            LLM_TOKENS.observe(getattr(usage, "prompt_token_count", 0) or 0, kind="prompt")
+            LLM_TOKENS.observe(getattr(usage, "candidates_token_count", 0) or 0, kind="response")
 
-        Output must be valid JSON that can be parsed directly.
+    def _create_prompt(self, query: str, assessments: List[Assessment], keep: int) -> str:
         """
+        Create a compact prompt for Gemini
+        
+        Candidates are referenced by their index in `assessments` (no URLs), one line
+        each; descriptions are trimmed so the prompt stays within settings.rerank_token_budget.
+        """
+        candidates = self._candidate_lines(query, assessments, len(PROMPT_TEMPLATE))
+        return PROMPT_TEMPLATE.format(query=" ".join(query.split()), candidates=candidates, keep=keep)
+
+    def _create_batch_prompt(self, jobs: List[Tuple[str, List[Assessment], int]]) -> str:
+        """Prompt for several rerank jobs, numbered in order; each job gets its own token budget"""
+        sections = [
+            JOB_TEMPLATE.format(
+                job=job,
+                keep=keep,
+                query=" ".join(query.split()),
+                candidates=self._candidate_lines(query, assessments, len(JOB_TEMPLATE))
+            )
+            for job, (query, assessments, keep) in enumerate(jobs)
+        ]
+        return BATCH_PROMPT_TEMPLATE.format(n_jobs=len(jobs), jobs="\n\n".join(sections))
 
-    def _parse_response(self, response_text: str, original_assessments: List[Assessment]) -> List[Assessment]:
+    def _candidate_lines(self, query: str, assessments: List[Assessment], template_chars: int) -> str:
+        """id|name|types|duration|remote|adaptive|description lines, trimmed to settings.rerank_token_budget"""
+        rows = [
+            f"{i}|{assess.name}|{','.join(assess.test_type)}|{assess.duration}|"
+            f"{'Y' if assess.remote_support else 'N'}|{'Y' if assess.adaptive_support else 'N'}|"
+            for i, assess in enumerate(assessments)
+        ]
+        fixed_chars = template_chars + len(query) + sum(len(row) + 1 for row in rows)
+        description_chars = max(
+            MIN_DESCRIPTION_CHARS,
+            (settings.rerank_token_budget * CHARS_PER_TOKEN - fixed_chars) // max(1, len(assessments))
+        )
+        return "\n".join(
+            row + _trim(assess.description, description_chars)
+            for row, assess in zip(rows, assessments)
+        )
+
+    def _generation_config(self, keep: int) -> dict:
+        return {
+            "response_mime_type": "application/json",
+            "response_schema": RESPONSE_SCHEMA,
+            "temperature": 0,
+            "max_output_tokens": 16 * keep + 32,  # ~12 tokens per {"id", "score"} item
+        }
+
+    def _batch_generation_config(self, jobs: List[Tuple[str, List[Assessment], int]]) -> dict:
+        return {
+            "response_mime_type": "application/json",
+            "response_schema": BATCH_RESPONSE_SCHEMA,
+            "temperature": 0,
+            "max_output_tokens": sum(16 * keep + 16 for _, _, keep in jobs) + 32,
+        }
+
+    def _cache_key(self, query: str, assessments: List[Assessment], keep: int) -> str:
+        """Cache key: prompt version + model + normalized query + sorted candidate URLs + results kept"""
+        payload = json.dumps([
+            PROMPT_VERSION,
+            self.model.model_name,
+            normalize_query(query),
+            sorted(a.url for a in assessments),
+            keep
+        ])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _parse_response(self, response_text: str, original_assessments: List[Assessment], keep: int) -> List[Assessment]:
         """Parse Gemini's response and validate the results"""
-        #logger.info(response_text)
+        refined_items = self._parse_items(response_text, original_assessments)
+        if refined_items is None:
+            return original_assessments[:keep]  # Fallback to the search order
+        return self._build_assessments(refined_items, original_assessments, keep)
+
+    def _parse_items(self, response_text: str, original_assessments: List[Assessment]) -> Optional[List[dict]]:
+        """
+        Map Gemini's [{id, score}] reply onto candidate URLs
+        
+        Returns:
+            [{url, score}] in the model's order (unknown and repeated ids dropped,
+            scores clamped to 0-1), or None if the reply is not a JSON list
+        """
+        try:
+            response_data = json.loads(response_text)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Failed to parse LLM response: {str(e)}")
+            return None
+        return self._ranking_items(response_data, original_assessments)
+
+    def _parse_batch(self, response_text: str, jobs: List[Tuple[str, List[Assessment], int]]) -> List[Optional[List[dict]]]:
+        """Map a batched [{job, ranking}] reply onto each job's candidates; None for jobs missing or invalid"""
+        results: List[Optional[List[dict]]] = [None] * len(jobs)
         try:
-            # First try to parse as proper JSON
+            response_data = json.loads(response_text)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Failed to parse batched LLM response: {str(e)}")
+            return results
+        if not isinstance(response_data, list):
+            logger.error("Failed to parse batched LLM response: not a list")
+            return results
+        
+        for entry in response_data:
+            if not isinstance(entry, dict):
+                continue
             try:
-                response_data = json.loads(response_text)
-                if isinstance(response_data, list):
-                    refined_items = response_data
-                else:
-                    raise ValueError("Response is not a list")
-            except json.JSONDecodeError:
-                # Fallback to extracting JSON substring
-                json_start = response_text.find('[')
-                json_end = response_text.rfind(']') + 1
-                json_str = response_text[json_start:json_end]
-                
-                # Safely evaluate the string as JSON
-                refined_items = ast.literal_eval(json_str)
-            logger.info(refined_items)
-            refined_assessments = []
-            for item in refined_items:
-                if not item or not isinstance(item, dict):
-                    continue
-                try:
-                    # Normalize field names (Gemini might use different casing)
-                    item_url = item.get('url') or item.get('URL')
-                    item_score = item.get('score') or item.get('Score')
-
-                    if not item_url or item_score is None:
-                        continue
-
-                    # Find matching original assessment
-                    original = next((a for a in original_assessments if a.url == item_url), None)
-                    if not original:
-                        continue
-
-                    refined_assessments.append(Assessment(
-                        url=original.url,
-                        name=original.name,
-                        adaptive_support=original.adaptive_support,
-                        description=original.description,
-                        duration=original.duration,
-                        remote_support=original.remote_support,
-                        test_type=original.test_type,
-                        score=float(item_score)
-                    ))
-                except (KeyError, StopIteration, ValidationError, TypeError) as e:
-                    logger.warning(f"Failed to parse assessment: {str(e)}")
-            
-            return refined_assessments[:len(original_assessments)//2]  # Return top half
+                job = int(entry["job"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= job < len(jobs) and results[job] is None:
+                results[job] = self._ranking_items(entry.get("ranking"), jobs[job][1])
+        return results
+
+    def _ranking_items(self, response_data, original_assessments: List[Assessment]) -> Optional[List[dict]]:
+        """[{id, score}] -> [{url, score}], or None if response_data is not a list"""
+        if not isinstance(response_data, list):
+            logger.error("Failed to parse LLM response: not a list")
+            return None
         
-        except Exception as e:
-            logger.error(f"Failed to parse LLM response: {str(e)}")
-            return original_assessments[:len(original_assessments)//2]  # Fallback to top half
\ No newline at end of file
+        parsed_items = []
+        seen = set()
+        for item in response_data:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item["id"])
+                score = float(item["score"])
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Failed to parse assessment: {str(e)}")
+                continue
+            if not 0 <= index < len(original_assessments) or index in seen:
+                continue
+            seen.add(index)
+            parsed_items.append({"url": original_assessments[index].url, "score": min(1.0, max(0.0, score))})
+        return parsed_items
+
+    def _build_assessments(self, refined_items: List[dict], original_assessments: List[Assessment],
+                           keep: int) -> List[Assessment]:
+        """Map parsed [{url, score}] items back onto the candidate assessments"""
+        originals_by_url = {a.url: a for a in original_assessments}
+        refined_assessments = []
+        for item in refined_items:
+            # Find matching original assessment
+            original = originals_by_url.get(item['url'])
+            if not original:
+                continue
+            try:
+                # Copy of the catalog record: no re-validation; scores were clamped to 0-1 when parsed
+                refined_assessments.append(original.model_copy(update={"score": float(item['score'])}))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Failed to parse assessment: {str(e)}")
+        
+        return refined_assessments[:keep]
@@ -1,11 +1,22 @@
 from fastapi import FastAPI, HTTPException, status
-from pydantic import BaseModel
-from typing import List, Optional
-from app.models import HealthResponse, RecommendationResponse, Query
-from app.database import VectorDB
-from app.llm import GeminiProcessor
-from app.utils import extract_text_from_url
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from typing import List
+from app.models import HealthResponse, ReadinessResponse, RecommendationResponse, Query, BatchQuery, BatchRecommendationResponse
+from app.admission import Overloaded
+from app.pipeline import RecommendationPipeline, build_pipeline
+from app.serialization import batch_response, recommendations_response, stream_event
+from app.config import settings
+from app.fetcher import FetchError, create_fetcher
+from app.metrics import REQUEST_SECONDS, render as render_metrics, server_timing, stage, start_request
+from app.resilience import retry_async
+from app.utils import current_rss_mb
+import asyncio
+import json
 import logging
+import os
+import signal
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -14,10 +25,88 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _load_components(app: FastAPI):
+    """
+    Build the pipeline (heavy imports, model and catalog load) and run the warmup query
+
+    A failed attempt shuts down the pipeline it built, so retries do not pile up
+    threads and open caches.
+    """
+    started = time.perf_counter()
+    pipeline = None
+    try:
+        pipeline = build_pipeline(settings)
+        app.state.startup["startup_seconds"] = round(time.perf_counter() - started, 3)
+        
+        if settings.warmup_query:
+            warmup_started = time.perf_counter()
+            pipeline.vector_db.search(settings.warmup_query, top_k=pipeline.candidate_k(5))
+            app.state.startup["warmup_seconds"] = round(time.perf_counter() - warmup_started, 3)
+        
+        app.state.startup["rss_mb"] = round(current_rss_mb(), 1)
+        app.state.pipeline = pipeline
+        app.state.startup["status"] = "ready"
+        logger.info(
+            f"Ready in {time.perf_counter() - started:.2f}s "
+            f"(startup {app.state.startup['startup_seconds']}s, warmup {app.state.startup['warmup_seconds']}s), "
+            f"RSS {app.state.startup['rss_mb']} MB"
+        )
+    except Exception as e:
+        app.state.startup.update(status="failed", error=str(e))
+        logger.error(f"Failed to load components: {str(e)}")
+        if pipeline is not None:
+            pipeline.shutdown()
+        raise
+
+async def _load_with_retries(app: FastAPI):
+    """_load_components on a worker thread, retried with backoff up to startup_attempts times"""
+    def on_retry(error: BaseException):
+        logger.warning(f"Startup failed ({error}), retrying")
+        app.state.startup["status"] = "starting"
+
+    await retry_async(
+        lambda: asyncio.to_thread(_load_components, app),
+        attempts=settings.startup_attempts,
+        base_delay=settings.startup_retry_base_delay,
+        max_delay=settings.startup_retry_max_delay,
+        retryable=(Exception,),
+        on_retry=on_retry
+    )
+
+def _exit_on_failure(loader: asyncio.Task):
+    """Background load finished: once every attempt failed, log why and stop the process so it gets restarted"""
+    if loader.cancelled() or loader.exception() is None:
+        return
+    logger.critical(
+        f"Startup failed after {settings.startup_attempts} attempts, shutting down", exc_info=loader.exception()
+    )
+    os.kill(os.getpid(), signal.SIGTERM)  # Graceful uvicorn shutdown; app.serve replaces the worker
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy components load here rather than at import, so uvicorn binds immediately
+    app.state.pipeline = None
+    app.state.fetcher = create_fetcher(settings)
+    app.state.startup = {"status": "starting", "startup_seconds": None, "warmup_seconds": None, "rss_mb": None}
+    loader = asyncio.create_task(_load_with_retries(app))
+    if settings.background_startup:
+        loader.add_done_callback(_exit_on_failure)
+    else:
+        await loader
+    
+    yield
+    
+    if not loader.done():
+        loader.cancel()
+    if app.state.pipeline is not None:
+        app.state.pipeline.shutdown()
+    await app.state.fetcher.aclose()
+
 app = FastAPI(
     title="SHL Assessment Recommender",
     description="RAG system for recommending SHL assessments based on job descriptions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware setup
@@ -31,34 +120,193 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
-vector_db = VectorDB()
-gemini_processor = GeminiProcessor()
+_STREAMING_TYPES = (b"application/x-ndjson", b"text/event-stream")
+
+class TimingMiddleware:
+    """Request latency histogram plus a Server-Timing header with the pipeline stage breakdown
+
+    Plain ASGI, so responses pass through unbuffered. Streaming responses send their
+    headers before the later stages run, so they get no Server-Timing; their
+    latency is observed once the last byte is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = start_request()
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = message.get("headers", [])
+                content_type = next((value for name, value in headers if name == b"content-type"), b"")
+                if not content_type.startswith(_STREAMING_TYPES):
+                    header = server_timing(timings, time.perf_counter() - started)
+                    message = {**message, "headers": [*headers, (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=status_code
+            )
+
+if settings.metrics_enabled:
+    app.add_middleware(TimingMiddleware)
+
+def _get_pipeline() -> RecommendationPipeline:
+    pipeline = app.state.pipeline
+    if pipeline is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service is starting up",
+            headers={"Retry-After": "5"}
+        )
+    return pipeline
+
+def _too_many_requests(e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+async def _resolve_queries(queries: List[Query]) -> List[str]:
+    """Query text per request: the query itself, the fetched posting text, or both"""
+    urls = [q.url for q in queries if q.url]
+    pages = []
+    if urls:
+        try:
+            with stage("fetch"):
+                pages = await app.state.fetcher.fetch_many(urls)
+        except FetchError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    pages = iter(pages)
+    return [
+        "\n\n".join(part for part in (q.query, next(pages) if q.url else None) if part)
+        for q in queries
+    ]
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (process is up; see /ready for model/catalog readiness)"""
     return {"status": "healthy"}
 
+@app.get("/ready", response_model=ReadinessResponse)
+async def readiness_check():
+    """Readiness endpoint: 200 once models and catalog are loaded, 503 before that"""
+    startup = {**app.state.startup}
+    if startup["status"] == "ready":
+        startup["rss_mb"] = round(current_rss_mb(), 1)
+        return startup
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=startup)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters of the query and rerank caches"""
+    pipeline = _get_pipeline()
+    stats = pipeline.vector_db.cache_stats()
+    rerank_cache = getattr(pipeline.reranker, "rerank_cache", None)
+    if rerank_cache is not None:
+        stats["rerank_cache"] = rerank_cache.stats()
+    page_cache = app.state.fetcher.stats()
+    if page_cache is not None:
+        stats["page_cache"] = page_cache
+    return stats
+
 @app.post("/recommend", response_model=RecommendationResponse)
 async def recommend_assessments(query: Query):
+    pipeline = _get_pipeline()
+    [text] = await _resolve_queries([query])
     try:
-        # Step 1: Get relevant assessments from vector DB
-        double_k = min(20, 2 * query.top_k)  # Cap at 20 to avoid too many LLM calls
-        relevant_docs = vector_db.search(query.query, top_k=double_k)
-        
-        # Step 2: Process with LLM to refine results
-        refined_results = gemini_processor.refine_recommendations(
-            query=query.query,
-            assessments=relevant_docs
+        # Search runs on a thread pool and the LLM call is awaited,
+        # so the event loop stays free for other requests
+        refined_results = await pipeline.recommend(
+            text, top_k=query.top_k, filters=query.filters, budget_ms=query.latency_budget_ms,
+            search_ef=query.search_ef
         )
         
-        return {"recommendations": refined_results}
+        # Prebuilt JSON fragments instead of re-validating through RecommendationResponse
+        return recommendations_response(refined_results)
     
+    except Overloaded as e:
+        raise _too_many_requests(e)
     except Exception as e:
         logging.error(f"Error in recommendation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/recommend/stream")
+async def recommend_assessments_stream(query: Query):
+    """
+    NDJSON stream: {"event": "candidates", ...} with the first-stage results right
+    after retrieval, then {"event": "refined", ...} with the reranked list
+    """
+    pipeline = _get_pipeline()
+    [text] = await _resolve_queries([query])
+    
+    async def events():
+        try:
+            async for event, assessments in pipeline.recommend_stream(
+                text, top_k=query.top_k, filters=query.filters, budget_ms=query.latency_budget_ms,
+                search_ef=query.search_ef
+            ):
+                yield stream_event(event, assessments)
+        except Exception as e:
+            logging.error(f"Error in streaming recommendation: {str(e)}")
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Don't let proxies buffer the first event
+    )
+
+@app.post("/recommend/batch", response_model=BatchRecommendationResponse)
+async def recommend_assessments_batch(batch: BatchQuery):
+    if len(batch.queries) > settings.batch_max_queries:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.batch_max_queries} queries"
+        )
+    pipeline = _get_pipeline()
+    texts = await _resolve_queries(batch.queries)  # Posting URLs are fetched concurrently
+    try:
+        # One embedding pass and one Chroma query for the whole batch,
+        # then concurrent reranks; results are returned in input order
+        results = await pipeline.recommend_batch(
+            texts,
+            [q.top_k for q in batch.queries],
+            filters=[q.filters for q in batch.queries],
+            budgets_ms=[q.latency_budget_ms for q in batch.queries],
+            search_ef=[q.search_ef for q in batch.queries]
+        )
+        
+        return batch_response(results)
+    
+    except Overloaded as e:
+        raise _too_many_requests(e)
+    except Exception as e:
+        logging.error(f"Error in batch recommendation: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # if __name__ == "__main__":
 #     import uvicorn
 #     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""Lightweight request instrumentation with Prometheus text exposition
+
+Counters and histograms are plain in-process structures (no client library),
+rendered in the Prometheus text format at GET /metrics. `stage()` times a block
+into the per-stage histogram and into the timings of the current request, which
+the HTTP middleware echoes as a `Server-Timing` header. With METRICS_ENABLED off
+every call returns immediately.
+
+Metrics are per process: with several workers, scrape each one.
+"""
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.config import settings
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+REGISTRY: List["_Metric"] = []
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not settings.metrics_enabled or not amount:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not settings.metrics_enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        if not settings.metrics_enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}  # Per bucket, plus +Inf
+        self._sums: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def observe(self, value: float, **labels):
+        if not settings.metrics_enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            snapshot = [(key, list(counts), self._sums[key]) for key, counts in sorted(self._counts.items())]
+        lines = []
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "shl_http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+STAGE_SECONDS = Histogram(
+    "shl_stage_duration_seconds", "Time spent in each recommendation pipeline stage", ["stage"]
+)
+CACHE_REQUESTS = Counter(
+    "shl_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"]
+)
+LLM_FALLBACKS = Counter(
+    "shl_llm_fallbacks_total", "Reranks that fell back to the vector search order", ["reason"]
+)
+LLM_RETRIES = Counter(
+    "shl_llm_retries_total", "Gemini attempts beyond the first, by kind (retry/hedge)", ["kind"]
+)
+CIRCUIT_STATE = Gauge(
+    "shl_circuit_breaker_state", "Circuit breaker state (0 closed, 1 open, 2 half-open)", ["name"]
+)
+RERANK_ROUTES = Counter(
+    "shl_rerank_routes_total", "Confidence-gated rerank decisions by route (skip/shrink/full)", ["route"]
+)
+LLM_BATCH_JOBS = Histogram(
+    "shl_llm_batch_jobs", "Rerank jobs per micro-batched Gemini call", buckets=(1, 2, 4, 8, 16, 32)
+)
+LLM_TOKENS = Histogram(
+    "shl_llm_tokens", "Tokens per Gemini call", ["kind"], buckets=TOKEN_BUCKETS
+)
+COALESCED = Counter(
+    "shl_coalesced_total", "Requests that joined an identical in-flight search or rerank", ["stage"]
+)
+LOAD_SHED = Counter(
+    "shl_load_shed_total", "Reranks refused by admission control, by action (rejected/degraded)", ["action"]
+)
+LLM_INFLIGHT = Gauge(
+    "shl_llm_inflight", "Reranks running or waiting for an admission slot", ["state"]
+)
+
+# Stage timings of the request being served (None outside of a request)
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record_stage(self.name, time.perf_counter() - self.started)
+        return False
+
+def _record_stage(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+_DISABLED = nullcontext()
+
+def stage(name: str):
+    """Context manager timing one pipeline stage (a shared no-op when metrics are disabled)"""
+    return _Stage(name) if settings.metrics_enabled else _DISABLED
+
+def record_stage(name: str, seconds: float):
+    """Record a stage duration measured without stage(), e.g. time spent queued"""
+    if settings.metrics_enabled:
+        _record_stage(name, seconds)
+
+def add_request_timings(timings: Dict[str, float]):
+    """
+    Add stage timings collected in another context (e.g. a call shared by several
+    requests) to the current request's Server-Timing; the histograms already have them
+    """
+    current = _request_timings.get()
+    if current is not None:
+        for name, seconds in timings.items():
+            current[name] = current.get(name, 0.0) + seconds
+
+def record_cache(cache: str, hits: int, misses: int):
+    CACHE_REQUESTS.inc(hits, cache=cache, result="hit")
+    CACHE_REQUESTS.inc(misses, cache=cache, result="miss")
+
+def start_request():
+    """Collect stage timings for the current request; returns the dict they are written to"""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    """Format timings (seconds) as a Server-Timing header value (milliseconds)"""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
@@ -1,8 +1,14 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_validator
 from typing import Optional, List
+from app.config import settings
 
 class Assessment(BaseModel):
-    """Model representing an SHL assessment with test_type as list"""
+    """Model representing an SHL assessment with test_type as list
+    
+    Immutable: catalog entries are shared, scored results are model_copy()s of them.
+    """
+    model_config = ConfigDict(frozen=True)
+    
     url: str = Field(..., description="URL to the assessment")
     name: str = Field(None, description="Name of the assessment")
     adaptive_support: bool = Field(..., description="Whether the assessment supports adaptive testing")
@@ -16,14 +22,52 @@ class Assessment(BaseModel):
         ge=0,
         le=1
     )
+    # Prebuilt JSON of every field but the score (see app.serialization), kept by model_copy
+    _json_prefix: Optional[bytes] = PrivateAttr(default=None)
+
+
+class QueryFilters(BaseModel):
+    """Hard constraints applied before ranking"""
+    max_duration: Optional[int] = Field(None, ge=0, description="Maximum duration in minutes (unknown durations are excluded)")
+    min_duration: Optional[int] = Field(None, ge=0, description="Minimum duration in minutes (unknown durations are excluded)")
+    remote_support: Optional[bool] = Field(None, description="Require (or exclude) remote testing support")
+    adaptive_support: Optional[bool] = Field(None, description="Require (or exclude) adaptive testing support")
+    test_types: Optional[List[str]] = Field(None, description="Match any of these test types (e.g. ['Technical Skills'])")
 
 
 class Query(BaseModel):
-    query: str
-    top_k: Optional[int] = 5
+    query: Optional[str] = Field(None, description="Job description or requirements")
+    url: Optional[str] = Field(None, description="Job posting URL; its text is fetched and used as (or appended to) the query")
+    top_k: int = Field(5, ge=1, le=settings.max_candidates, description="Number of recommendations to return")
+    filters: Optional[QueryFilters] = None
+    latency_budget_ms: Optional[int] = Field(
+        None, gt=0, description="Return the vector search results if reranking has not finished by then"
+    )
+    search_ef: Optional[int] = Field(
+        None, ge=1, le=2000, description="HNSW search breadth for this request: higher recall, slower (Chroma backend)"
+    )
+
+    @model_validator(mode="after")
+    def _require_query_or_url(self):
+        if not (self.query and self.query.strip()) and not self.url:
+            raise ValueError("Either query or url is required")
+        return self
 
 class HealthResponse(BaseModel):
     status: str
 
+class ReadinessResponse(BaseModel):
+    status: str = Field(..., description="starting, ready or failed")
+    startup_seconds: Optional[float] = Field(None, description="Time to load models and catalog")
+    warmup_seconds: Optional[float] = Field(None, description="Time of the warmup query")
+    rss_mb: Optional[float] = Field(None, description="Resident memory of this worker")
+    error: Optional[str] = None
+
 class RecommendationResponse(BaseModel):
     recommendations: List[Assessment]
+
+class BatchQuery(BaseModel):
+    queries: List[Query] = Field(..., min_length=1, description="Queries to score, results keep this order")
+
+class BatchRecommendationResponse(BaseModel):
+    results: List[RecommendationResponse]
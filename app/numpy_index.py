@@ -0,0 +1,154 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+
+class NumpyIndex:
+    """Exact cosine search over a contiguous, row-normalized embedding matrix
+
+    One matrix product plus `argpartition` per batch of queries. Rows can be
+    stored as float32, float16 or int8 (symmetric per-row scale) to trade a
+    little accuracy for memory. Filterable metadata lives in columnar arrays
+    aligned with the rows, so filters become a boolean mask.
+    """
+
+    _BLOCK_ROWS = 16384  # Rows upcast at a time for quantized matrices
+
+    def __init__(self, dtype: str = "float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype}, expected one of {DTYPES}")
+        self.dtype = dtype
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}  # id -> row
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.scales: Optional[np.ndarray] = None  # Per-row dequantization scale (int8 only)
+        self.columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def build(self, ids: Sequence[str], embeddings, fields: Optional[Sequence[dict]] = None) -> "NumpyIndex":
+        """
+        (Re)build the index
+
+        Args:
+            ids: Document ids, one per row
+            embeddings: Row vectors (any array-like of shape (n, dim))
+            fields: Optional filter fields per row (see app.filters.filter_fields)
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+        if self.dtype == "float16":
+            matrix = matrix.astype(np.float16)
+        elif self.dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127
+            scales[scales == 0] = 1
+            matrix = np.round(matrix / scales[:, None]).astype(np.int8)
+            self.scales = scales.astype(np.float32)
+
+        self.matrix = np.ascontiguousarray(matrix)
+        self.ids = list(ids)
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.columns = self._build_columns(fields or [{} for _ in ids])
+        return self
+
+    @staticmethod
+    def _build_columns(fields: Sequence[dict]) -> Dict[str, np.ndarray]:
+        keys = sorted({key for row in fields for key in row})
+        columns = {}
+        for key in keys:
+            values = [row.get(key) for row in fields]
+            if key.startswith("type_") or key.startswith("is_"):
+                columns[key] = np.array([bool(v) for v in values], dtype=bool)
+            else:
+                columns[key] = np.array([v if v is not None else -1 for v in values], dtype=np.int32)
+        return columns
+
+    def save(self, path) -> None:
+        """Write the index as plain .npy files so it can be memory-mapped by other processes"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "matrix.npy", self.matrix)
+        if self.scales is not None:
+            np.save(path / "scales.npy", self.scales)
+        np.savez(path / "columns.npz", **self.columns)
+        with open(path / "ids.json", "w") as f:
+            json.dump({"dtype": self.dtype, "ids": self.ids}, f)
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "NumpyIndex":
+        """
+        Load an index written by save()
+
+        With mmap the embedding matrix is mapped read-only, so every process
+        serving the same file shares one copy through the page cache.
+        """
+        path = Path(path)
+        with open(path / "ids.json") as f:
+            header = json.load(f)
+        index = cls(header["dtype"])
+        index.ids = header["ids"]
+        index.rows = {doc_id: row for row, doc_id in enumerate(index.ids)}
+        index.matrix = np.load(path / "matrix.npy", mmap_mode="r" if mmap else None)
+        if (path / "scales.npy").exists():
+            index.scales = np.load(path / "scales.npy")
+        with np.load(path / "columns.npz") as columns:
+            index.columns = {key: columns[key] for key in columns.files}
+        return index
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        if self.matrix.dtype == np.float32:
+            scores = queries @ self.matrix.T
+        else:
+            scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+            for start in range(0, len(self.ids), self._BLOCK_ROWS):
+                block = self.matrix[start:start + self._BLOCK_ROWS].astype(np.float32)
+                scores[:, start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def search(self, query_embeddings, top_k: int,
+               mask: Optional[np.ndarray] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Exact top-k cosine similarity search
+
+        Args:
+            query_embeddings: Query vectors, shape (n_queries, dim)
+            top_k: Number of results per query
+            mask: Optional boolean row mask; False rows are never returned
+
+        Returns:
+            (id, cosine similarity) pairs per query, best first
+        """
+        if not self.ids:
+            return [[] for _ in range(len(query_embeddings))]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        scores = self._scores(queries)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        k = min(top_k, len(self.ids))
+        if k < len(self.ids):
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(len(self.ids)), (len(queries), 1))
+
+        results = []
+        for row, candidates in zip(scores, top):
+            order = candidates[np.argsort(-row[candidates], kind="stable")]
+            results.append([
+                (self.ids[i], float(row[i])) for i in order if np.isfinite(row[i])
+            ])
+        return results
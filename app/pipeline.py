@@ -0,0 +1,300 @@
+import asyncio
+import contextvars
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, List, Optional, Tuple
+from app.admission import AdmissionController, Overloaded, SingleFlight
+from app.cache import normalize_query
+from app.filters import filters_key
+from app.metrics import LLM_FALLBACKS, LOAD_SHED, RERANK_ROUTES, stage
+from app.models import Assessment, QueryFilters
+from app.routing import first_stage_scores
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RecommendationPipeline:
+    """Async two-stage recommendation pipeline (vector search + reranking)
+
+    The blocking stages never run on the event loop: embedding and the ANN
+    lookup go to a bounded thread pool, the reranker (Gemini by default) uses
+    its async path. Each stage has its own concurrency limit so a slow LLM
+    cannot starve search.
+
+    Identical concurrent searches and reranks are coalesced into one call.
+    Reranks pass admission control: beyond `llm_concurrency` running and
+    `llm_max_queue` waiting, requests are shed, either degraded to the vector
+    search results or rejected with Overloaded (`overload_policy`). A rerank
+    still running when the request's latency budget is spent is abandoned
+    for the vector search results too. Batch reranks are never shed: they
+    queue for their own `batch_llm_concurrency` slots and only an explicit
+    per-query budget cuts them short. With a `rerank_gate`, confident
+    first-stage rankings skip the reranker (see app.routing).
+    """
+
+    def __init__(self, vector_db, reranker, search_workers: int = 4,
+                 search_concurrency: int = 16, llm_concurrency: int = 8,
+                 candidate_multiplier: float = 2.0, max_candidates: int = 20,
+                 llm_max_queue: int = 32, overload_policy: str = "degrade",
+                 retry_after: int = 2, coalesce: bool = True, latency_budget_ms: float = 0,
+                 rerank_gate=None, batch_llm_concurrency: int = 4):
+        if overload_policy not in ("degrade", "reject"):
+            raise ValueError(f"Unknown overload policy: {overload_policy}")
+        self.vector_db = vector_db
+        self.reranker = reranker
+        self.candidate_multiplier = candidate_multiplier
+        self.max_candidates = max_candidates
+        self.search_concurrency = search_concurrency
+        self.batch_llm_concurrency = batch_llm_concurrency
+        self.overload_policy = overload_policy
+        self.coalesce = coalesce
+        self.latency_budget_ms = latency_budget_ms
+        self.rerank_gate = rerank_gate
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=search_workers,
+            thread_name_prefix="vector-search"
+        )
+        # Created lazily so it binds to the server's event loop
+        self._search_limit: Optional[asyncio.Semaphore] = None
+        self._batch_llm_limit: Optional[asyncio.Semaphore] = None
+        self._llm_admission = AdmissionController(llm_concurrency, llm_max_queue, retry_after=retry_after)
+        self._search_flights = SingleFlight("search")
+        self._rerank_flights = SingleFlight("rerank")
+
+    def _search_semaphore(self) -> asyncio.Semaphore:
+        if self._search_limit is None:
+            self._search_limit = asyncio.Semaphore(self.search_concurrency)
+        return self._search_limit
+
+    def _batch_llm_semaphore(self) -> asyncio.Semaphore:
+        if self._batch_llm_limit is None:
+            self._batch_llm_limit = asyncio.Semaphore(self.batch_llm_concurrency)
+        return self._batch_llm_limit
+
+    async def search(self, query: str, top_k: int, filters: Optional[QueryFilters] = None,
+                     search_ef: Optional[int] = None) -> List[Assessment]:
+        """Run VectorDB.search on the search thread pool, sharing identical in-flight searches"""
+        if not self.coalesce:
+            return await self._search(query, top_k, filters, search_ef)
+        key = (normalize_query(query), top_k, filters_key(filters), search_ef)
+        return list(await self._search_flights.do(key, lambda: self._search(query, top_k, filters, search_ef)))
+
+    async def _search(self, query: str, top_k: int, filters: Optional[QueryFilters] = None,
+                      search_ef: Optional[int] = None) -> List[Assessment]:
+        async with self._search_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._search_executor,
+                # copy_context: stage timings recorded on the thread belong to this request
+                partial(contextvars.copy_context().run, self.vector_db.search, query,
+                        top_k=top_k, filters=filters, search_ef=search_ef)
+            )
+
+    async def search_batch(self, queries: List[str], top_ks: List[int],
+                           filters: Optional[List[Optional[QueryFilters]]] = None,
+                           search_ef: Optional[List[Optional[int]]] = None) -> List[List[Assessment]]:
+        """Run VectorDB.search_batch (one encoder pass, one ANN query) on the search thread pool"""
+        async with self._search_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._search_executor,
+                partial(contextvars.copy_context().run, self.vector_db.search_batch, queries,
+                        top_k=top_ks, filters=filters, search_ef=search_ef)
+            )
+
+    async def refine(self, query: str, assessments: List[Assessment], top_k: Optional[int] = None) -> List[Assessment]:
+        """
+        Re-rank candidates with the configured reranker without blocking the event loop,
+        returning top_k of them (None = the reranker's default)
+        
+        Raises:
+            Overloaded: the rerank stage is saturated (see admission control)
+        """
+        if not self.coalesce:
+            return await self._refine(query, assessments, top_k)
+        key = (normalize_query(query), tuple(a.url for a in assessments), top_k)
+        return list(await self._rerank_flights.do(key, lambda: self._refine(query, assessments, top_k)))
+
+    async def _refine(self, query: str, assessments: List[Assessment], top_k: Optional[int] = None) -> List[Assessment]:
+        async with self._llm_admission.admit():
+            with stage("rerank"):
+                return await self.reranker.refine_recommendations_async(
+                    query=query,
+                    assessments=assessments,
+                    top_k=top_k
+                )
+
+    async def _refine_queued(self, query: str, assessments: List[Assessment],
+                             top_k: Optional[int] = None) -> List[Assessment]:
+        """Rerank for a batch entry: waits for a batch slot instead of passing admission control"""
+        async with self._batch_llm_semaphore():
+            with stage("rerank"):
+                return await self.reranker.refine_recommendations_async(
+                    query=query,
+                    assessments=assessments,
+                    top_k=top_k
+                )
+
+    def _deadline(self, budget_ms: Optional[float]) -> Optional[float]:
+        """time.monotonic() by which a request with this budget (None = the default) must answer"""
+        budget_ms = budget_ms or self.latency_budget_ms
+        return time.monotonic() + budget_ms / 1000 if budget_ms else None
+
+    async def _refine_or_shed(self, query: str, assessments: List[Assessment], top_k: int,
+                              policy: Optional[str] = None, deadline: Optional[float] = None,
+                              batch: bool = False) -> List[Assessment]:
+        """
+        refine(), degrading to the top_k vector search results when the deadline passes
+        or the rerank stage is overloaded (where the policy may re-raise Overloaded instead).
+        With batch, the rerank queues for a batch slot (_refine_queued) and is never shed.
+        """
+        refine = self._refine_queued if batch else self.refine
+        try:
+            if deadline is None:
+                return await refine(query, assessments, top_k)
+            return await asyncio.wait_for(refine(query, assessments, top_k), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            LLM_FALLBACKS.inc(reason="budget")
+            logger.warning("Rerank exceeded the latency budget, returning vector search results")
+            return assessments[:top_k]
+        except Overloaded:
+            if (policy or self.overload_policy) == "reject":
+                LOAD_SHED.inc(action="rejected")
+                raise
+            LOAD_SHED.inc(action="degraded")
+            logger.warning("Rerank stage saturated, returning vector search results")
+            return assessments[:top_k]
+
+    async def _gated_refine(self, query: str, assessments: List[Assessment], top_k: int,
+                            policy: Optional[str] = None, deadline: Optional[float] = None,
+                            batch: bool = False) -> List[Assessment]:
+        """_refine_or_shed() behind the rerank gate: skipped, or limited to the candidates after a decisive head"""
+        if self.rerank_gate is None:
+            return await self._refine_or_shed(query, assessments, top_k, policy=policy, deadline=deadline, batch=batch)
+        
+        route, pinned = self.rerank_gate.route(
+            query, first_stage_scores(assessments), top_k, self.candidate_k(top_k)
+        )
+        RERANK_ROUTES.inc(route=route)
+        if route == "skip":
+            return assessments[:top_k]
+        if route == "shrink":
+            remaining = top_k - pinned
+            tail = await self._refine_or_shed(
+                query, assessments[pinned:pinned + self.candidate_k(remaining)], remaining, policy=policy,
+                deadline=deadline, batch=batch
+            )
+            return assessments[:pinned] + tail
+        return await self._refine_or_shed(query, assessments, top_k, policy=policy, deadline=deadline, batch=batch)
+
+    async def recommend(self, query: str, top_k: int = 5, filters: Optional[QueryFilters] = None,
+                        budget_ms: Optional[float] = None, search_ef: Optional[int] = None) -> List[Assessment]:
+        """
+        Get refined recommendations for a query
+
+        Args:
+            query: Search query or job description
+            top_k: Number of recommendations requested
+            filters: Hard constraints applied before ranking
+            budget_ms: Latency budget (None = latency_budget_ms)
+            search_ef: HNSW search breadth for this request (None = the collection's)
+
+        Returns:
+            Refined list of Assessment objects
+        """
+        deadline = self._deadline(budget_ms)
+        # Step 1: Get relevant assessments from vector DB
+        relevant_docs = await self.search(query, self.candidate_k(top_k), filters=filters, search_ef=search_ef)
+
+        # Step 2: Rerank with the LLM (or local cross-encoder) to refine results
+        return await self._gated_refine(query, relevant_docs, top_k, deadline=deadline)
+
+    async def recommend_stream(self, query: str, top_k: int = 5, filters: Optional[QueryFilters] = None,
+                               budget_ms: Optional[float] = None,
+                               search_ef: Optional[int] = None) -> AsyncIterator[Tuple[str, List[Assessment]]]:
+        """
+        Recommendations in two steps, for progressive rendering
+
+        Yields ("candidates", first-stage results cut to top_k) as soon as the
+        search returns, then ("refined", reranked results) once the reranker finishes.
+        """
+        deadline = self._deadline(budget_ms)
+        relevant_docs = await self.search(query, self.candidate_k(top_k), filters=filters, search_ef=search_ef)
+        yield "candidates", relevant_docs[:top_k]
+        # Candidates are already out, so a saturated reranker degrades rather than failing the stream
+        yield "refined", await self._gated_refine(query, relevant_docs, top_k, policy="degrade", deadline=deadline)
+
+    async def recommend_batch(self, queries: List[str], top_ks: List[int],
+                              filters: Optional[List[Optional[QueryFilters]]] = None,
+                              budgets_ms: Optional[List[Optional[float]]] = None,
+                              search_ef: Optional[List[Optional[int]]] = None) -> List[List[Assessment]]:
+        """
+        Get refined recommendations for many queries
+
+        Retrieval for the whole batch is a single search_batch call; reranks then
+        run concurrently on the batch slots (batch_llm_concurrency). They wait for
+        a slot rather than being shed, and the default latency budget does not
+        apply: a batch entry is reranked unless its own budget runs out.
+
+        Args:
+            queries: Search queries or job descriptions
+            top_ks: Number of recommendations requested per query
+            filters: Hard constraints per query
+            budgets_ms: Latency budget per query (None = no budget)
+            search_ef: HNSW search breadth per query (None = the collection's)
+
+        Returns:
+            One refined list of Assessment objects per query, in input order
+        """
+        deadlines = [self._deadline(budget) if budget else None for budget in (budgets_ms or [None] * len(queries))]
+        candidates = await self.search_batch(
+            queries, [self.candidate_k(k) for k in top_ks], filters=filters, search_ef=search_ef
+        )
+        return list(await asyncio.gather(*(
+            self._gated_refine(query, relevant_docs, top_k, deadline=deadline, batch=True)
+            for query, relevant_docs, top_k, deadline in zip(queries, candidates, top_ks, deadlines)
+        )))
+
+    def candidate_k(self, top_k: int) -> int:
+        """Candidates fetched for the reranker to choose from"""
+        # Capped (20 by default) to avoid too many LLM tokens, but never fewer than top_k
+        return max(top_k, min(self.max_candidates, math.ceil(self.candidate_multiplier * top_k)))
+
+    def shutdown(self):
+        """Stop the search threads and close the vector DB and the reranker"""
+        self._search_executor.shutdown(wait=False)
+        for component in (self.vector_db, self.reranker):
+            if hasattr(component, "close"):
+                component.close()
+
+
+def build_pipeline(settings) -> RecommendationPipeline:
+    """Construct the vector DB, reranker and pipeline; this is where the heavy imports and model loads happen"""
+    from app.database import VectorDB
+    from app.rerankers import create_reranker
+    from app.routing import RerankGate
+
+    vector_db = VectorDB(snapshot_path=settings.snapshot_path if settings.serve_from_snapshot else None)
+    try:
+        reranker = create_reranker(settings)
+    except Exception:
+        vector_db.close()
+        raise
+    return RecommendationPipeline(
+        vector_db,
+        reranker,
+        search_workers=settings.search_workers,
+        search_concurrency=settings.search_concurrency,
+        llm_concurrency=settings.llm_concurrency,
+        candidate_multiplier=settings.candidate_multiplier,
+        max_candidates=settings.max_candidates,
+        llm_max_queue=settings.llm_max_queue,
+        overload_policy=settings.overload_policy,
+        retry_after=settings.overload_retry_after,
+        coalesce=settings.coalesce_requests,
+        latency_budget_ms=settings.latency_budget_ms,
+        rerank_gate=RerankGate.from_settings(settings) if settings.rerank_gate else None,
+        batch_llm_concurrency=settings.batch_llm_concurrency
+    )
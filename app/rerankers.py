@@ -0,0 +1,148 @@
+import asyncio
+import time
+from typing import List, Optional
+from app.lexical import tokenize
+from app.models import Assessment
+import logging
+
+logger = logging.getLogger(__name__)
+
+def keep_count(n_candidates: int, top_k: Optional[int]) -> int:
+    """Results a reranker returns: top_k (at most every candidate), or the top half when top_k is not given"""
+    return min(n_candidates, top_k) if top_k else n_candidates // 2
+
+
+class Reranker:
+    """Second-stage reranker: takes vector search candidates and returns the refined top_k"""
+
+    def refine_recommendations(self, query: str, assessments: List[Assessment],
+                               top_k: Optional[int] = None) -> List[Assessment]:
+        raise NotImplementedError
+
+    async def refine_recommendations_async(self, query: str, assessments: List[Assessment],
+                                           top_k: Optional[int] = None) -> List[Assessment]:
+        """Default async path: run the blocking implementation in a worker thread"""
+        return await asyncio.to_thread(self.refine_recommendations, query, assessments, top_k)
+
+    def close(self):
+        """Release connections and files held by the reranker"""
+
+
+class CrossEncoderReranker(Reranker):
+    """Local cross-encoder reranker, needs no network access
+
+    Scores every (query, assessment) pair in one batched forward pass on CPU.
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu", batch_size: int = 32):
+        try:
+            from sentence_transformers import CrossEncoder
+            import torch
+
+            self.model = CrossEncoder(model_name, device=device)
+            self.activation_fn = torch.nn.Sigmoid()  # Map logits to 0-1 relevance scores
+            self.batch_size = batch_size
+            logger.info(f"Cross-encoder reranker initialized with {model_name}")
+        except Exception as e:
+            logger.error(f"Failed to initialize cross-encoder: {str(e)}")
+            raise
+
+    def refine_recommendations(self, query: str, assessments: List[Assessment],
+                               top_k: Optional[int] = None) -> List[Assessment]:
+        """
+        Re-rank assessments with the cross-encoder
+
+        Args:
+            query: Original user query
+            assessments: List of assessments from vector search
+            top_k: Number of results to return (None = half the candidates)
+
+        Returns:
+            The top_k assessments, re-scored and sorted
+        """
+        if not assessments:
+            return assessments
+
+        try:
+            scores = self.model.predict(
+                [(query, self._create_document_text(assess)) for assess in assessments],
+                batch_size=self.batch_size,
+                activation_fn=self.activation_fn,
+                show_progress_bar=False
+            )
+            ranked = sorted(zip(assessments, scores), key=lambda pair: pair[1], reverse=True)
+            return [
+                assess.model_copy(update={"score": float(score)})
+                for assess, score in ranked[:keep_count(len(assessments), top_k)]
+            ]
+
+        except Exception as e:
+            logger.error(f"Cross-encoder reranking failed: {str(e)}")
+            return assessments[:keep_count(len(assessments), top_k)]  # Fallback to original order
+
+    def _create_document_text(self, assess: Assessment) -> str:
+        return (
+            f"{assess.name}. {assess.description}. "
+            f"Types: {', '.join(assess.test_type)}. "
+            f"Duration: {assess.duration}. "
+            f"Remote: {'Yes' if assess.remote_support else 'No'}. "
+            f"Adaptive: {'Yes' if assess.adaptive_support else 'No'}"
+        )
+
+
+class StubReranker(Reranker):
+    """Deterministic local stand-in for Gemini, for benchmarks and offline runs
+
+    Re-scores candidates by the share of query terms found in their text and
+    waits a fixed latency, so runs are repeatable and cost no API calls.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+
+    def refine_recommendations(self, query: str, assessments: List[Assessment],
+                               top_k: Optional[int] = None) -> List[Assessment]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._rank(query, assessments, top_k)
+
+    async def refine_recommendations_async(self, query: str, assessments: List[Assessment],
+                                           top_k: Optional[int] = None) -> List[Assessment]:
+        # Waits like a network call: the event loop stays free, no worker thread is held
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._rank(query, assessments, top_k)
+
+    def _rank(self, query: str, assessments: List[Assessment], top_k: Optional[int] = None) -> List[Assessment]:
+        query_terms = set(tokenize(query))
+        scored = []
+        for assess in assessments:
+            terms = set(tokenize(f"{assess.name} {assess.description} {' '.join(assess.test_type)}"))
+            overlap = len(query_terms & terms) / len(query_terms) if query_terms else 0.0
+            scored.append(assess.model_copy(update={"score": round(overlap, 4)}))
+        scored.sort(key=lambda assess: assess.score, reverse=True)  # Stable: ties keep search order
+        return scored[:keep_count(len(assessments), top_k)]
+
+
+def create_reranker(settings) -> Reranker:
+    """Build the reranker selected by `settings.reranker` ("gemini", "cross-encoder", "stub" or "fake-gemini")"""
+    if settings.reranker == "gemini":
+        from app.llm import GeminiProcessor
+        return GeminiProcessor()
+    if settings.reranker == "fake-gemini":
+        from app.fake_llm import FakeGenerativeModel
+        from app.llm import GeminiProcessor
+        return GeminiProcessor(model=FakeGenerativeModel(
+            latency_ms=settings.fake_llm_latency_ms,
+            error_rate=settings.fake_llm_error_rate,
+            hang_rate=settings.fake_llm_hang_rate
+        ))
+    if settings.reranker == "cross-encoder":
+        return CrossEncoderReranker(
+            settings.cross_encoder_model,
+            device=settings.cross_encoder_device,
+            batch_size=settings.cross_encoder_batch_size
+        )
+    if settings.reranker == "stub":
+        return StubReranker(latency_ms=settings.stub_rerank_latency_ms)
+    raise ValueError(f"Unknown reranker: {settings.reranker}")
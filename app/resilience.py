@@ -0,0 +1,155 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+from app.metrics import CIRCUIT_STATE
+
+T = TypeVar("T")
+
+class CircuitOpen(Exception):
+    """The circuit breaker is open: the remote service is skipped until it recovers"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing service and probes it for recovery
+
+    closed: calls pass and the outcomes of the last `window` calls are kept; once at
+        least `min_calls` are recorded and `failure_ratio` of them failed, it opens.
+    open: calls are refused for `cooldown` seconds, then it turns half-open.
+    half-open: one probe call at a time passes; success closes, failure opens again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    _STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+    def __init__(self, name: str, window: int = 20, failure_ratio: float = 0.5,
+                 min_calls: int = 10, cooldown: float = 30.0):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.set(self._STATE_VALUES[state], name=self.name)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (in half-open state, claims the probe)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.cooldown:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            # A probe whose result never came back (e.g. cancelled) is given up after the cooldown
+            if self._probe_started is not None and now - self._probe_started < self.cooldown:
+                return False
+            self._probe_started = now
+            return True
+
+    def record(self, success: bool):
+        """Report the outcome of an allowed call"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_started = None
+                if success:
+                    self._outcomes.clear()
+                    self._set_state(self.CLOSED)
+                else:
+                    self._open()
+                return
+            if self.state == self.OPEN:
+                return  # Late result of a call made before the breaker opened
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_ratio:
+                self._open()
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._set_state(self.OPEN)
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The q-quantile, or None until min_samples latencies are recorded"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base_delay * 2**attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+async def retry_async(fn: Callable[[], Awaitable[T]], attempts: int, base_delay: float, max_delay: float,
+                      retryable: Tuple[Type[BaseException], ...],
+                      on_retry: Optional[Callable[[BaseException], None]] = None) -> T:
+    """
+    Await fn(), retrying transient failures with jittered exponential backoff
+
+    Args:
+        fn: Starts one attempt
+        attempts: Total attempts, including the first
+        retryable: Exception types worth retrying; anything else is raised at once
+        on_retry: Called with the error before each retry
+    """
+    for attempt in range(attempts):
+        try:
+            return await fn()
+        except retryable as e:
+            if attempt == attempts - 1:
+                raise
+            if on_retry is not None:
+                on_retry(e)
+            await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
+
+async def hedged(fn: Callable[[], Awaitable[T]], delay: Optional[float],
+                 on_hedge: Optional[Callable[[], None]] = None) -> T:
+    """
+    Await fn(); if it has not finished after `delay` seconds, start a second call and
+    return whichever succeeds first. The loser is cancelled. Only when both fail is
+    the first error raised. With delay None, this is just `await fn()`.
+    """
+    if delay is None:
+        return await fn()
+
+    tasks = [asyncio.ensure_future(fn())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return tasks[0].result()
+        if on_hedge is not None:
+            on_hedge()
+        tasks.append(asyncio.ensure_future(fn()))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
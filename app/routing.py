@@ -0,0 +1,226 @@
+"""Confidence-gated reranking
+
+The first-stage ranking is often decisive already, e.g. a short keyword query
+with a clear winner set. `RerankGate` reads the shape of the candidate scores and
+the query and routes each request to:
+
+- "skip": return the first-stage top_k without calling the reranker
+- "shrink": keep the decisive head of the ranking and rerank only the rest, with
+  fewer candidates
+- "full": rerank all candidates
+
+The features are computed from the candidates' scores, their cosine
+similarities to the query (also with hybrid search, which only reorders
+them). The skip thresholds are calibrated offline
+on a labeled query set, by trading skip rate against precision@k with and
+without the reranker.
+
+Usage:
+    python -m app.routing [--queries data/test_queries.json] [--synthetic-queries 200]
+                          [--max-precision-loss 0.0] [--output cache/rerank_gate.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+from pathlib import Path
+from typing import List, Sequence, Tuple
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROUTES = ("skip", "shrink", "full")
+
+# Softmax temperature for the entropy feature: all-MiniLM-L6-v2 was trained with a contrastive
+# scale of 20, so similarity gaps of a few hundredths already separate the candidates
+SOFTMAX_TEMPERATURE = 0.05
+
+MARGIN_GRID = (0.0, 0.005, 0.01, 0.02, 0.03, 0.04, 0.05, 0.075, 0.1, 0.15, 0.2, 1.01)
+ENTROPY_GRID = (0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+QUERY_WORDS_GRID = (4, 8, 12, 16, 24, 48, 1_000_000)
+
+def first_stage_scores(assessments) -> List[float]:
+    """Vector similarities of first-stage results, in ranking order"""
+    return [a.score for a in assessments]
+
+def confidence_features(scores: Sequence[float], top_k: int, query: str, candidate_k: int) -> dict:
+    """
+    Confidence features of a first-stage ranking
+
+    Args:
+        scores: Cosine similarities of the candidates, in ranking order (see first_stage_scores)
+
+    Returns:
+        margin: gap between the k-th and (k+1)-th similarity, relative to the top one
+            (1.0 when there is no (k+1)-th candidate; negative when fusion reordered them)
+        entropy: Shannon entropy of softmax(similarity / SOFTMAX_TEMPERATURE), normalized
+            to 0-1 (low = mass concentrated on a few candidates)
+        query_words: query length in words
+        coverage: candidates found / candidates requested (below 1 when filters leave few matches)
+    """
+    top = scores[0] if scores and scores[0] > 0 else 1.0
+    margin = (scores[top_k - 1] - scores[top_k]) / top if len(scores) > top_k else 1.0
+    entropy = 0.0
+    if len(scores) > 1:
+        best = max(scores)
+        weights = [math.exp((score - best) / SOFTMAX_TEMPERATURE) for score in scores]
+        total = sum(weights)
+        entropy = -sum(w / total * math.log(w / total) for w in weights if w > 0) / math.log(len(scores))
+    return {
+        "margin": margin,
+        "entropy": entropy,
+        "query_words": len(query.split()),
+        "coverage": len(scores) / candidate_k if candidate_k else 1.0,
+    }
+
+
+class RerankGate:
+    """Routes a request to skip, shrink or full reranking from its confidence features"""
+
+    def __init__(self, min_margin: float = 0.04, max_entropy: float = 0.5,
+                 max_query_words: int = 12, shrink: bool = True):
+        self.min_margin = min_margin
+        self.max_entropy = max_entropy
+        self.max_query_words = max_query_words
+        self.shrink = shrink
+
+    @classmethod
+    def from_settings(cls, settings) -> "RerankGate":
+        """Thresholds from the calibration file when it exists, else from settings"""
+        thresholds = {
+            "min_margin": settings.rerank_gate_min_margin,
+            "max_entropy": settings.rerank_gate_max_entropy,
+            "max_query_words": settings.rerank_gate_max_query_words,
+        }
+        path = Path(settings.rerank_gate_path)
+        if path.exists():
+            calibrated = json.loads(path.read_text())
+            thresholds.update({key: calibrated[key] for key in thresholds if key in calibrated})
+            logger.info(f"Loaded rerank gate thresholds from {path}: {thresholds}")
+        return cls(shrink=settings.rerank_gate_shrink, **thresholds)
+
+    def is_confident(self, features: dict) -> bool:
+        return (
+            features["margin"] >= self.min_margin
+            and features["entropy"] <= self.max_entropy
+            and features["query_words"] <= self.max_query_words
+        )
+
+    def pinned(self, scores: Sequence[float], top_k: int) -> int:
+        """Length of the decisive head: the last rank before top_k followed by a min_margin gap (0 if none)"""
+        top = scores[0] if scores and scores[0] > 0 else 1.0
+        for rank in range(min(top_k, len(scores)) - 1, 0, -1):
+            if (scores[rank - 1] - scores[rank]) / top >= self.min_margin:
+                return rank
+        return 0
+
+    def route(self, query: str, scores: Sequence[float], top_k: int, candidate_k: int) -> Tuple[str, int]:
+        """
+        Returns:
+            (route, pinned): one of ROUTES, and for "shrink" the number of leading
+            candidates kept as they are
+        """
+        features = confidence_features(scores, top_k, query, candidate_k)
+        if features["coverage"] * candidate_k <= top_k:
+            # Filters left no more than top_k candidates: the reranker could only drop results
+            return "skip", 0
+        if self.is_confident(features):
+            return "skip", 0
+        pinned = self.pinned(scores, top_k) if self.shrink else 0
+        return ("shrink", pinned) if pinned else ("full", 0)
+
+
+def calibrate(samples: List[dict], max_precision_loss: float = 0.0) -> dict:
+    """
+    Pick the skip thresholds with the highest skip rate whose precision@k stays
+    within max_precision_loss of always reranking
+
+    Args:
+        samples: Per query: features, and precision@k of the first-stage ("first")
+            and the reranked ("reranked") top_k
+    """
+    baseline = sum(sample["reranked"] for sample in samples) / len(samples)
+    best = None
+    for min_margin, max_entropy, max_query_words in itertools.product(MARGIN_GRID, ENTROPY_GRID, QUERY_WORDS_GRID):
+        gate = RerankGate(min_margin, max_entropy, max_query_words)
+        skipped = [gate.is_confident(sample["features"]) for sample in samples]
+        precision = sum(
+            sample["first"] if skip else sample["reranked"] for sample, skip in zip(samples, skipped)
+        ) / len(samples)
+        if precision < baseline - max_precision_loss:
+            continue
+        candidate = (sum(skipped) / len(samples), precision, min_margin, max_entropy, max_query_words)
+        # Highest skip rate, then best precision, then the strictest thresholds
+        key = (candidate[0], candidate[1], candidate[2], -candidate[3], -candidate[4])
+        if best is None or key > best[0]:
+            best = (key, candidate)
+    skip_rate, precision, min_margin, max_entropy, max_query_words = best[1]
+    return {
+        "min_margin": min_margin,
+        "max_entropy": max_entropy,
+        "max_query_words": max_query_words,
+        "skip_rate": round(skip_rate, 4),
+        "precision_gated": round(precision, 4),
+        "precision_reranked": round(baseline, 4),
+    }
+
+async def collect_samples(pipeline, entries: List[dict], top_k: int) -> List[dict]:
+    """First-stage and reranked precision@k plus confidence features for each labeled query"""
+    from app.evaluation import normalize_url, precision_at_k
+
+    candidate_k = pipeline.candidate_k(top_k)
+    samples = []
+    for entry in entries:
+        relevant = [normalize_url(url) for url in entry["relevant_assessments"]]
+        candidates = await pipeline.search(entry["query"], candidate_k)
+        reranked = await pipeline.refine(entry["query"], candidates, top_k)
+        samples.append({
+            "features": confidence_features(first_stage_scores(candidates), top_k, entry["query"], candidate_k),
+            "first": precision_at_k([normalize_url(a.url) for a in candidates[:top_k]], relevant, k=top_k),
+            "reranked": precision_at_k([normalize_url(a.url) for a in reranked[:top_k]], relevant, k=top_k),
+        })
+    return samples
+
+def main():
+    from app.evaluation import DATA_DIR, synthetic_queries
+    from app.pipeline import build_pipeline
+
+    parser = argparse.ArgumentParser(description="Calibrate the confidence-gated rerank thresholds")
+    parser.add_argument("--queries", default=str(DATA_DIR / "test_queries.json"), help="Labeled queries")
+    parser.add_argument("--synthetic-queries", type=int, default=0, help="Add N generated queries with a known answer")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-precision-loss", type=float, default=0.0, help="Allowed drop in precision@k")
+    parser.add_argument("--reranker", help="Override RERANKER")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=settings.rerank_gate_path, help="Where the thresholds are written")
+    args = parser.parse_args()
+
+    with open(args.queries, "r") as f:
+        entries = json.load(f)
+    if args.synthetic_queries:
+        with open(DATA_DIR / "shl_assessments.json", "r") as f:
+            entries += synthetic_queries(json.load(f), args.synthetic_queries, random.Random(args.seed))
+    if args.reranker:
+        settings.reranker = args.reranker
+    settings.rerank_gate = False
+
+    pipeline = build_pipeline(settings)
+    try:
+        samples = asyncio.run(collect_samples(pipeline, entries, args.top_k))
+    finally:
+        pipeline.shutdown()
+
+    result = calibrate(samples, args.max_precision_loss)
+    result.update({"queries": len(samples), "top_k": args.top_k, "reranker": settings.reranker})
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Skip rate {result['skip_rate']:.0%} at precision@{args.top_k} {result['precision_gated']} "
+          f"(always reranking: {result['precision_reranked']}) over {len(samples)} queries")
+    print(f"Thresholds written to {args.output}; set RERANK_GATE=true to use them")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Fast-path JSON for recommendation responses
+
+Catalog assessments are built once, with their JSON (every field but the score)
+encoded up front by `with_json_prefix`. The prefix survives `model_copy`, so the
+scored copies returned by search and the rerankers still carry it, and encoding
+a response is byte concatenation plus one float per item: no pydantic
+validation or model_dump on the request path.
+"""
+from typing import List, Sequence
+from fastapi import Response
+import orjson
+from app.models import Assessment
+
+def json_prefix(assessment: Assessment) -> bytes:
+    """The assessment's JSON object up to its score: b'{"url":...,"test_type":[...],"score":'"""
+    return orjson.dumps(assessment.model_dump(exclude={"score"}))[:-1] + b',"score":'
+
+def with_json_prefix(assessment: Assessment) -> Assessment:
+    """Attach the prebuilt JSON prefix to a catalog assessment"""
+    assessment._json_prefix = json_prefix(assessment)
+    return assessment
+
+def encode_assessments(assessments: Sequence[Assessment]) -> bytes:
+    """JSON array of assessments; ones built outside the catalog are encoded in full"""
+    return b"[" + b",".join(
+        (assessment._json_prefix or json_prefix(assessment)) + orjson.dumps(assessment.score) + b"}"
+        for assessment in assessments
+    ) + b"]"
+
+def recommendations_json(assessments: Sequence[Assessment]) -> bytes:
+    """Body of a RecommendationResponse"""
+    return b'{"recommendations":' + encode_assessments(assessments) + b"}"
+
+def recommendations_response(assessments: Sequence[Assessment]) -> Response:
+    return Response(recommendations_json(assessments), media_type="application/json")
+
+def batch_response(results: List[Sequence[Assessment]]) -> Response:
+    """Body of a BatchRecommendationResponse"""
+    return Response(
+        b'{"results":[' + b",".join(recommendations_json(assessments) for assessments in results) + b"]}",
+        media_type="application/json"
+    )
+
+def stream_event(event: str, assessments: Sequence[Assessment]) -> bytes:
+    """One NDJSON line of the streaming endpoint"""
+    return b'{"event":' + orjson.dumps(event) + b',"recommendations":' + encode_assessments(assessments) + b"}\n"
@@ -0,0 +1,133 @@
+"""Preload-and-fork multi-process server
+
+The parent process syncs the Chroma collection and exports a catalog snapshot
+(in a separate, short-lived process, so no Chroma or encoder threads exist
+before forking), then imports the app, loads the embedding model and builds the BM25 index once.
+Workers are forked from it and share the model weights and the lexical index
+copy-on-write; each serves the snapshot memory-mapped and read-only, and none
+of them opens Chroma.
+All workers accept connections on one listening socket bound by the parent.
+
+Usage:
+    python -m app.serve [--workers 8] [--host 0.0.0.0] [--port 8000] [--skip-export]
+"""
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+def _sync_and_export():
+    """Child process: the only Chroma writer; brings the collection and the snapshot up to date"""
+    logging.basicConfig(level=logging.INFO)
+    from app.database import VectorDB
+    from app.snapshot import export_snapshot
+    export_snapshot(VectorDB(), settings.snapshot_path, dtype=settings.numpy_index_dtype)
+
+def _preload():
+    """Import the app, load model weights and build the lexical index before forking so workers share them"""
+    import app.main  # noqa: F401  (FastAPI app, pipeline and database modules)
+    if settings.embedding_backend == "sentence-transformers":
+        # SentenceTransformerEmbeddingFunction caches models per class, so the
+        # workers' VectorDB reuses this instance instead of loading its own copy
+        from app.embeddings import create_embedding_function
+        create_embedding_function(settings.embedding_backend, model_name=settings.embedding_model)
+    if settings.hybrid_search:
+        # Workers' VectorDB picks this up from app.snapshot instead of parsing every record itself
+        from app.snapshot import lexical_index, load_snapshot
+        lexical_index(load_snapshot(settings.snapshot_path))
+    # Keep the preloaded objects out of future GC passes, which would touch (and copy) their pages
+    gc.collect()
+    gc.freeze()
+
+def _run_worker(sock: socket.socket):
+    import uvicorn
+    from app.main import app
+    try:
+        import torch
+        torch.set_num_threads(settings.worker_threads)
+    except ImportError:
+        pass
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+def _fork_worker(sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock)
+        except BaseException:
+            logger.exception("Worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from N forked workers sharing one model and catalog")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 2)))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--skip-export", action="store_true",
+                        help="Serve the existing snapshot without syncing Chroma first")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    if not args.skip_export:
+        exporter = multiprocessing.get_context("spawn").Process(target=_sync_and_export, name="catalog-export")
+        exporter.start()
+        exporter.join()
+        if exporter.exitcode != 0:
+            sys.exit(f"Catalog sync/export failed (exit code {exporter.exitcode})")
+
+    settings.serve_from_snapshot = True
+    started = time.perf_counter()
+    _preload()
+    logger.info(f"Preloaded app and models in {time.perf_counter() - started:.1f}s")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers = {_fork_worker(sock) for _ in range(args.workers)}
+    logger.info(f"Serving on http://{args.host}:{args.port} with {len(workers)} workers")
+
+    stopping = False
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Supervise: replace workers that die unexpectedly, exit once all have stopped
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}, restarting")
+            time.sleep(1)
+            workers.add(_fork_worker(sock))
+    sock.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Read-only, memory-mapped catalog snapshots for multi-process serving
+
+A snapshot is a directory of plain files exported from the Chroma collection:
+
+    <path>/CURRENT             name of the active version directory
+    <path>/<version>/index/    NumpyIndex.save() output (embeddings matrix as .npy)
+    <path>/<version>/records.jsonl, offsets.npy
+                               one JSON line per row (document + metadata) and row offsets
+
+Workers map the matrix and the records file read-only, so N processes share a
+single copy through the page cache and never open Chroma themselves. The BM25
+index over the records is built once per process (see lexical_index); app.serve
+builds it before forking so workers inherit it instead of building their own.
+
+Usage:
+    python -m app.snapshot [--path cache/catalog_snapshot] [--dtype float32]
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+import numpy as np
+from app.cache import LRUCache
+from app.config import settings
+from app.filters import filter_fields
+from app.lexical import BM25Index
+from app.numpy_index import DTYPES, NumpyIndex
+
+logger = logging.getLogger(__name__)
+
+_KEEP_VERSIONS = 2  # The previous version stays on disk for workers still mapping it
+
+_lexical_indexes: Dict[str, BM25Index] = {}  # catalog_version -> BM25 index over its documents
+
+class CatalogSnapshot:
+    """A loaded snapshot: memory-mapped NumpyIndex plus lazily parsed records"""
+
+    def __init__(self, path, mmap_index: bool = True):
+        path = Path(path)
+        with open(path / "manifest.json") as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest["catalog_version"]
+        self.index = NumpyIndex.load(path / "index", mmap=mmap_index)
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        with open(path / "records.jsonl", "rb") as f:
+            self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def record(self, row: int) -> dict:
+        """{"document": ..., "metadata": ...} for one row"""
+        return json.loads(self._records[int(self.offsets[row]):int(self.offsets[row + 1])])
+
+    def documents(self) -> Iterator[Tuple[str, str]]:
+        for row, doc_id in enumerate(self.index.ids):
+            yield doc_id, self.record(row)["document"]
+
+    def mapping(self, loader: Callable[[dict], object], cache_size: int = 4096) -> "SnapshotMapping":
+        return SnapshotMapping(self, loader, cache_size)
+
+
+class SnapshotMapping(Mapping):
+    """doc_id -> loader(record), parsed on first access and kept in a bounded LRU cache"""
+
+    def __init__(self, snapshot: CatalogSnapshot, loader: Callable[[dict], object], cache_size: int):
+        self._snapshot = snapshot
+        self._loader = loader
+        self._cache = LRUCache(maxsize=cache_size)
+
+    def __getitem__(self, doc_id: str):
+        value = self._cache.get(doc_id)
+        if value is None:
+            row = self._snapshot.index.rows[doc_id]  # KeyError for unknown ids
+            value = self._loader(self._snapshot.record(row))
+            self._cache.set(doc_id, value)
+        return value
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._snapshot.index.rows
+
+    def __iter__(self):
+        return iter(self._snapshot.index.ids)
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+
+def lexical_index(snapshot: CatalogSnapshot) -> BM25Index:
+    """
+    BM25 index over a snapshot's documents, built once per catalog version in this process
+
+    A worker forked after the index was built (app.serve preloads it) reuses the
+    parent's copy-on-write instead of parsing every record again. The index is
+    read-only here: snapshots never change, a new catalog is a new version.
+    """
+    index = _lexical_indexes.get(snapshot.version)
+    if index is None:
+        index = BM25Index()
+        for doc_id, document in snapshot.documents():
+            index.add(doc_id, document)
+        _lexical_indexes.clear()  # Only the active version is kept
+        _lexical_indexes[snapshot.version] = index
+    return index
+
+def _current_dir(path: Path) -> Optional[Path]:
+    try:
+        name = (path / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        return None
+    return path / name if name else None
+
+def load_snapshot(path, mmap_index: bool = True) -> CatalogSnapshot:
+    """Open the active version of the snapshot at path"""
+    current = _current_dir(Path(path))
+    if current is None:
+        raise FileNotFoundError(f"No catalog snapshot at {path}; export one with python -m app.snapshot")
+    return CatalogSnapshot(current, mmap_index=mmap_index)
+
+def export_snapshot(vector_db, path, dtype: str = "float32") -> Path:
+    """
+    Export the collection behind a VectorDB as a new snapshot version
+
+    The version directory is written completely before CURRENT is switched
+    (atomic rename), so workers starting meanwhile always see a whole snapshot.
+    Nothing is written when the catalog version is already the active one.
+
+    Args:
+        vector_db: A VectorDB with an open Chroma collection
+        path: Snapshot root directory
+        dtype: Storage dtype of the embedding matrix (see NumpyIndex)
+
+    Returns:
+        Directory of the active version
+    """
+    path = Path(path)
+    current = _current_dir(path)
+    if current is not None and (current / "manifest.json").exists():
+        with open(current / "manifest.json") as f:
+            manifest = json.load(f)
+        if manifest["catalog_version"] == vector_db.catalog_version and manifest["dtype"] == dtype:
+            logger.info(f"Catalog snapshot {current.name} is up to date")
+            return current
+
+    stored = vector_db.collection.get(include=["embeddings", "documents", "metadatas"])
+    name = f"{vector_db.catalog_version[:12]}-{dtype}-{time.time_ns()}"
+    target = path / name
+    target.mkdir(parents=True)
+
+    offsets = [0]
+    with open(target / "records.jsonl", "wb") as f:
+        for document, metadata in zip(stored['documents'], stored['metadatas']):
+            line = json.dumps({"document": document, "metadata": metadata}).encode() + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(target / "offsets.npy", np.array(offsets, dtype=np.int64))
+
+    index = NumpyIndex(dtype).build(
+        stored['ids'],
+        np.asarray(stored['embeddings'], dtype=np.float32),
+        [filter_fields(metadata) for metadata in stored['metadatas']]
+    )
+    index.save(target / "index")
+    with open(target / "manifest.json", "w") as f:
+        json.dump({
+            "catalog_version": vector_db.catalog_version,
+            "dtype": dtype,
+            "rows": len(index),
+            "created_at": time.time(),
+        }, f)
+
+    pointer = path / f"CURRENT.{os.getpid()}"
+    pointer.write_text(name)
+    os.replace(pointer, path / "CURRENT")
+    logger.info(f"Exported catalog snapshot {name}: {len(index)} rows, {index.nbytes / 1024 / 1024:.1f} MB")
+
+    versions = sorted((p for p in path.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in versions[_KEEP_VERSIONS:]:
+        shutil.rmtree(old, ignore_errors=True)
+    return target
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Chroma catalog as a memory-mappable snapshot")
+    parser.add_argument("--path", default=settings.snapshot_path, help="Snapshot root directory")
+    parser.add_argument("--dtype", default=settings.numpy_index_dtype, choices=DTYPES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app.database import VectorDB
+    export_snapshot(VectorDB(), args.path, dtype=args.dtype)
+
+if __name__ == "__main__":
+    main()
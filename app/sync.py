@@ -0,0 +1,35 @@
+"""Incrementally sync the assessment catalog into ChromaDB
+
+Usage:
+    python -m app.sync [--data data/shl_assessments.json] [--batch-size 256]
+"""
+import argparse
+import logging
+import time
+from app.config import settings
+from app.database import VectorDB
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the SHL assessment catalog into ChromaDB")
+    parser.add_argument("--data", help="Catalog JSON file (default: data/shl_assessments.json)")
+    parser.add_argument("--batch-size", type=int, default=settings.sync_batch_size,
+                        help="Assessments embedded per batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    start = time.perf_counter()
+    vector_db = VectorDB(sync="off")
+
+    def report(done: int, total: int):
+        print(f"\rEmbedded {done}/{total} assessments", end="", flush=True)
+
+    stats = vector_db.sync_catalog(data_path=args.data, batch_size=args.batch_size, progress=report)
+    if stats["added"] or stats["updated"]:
+        print()
+    print(
+        f"Added {stats['added']}, updated {stats['updated']}, deleted {stats['deleted']}, "
+        f"unchanged {stats['unchanged']} in {time.perf_counter() - start:.1f}s"
+    )
+
+if __name__ == "__main__":
+    main()
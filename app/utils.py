@@ -1,15 +1,107 @@
 import requests
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 from urllib.parse import urlparse
 import logging
-from typing import Optional
+import os
+import re
+import resource
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
+# Elements whose text is never part of the posting
+_SKIP_TAGS = {"script", "style", "nav", "footer", "iframe", "noscript", "template", "svg"}
+_BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "tr", "table", "section", "article", "header",
+    "h1", "h2", "h3", "h4", "h5", "h6", "title", "dd", "dt", "blockquote", "pre"
+}
+_RAW_TEXT_TAGS = {"script", "style"}  # HTMLParser passes everything up to their end tag through as text
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_SPACES_RE = re.compile(r"[ \t\r\f\v\xa0]+")
+
+class _TextExtractor(HTMLParser):
+    """Streaming HTML -> text: collects text nodes without building a DOM
+
+    A skipped element that is never closed ends with the element enclosing it
+    (e.g. at </body>); one still open at the end of the page gives its text
+    back, so a stray <script> or <nav> cannot swallow the rest of the posting.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._open: List[str] = []  # Open elements, innermost last
+        self._skips: List[int] = []  # Position in _open of each skipped element still open
+        self._skipped: List[str] = []  # Text held back while skipping
+        self._raw_from: Optional[int] = None  # Where in _skipped an open <script>/<style> starts
+
+    def _emit(self, text: str):
+        (self._skipped if self._skips else self.parts).append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skips.append(len(self._open))
+            if tag in _RAW_TEXT_TAGS:
+                self._raw_from = len(self._skipped)
+        elif tag in _BLOCK_TAGS:
+            self._emit("\n")
+        if tag not in _VOID_TAGS:
+            self._open.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._open:
+            position = len(self._open) - 1 - self._open[::-1].index(tag)
+            del self._open[position:]
+            # Skipped elements inside the one just closed are over, whether they were closed or not
+            while self._skips and self._skips[-1] >= position:
+                self._skips.pop()
+            if not self._skips:
+                self._skipped.clear()
+            self._raw_from = None
+        if tag in _BLOCK_TAGS:
+            self._emit("\n")
+
+    def handle_data(self, data):
+        self._emit(data)
+
+    def close(self):
+        if self._raw_from is not None:
+            # Inside an unclosed <script>/<style> HTMLParser still holds the rest of the page unparsed
+            self._skipped.append(self.rawdata)
+            self.rawdata = ""
+        super().close()
+        if not self._skips:
+            return
+        held = self._skipped
+        if self._raw_from is not None:
+            # The rest of the page is raw text of the unclosed element: parse it as markup
+            # again, dropping the code before its first tag
+            markup = "".join(held[self._raw_from:])
+            held = held[:self._raw_from]
+            if "<" in markup:
+                held.append("\n" + html_to_text(markup[markup.index("<"):]) + "\n")
+        self.parts.extend(held)
+        self._skips, self._skipped, self._raw_from = [], [], None
+
+def html_to_text(html: str) -> str:
+    """
+    Extract readable text from an HTML page
+    
+    Scripts, styles, navigation and footers are dropped; block elements
+    become line breaks and runs of whitespace collapse to one space.
+    """
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    lines = (_SPACES_RE.sub(" ", line).strip() for line in "".join(parser.parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
 def extract_text_from_url(url: str, timeout: int = 10) -> Optional[str]:
     """
     Extract main text content from a URL (e.g., job description)
     
+    Blocking, one-off variant of app.fetcher.PageFetcher (which the API uses).
+    
     Args:
         url: URL to fetch
         timeout: Request timeout in seconds
@@ -30,23 +122,19 @@ def extract_text_from_url(url: str, timeout: int = 10) -> Optional[str]:
         response = requests.get(url, headers=headers, timeout=timeout)
         response.raise_for_status()
         
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove unwanted elements
-        for element in soup(['script', 'style', 'nav', 'footer', 'iframe']):
-            element.decompose()
-        
-        # Get text
-        text = soup.get_text(separator='\n', strip=True)
-        
-        # Clean up excessive whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        
+        text = html_to_text(response.text)
         return text if text else None
         
     except Exception as e:
         logger.warning(f"Failed to extract text from URL {url}: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from app.admission import AdmissionController, Overloaded, SingleFlight
+from app.models import Assessment
+from app.pipeline import RecommendationPipeline
+
+def candidates(n: int = 6):
+    return [
+        Assessment(url=f"https://example.com/{i}", name=f"Assessment {i}", adaptive_support=False,
+                   description=f"assessment {i}", duration="20 minutes", remote_support=True,
+                   test_type=["Knowledge & Skills"], score=1 - i / 10)
+        for i in range(n)
+    ]
+
+def test_single_flight_shares_one_call_per_key():
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def run():
+        flights = SingleFlight("test")
+        results = await asyncio.gather(*(flights.do(key, lambda key=key: work(key)) for key in "aab"))
+        return results, len(flights)
+
+    assert asyncio.run(run()) == (["A", "A", "B"], 0)
+    assert sorted(calls) == ["a", "b"]
+
+def test_single_flight_cancelled_caller_does_not_cancel_the_others():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        flights = SingleFlight("test")
+        first = asyncio.ensure_future(flights.do("key", work))
+        second = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == ("done", True)
+
+def test_admission_refuses_once_slots_and_queue_are_full():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=1, retry_after=7)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.admit():
+                await release.wait()
+
+        holders = [asyncio.ensure_future(hold()) for _ in range(2)]  # One running, one waiting
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as refused:
+            async with admission.admit():
+                pass
+        release.set()
+        await asyncio.gather(*holders)
+        return refused.value.retry_after, admission.active, admission.waiting
+
+    assert asyncio.run(run()) == (7, 0, 0)
+
+class StubVectorDB:
+    def search(self, query, top_k, filters=None, search_ef=None):
+        return candidates(top_k)
+
+class SlowReranker:
+    """Reverses the candidates after a delay, so reranked results are easy to tell apart"""
+
+    async def refine_recommendations_async(self, query, assessments, top_k=None):
+        await asyncio.sleep(0.05)
+        return list(reversed(assessments))[:top_k]
+
+def saturated_pipeline(policy: str) -> RecommendationPipeline:
+    return RecommendationPipeline(StubVectorDB(), SlowReranker(), llm_concurrency=1, llm_max_queue=0,
+                                  overload_policy=policy, coalesce=False)
+
+@pytest.mark.parametrize("policy", ["degrade", "reject"])
+def test_saturated_rerank_stage_degrades_or_rejects(policy):
+    pipeline = saturated_pipeline(policy)
+
+    async def run():
+        return await asyncio.gather(*(pipeline.recommend(f"query {i}", top_k=3) for i in range(2)),
+                                    return_exceptions=True)
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        pipeline.shutdown()
+
+    # Whichever request got the single rerank slot is reranked, the other is shed
+    reranked = [a.url for a in list(reversed(candidates(6)))[:3]]
+    vector_only = [a.url for a in candidates(3)]
+    outcomes = sorted("overloaded" if isinstance(result, Overloaded) else
+                      "reranked" if [a.url for a in result] == reranked else
+                      "degraded" if [a.url for a in result] == vector_only else "unexpected"
+                      for result in results)
+    assert outcomes == (["overloaded", "reranked"] if policy == "reject" else ["degraded", "reranked"])
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import pytest
+from app.batching import MicroBatcher
+from app.config import settings
+from app.fake_llm import FakeGenerativeModel, FakeResponse
+from app.llm import GeminiProcessor
+from app.metrics import start_request
+from app.models import Assessment
+
+def candidates(prefix: str, n: int = 6):
+    return [
+        Assessment(url=f"https://example.com/{prefix}/{i}", name=f"{prefix} {i}", adaptive_support=False,
+                   description=f"{prefix} assessment {i}", duration="20 minutes", remote_support=True,
+                   test_type=["Knowledge & Skills"])
+        for i in range(n)
+    ]
+
+def test_concurrent_jobs_share_one_batch():
+    batches = []
+
+    async def run_batch(jobs):
+        batches.append(list(jobs))
+        return [job * 10 for job in jobs]
+
+    async def run():
+        batcher = MicroBatcher(run_batch, window=0.01, max_jobs=8)
+        return await asyncio.gather(*(batcher.submit(job) for job in range(3)))
+
+    assert asyncio.run(run()) == [0, 10, 20]
+    assert batches == [[0, 1, 2]]
+
+def test_full_batch_flushes_before_the_window():
+    batches = []
+
+    async def run_batch(jobs):
+        batches.append(list(jobs))
+        return list(jobs)
+
+    async def run():
+        batcher = MicroBatcher(run_batch, window=60, max_jobs=2)
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(job) for job in range(4))), 1)
+
+    assert asyncio.run(run()) == [0, 1, 2, 3]
+    assert batches == [[0, 1], [2, 3]]
+
+def test_exception_result_fails_only_its_job():
+    async def run_batch(jobs):
+        return [ValueError(f"job {job}") if job == 1 else job for job in jobs]
+
+    async def run():
+        batcher = MicroBatcher(run_batch, window=0.01, max_jobs=8)
+        return await asyncio.gather(*(batcher.submit(job) for job in range(3)), return_exceptions=True)
+
+    first, second, third = asyncio.run(run())
+    assert (first, third) == (0, 2)
+    assert isinstance(second, ValueError)
+
+def test_failed_batch_fails_every_job():
+    async def run_batch(jobs):
+        raise ConnectionError("down")
+
+    async def run():
+        batcher = MicroBatcher(run_batch, window=0.01, max_jobs=8)
+        return await asyncio.gather(*(batcher.submit(job) for job in range(2)), return_exceptions=True)
+
+    assert all(isinstance(result, ConnectionError) for result in asyncio.run(run()))
+
+def test_short_result_list_fails_the_jobs_left_without_a_result():
+    async def run_batch(jobs):
+        return list(jobs)[:1]
+
+    async def run():
+        batcher = MicroBatcher(run_batch, window=0.01, max_jobs=8)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(job) for job in range(3)), return_exceptions=True), 1
+        )
+
+    first, *rest = asyncio.run(run())
+    assert first == 0
+    assert all(isinstance(result, RuntimeError) and "1 results for 3 jobs" in str(result) for result in rest)
+
+class DroppingModel(FakeGenerativeModel):
+    """Leaves one job out of every batched reply"""
+
+    def __init__(self, dropped_job: int, **kwargs):
+        super().__init__(**kwargs)
+        self.dropped_job = dropped_job
+        self.prompts = []
+
+    def _reply(self, prompt: str) -> FakeResponse:
+        self.prompts.append(prompt)
+        reply = super()._reply(prompt)
+        data = json.loads(reply.text)
+        if data and isinstance(data[0], dict) and "job" in data[0]:
+            reply.text = json.dumps([entry for entry in data if entry["job"] != self.dropped_job])
+        return reply
+
+@pytest.fixture
+def batching_settings(monkeypatch):
+    monkeypatch.setattr(settings, "rerank_cache_enabled", False)
+    monkeypatch.setattr(settings, "llm_batching", True)
+    monkeypatch.setattr(settings, "llm_batch_window_ms", 20)
+    monkeypatch.setattr(settings, "llm_batch_max_jobs", 8)
+    monkeypatch.setattr(settings, "llm_hedging", False)
+    return settings
+
+def rerank_concurrently(processor: GeminiProcessor, jobs):
+    async def one(query, assessments):
+        timings = start_request()
+        refined = await processor.refine_recommendations_async(query, assessments, top_k=3)
+        return refined, timings
+
+    async def run():
+        return await asyncio.gather(*(one(query, assessments) for query, assessments in jobs))
+    return asyncio.run(run())
+
+def test_gemini_merges_concurrent_reranks_into_one_call(batching_settings):
+    model = FakeGenerativeModel(latency_ms=10, jitter=0, seed=0)
+    processor = GeminiProcessor(model=model)
+    jobs = [(f"query {name}", candidates(name)) for name in ("java", "sales", "python")]
+
+    results = rerank_concurrently(processor, jobs)
+
+    assert model.calls == 1
+    for (_, assessments), (refined, timings) in zip(jobs, results):
+        # The fake ranks candidates in prompt order: each job gets its own top 3 back
+        assert [a.url for a in refined] == [a.url for a in assessments[:3]]
+        assert all(a.score is not None for a in refined)
+        # Each request sees the shared call once, plus its own wait for the batch
+        assert {"llm_queue", "prompt", "llm", "parse"} <= set(timings)
+
+def test_gemini_reruns_jobs_missing_from_the_batched_reply(batching_settings):
+    model = DroppingModel(dropped_job=1, latency_ms=10, jitter=0, seed=0)
+    processor = GeminiProcessor(model=model)
+    jobs = [(f"query {name}", candidates(name)) for name in ("java", "sales", "python")]
+
+    results = rerank_concurrently(processor, jobs)
+
+    # One batched call, then job 1 alone
+    assert model.calls == 2
+    assert "Job 1 (" not in model.prompts[1] and "query sales" in model.prompts[1]
+    for (_, assessments), (refined, _) in zip(jobs, results):
+        assert [a.url for a in refined] == [a.url for a in assessments[:3]]
+
+def test_single_job_is_not_wrapped_in_a_batch_prompt(batching_settings):
+    model = FakeGenerativeModel(latency_ms=0, jitter=0, seed=0)
+    processor = GeminiProcessor(model=model)
+
+    (refined, _), = rerank_concurrently(processor, [("query java", candidates("java"))])
+
+    assert model.calls == 1
+    assert len(refined) == 3
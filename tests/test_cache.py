@@ -0,0 +1,64 @@
+import time
+from app.cache import LRUCache, SQLiteCache, normalize_query
+
+TTL = 0.05
+
+def test_normalize_query_collapses_case_and_whitespace():
+    assert normalize_query("  Java   Developer\n") == normalize_query("java developer")
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+def test_lru_evicts_to_stay_within_the_byte_budget():
+    cache = LRUCache(maxsize=10, max_bytes=10, sizeof=len)
+    cache.set("a", "x" * 6)
+    cache.set("b", "x" * 6)
+    assert cache.get("a") is None
+    assert cache.current_bytes == 6
+    cache.set("c", "x" * 11)  # Larger than the whole budget: not cached, nothing evicted
+    assert cache.get("c") is None
+    assert cache.get("b") == "x" * 6
+
+def test_lru_entries_expire_after_the_ttl():
+    cache = LRUCache(maxsize=10, ttl=TTL)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(TTL * 1.5)
+    assert cache.get("a", "missing") == "missing"
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+def test_sqlite_cache_survives_a_reopen(tmp_path):
+    path = str(tmp_path / "rerank.sqlite3")
+    SQLiteCache(path).set("query", {"urls": ["https://example.com/a"], "scores": [0.9]})
+    assert SQLiteCache(path).get("query") == {"urls": ["https://example.com/a"], "scores": [0.9]}
+
+def test_sqlite_cache_entries_expire_after_the_ttl(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "rerank.sqlite3"), ttl=TTL)
+    cache.set("query", [1, 2])
+    assert cache.get("query") == [1, 2]
+    time.sleep(TTL * 1.5)
+    assert cache.get("query") is None
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+def test_sqlite_cache_evicts_the_least_recently_read_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "rerank.sqlite3"), max_entries=2)
+    cache._EVICT_EVERY = 1
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    assert cache.get("a") == 1  # "b" is now the least recently read
+    time.sleep(0.01)
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
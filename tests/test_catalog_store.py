@@ -0,0 +1,98 @@
+import hashlib
+import shutil
+import sqlite3
+from pathlib import Path
+import numpy as np
+import pytest
+from chromadb.api.client import SharedSystemClient
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction, known_embedding_functions
+import app.database as database
+from app.config import settings
+from app.models import QueryFilters
+
+CHECKED_IN_STORE = Path(__file__).parent.parent / "chroma_db"
+
+class OfflineEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """Same name and config as the store's embedding function, hashed bag of words instead of the model"""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", **kwargs):
+        self.model_name = model_name
+        self.device = "cpu"
+        self.normalize_embeddings = False
+        self.kwargs = {}
+
+    @staticmethod
+    def build_from_config(config):
+        return OfflineEmbeddingFunction(config["model_name"])
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            vector = np.full(384, 0.01, dtype=np.float32)
+            for word in text.lower().split():
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 384] += 1
+            vectors.append(vector / np.linalg.norm(vector))
+        return vectors
+
+def stored_rows(path: Path) -> tuple:
+    """Every row id, sequence number and metadata value, read straight from Chroma's SQLite file"""
+    with sqlite3.connect(f"file:{path / 'chroma.sqlite3'}?mode=ro", uri=True) as connection:
+        return (
+            connection.execute("SELECT embedding_id, seq_id FROM embeddings ORDER BY embedding_id").fetchall(),
+            connection.execute("SELECT * FROM embedding_metadata ORDER BY id, key").fetchall(),
+        )
+
+@pytest.fixture
+def store_copy(tmp_path, monkeypatch):
+    if not (CHECKED_IN_STORE / "chroma.sqlite3").exists():
+        pytest.skip("no checked-in chroma_db/")
+    path = tmp_path / "chroma_db"
+    shutil.copytree(CHECKED_IN_STORE, path)
+    monkeypatch.setattr(settings, "chroma_db_path", str(path))
+    monkeypatch.setattr(settings, "embedding_backend", "sentence-transformers")
+    monkeypatch.setattr(settings, "search_backend", "chroma")
+    # Chroma rebuilds the stored embedding function by name when it opens the collection
+    monkeypatch.setitem(known_embedding_functions, "sentence_transformer", OfflineEmbeddingFunction)
+    monkeypatch.setattr(database, "create_embedding_function",
+                        lambda backend, model_name: OfflineEmbeddingFunction(model_name))
+    SharedSystemClient.clear_system_cache()
+    yield path
+    SharedSystemClient.clear_system_cache()
+
+def test_default_startup_leaves_the_checked_in_store_unmodified(store_copy):
+    before = stored_rows(store_copy)
+
+    vector_db = database.VectorDB()
+    results = vector_db.search("java developer", top_k=5, filters=QueryFilters(max_duration=60, remote_support=True))
+
+    assert settings.catalog_sync == "if_empty"
+    assert all(assessment.remote_support for assessment in results)
+    assert stored_rows(store_copy) == before
+
+def test_search_batch_matches_single_searches_with_one_encoder_pass(store_copy):
+    vector_db = database.VectorDB()
+    queries = ["java developer", "sales manager personality", "java developer"]
+    top_ks = [3, 5, 4]
+    filters = [None, QueryFilters(remote_support=True), QueryFilters(max_duration=30)]
+    singles = [vector_db.search(q, top_k=k, filters=f) for q, k, f in zip(queries, top_ks, filters)]
+    vector_db.embedding_cache.clear()
+    vector_db.result_cache.clear()
+
+    encoded = []
+    embed = vector_db.embedding_function
+    vector_db.embedding_function = lambda texts: encoded.append(list(texts)) or embed(texts)
+    batch = vector_db.search_batch(queries, top_k=top_ks, filters=filters)
+
+    assert encoded == [["java developer", "sales manager personality"]]
+    assert [[(a.url, a.score) for a in results] for results in batch] == \
+        [[(a.url, a.score) for a in results] for results in singles]
+
+def test_hybrid_search_keeps_cosine_similarity_as_the_score(store_copy, monkeypatch):
+    monkeypatch.setattr(settings, "hybrid_search", False)
+    vector_only = {a.url: a.score for a in database.VectorDB().search("java developer", top_k=10)}
+    monkeypatch.setattr(settings, "hybrid_search", True)
+    hybrid = database.VectorDB().search("java developer", top_k=10)
+
+    # Fusion reorders the results (and brings in BM25-only ones, which score 0)
+    assert [a.url for a in hybrid] != list(vector_only)
+    assert all(a.score == vector_only.get(a.url, 0.0) for a in hybrid)
@@ -0,0 +1,37 @@
+import pytest
+from app.chunking import aggregate_rankings, chunk_words, extract_requirements, split_query
+
+WORDS = " ".join(f"w{i}" for i in range(10))
+
+def test_chunk_words_overlapping_windows_cover_every_word():
+    chunks = chunk_words(WORDS, max_words=4, overlap=1)
+    assert chunks == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+
+def test_chunk_words_short_and_empty_text():
+    assert chunk_words("java developer", max_words=4, overlap=1) == ["java developer"]
+    assert chunk_words("  ", max_words=4, overlap=1) == []
+
+def test_split_query_puts_weighted_requirements_first():
+    text = "About us:\nWe build banks.\nRequirements:\nJava and SQL\nBenefits:\nFree lunch"
+    assert extract_requirements(text) == ("Java and SQL", "About us:\nWe build banks.\nBenefits:\nFree lunch")
+
+    chunks = split_query(text, max_words=100, overlap=0, extract=True, requirements_weight=2.0)
+    assert chunks[0] == ("Java and SQL", 2.0)
+    assert [weight for _, weight in chunks[1:]] == [1.0]
+
+RANKINGS = [[("a", 0.9), ("b", 0.5)], [("b", 0.8), ("c", 0.6)]]
+
+@pytest.mark.parametrize("mode, weights, expected", [
+    ("max", [1, 1], [("a", 0.9), ("b", 0.8), ("c", 0.6)]),
+    ("mean", [3, 1], [("b", 0.65), ("a", 0.45), ("c", 0.3)]),  # Weights are ignored
+    ("weighted", [3, 1], [("a", 0.675), ("b", 0.575), ("c", 0.15)]),
+])
+def test_aggregate_rankings(mode, weights, expected):
+    result = aggregate_rankings(RANKINGS, weights, mode)
+    assert [doc_id for doc_id, _ in result] == [doc_id for doc_id, _ in expected]
+    assert [score for _, score in result] == pytest.approx([score for _, score in expected])
+
+def test_aggregate_rankings_single_chunk_and_unknown_mode():
+    assert aggregate_rankings([RANKINGS[0]], [1], "mean") == (("a", 0.9), ("b", 0.5))
+    with pytest.raises(ValueError, match="Unknown aggregation"):
+        aggregate_rankings(RANKINGS, [1, 1], "median")
@@ -0,0 +1,162 @@
+import asyncio
+import httpx
+import pytest
+from app.fetcher import FetchError, PageFetcher
+
+HOST = "jobs.example.com"
+URL = f"https://{HOST}/posting/1"
+PAGE = b"<html><body><h1>Python developer</h1><p>Remote, 30 minute test</p></body></html>"
+
+def make_fetcher(handler, tmp_path=None, **kwargs) -> PageFetcher:
+    """A fetcher over httpx.MockTransport; HOST skips DNS so no network is needed"""
+    kwargs.setdefault("allowed_hosts", [HOST])
+    return PageFetcher(
+        cache_path=str(tmp_path / "fetch.sqlite3") if tmp_path else None,
+        transport=httpx.MockTransport(handler),
+        **kwargs
+    )
+
+def fetch(fetcher: PageFetcher, url: str = URL) -> str:
+    async def run():
+        try:
+            return await fetcher.fetch_text(url)
+        finally:
+            await fetcher.aclose()
+    return asyncio.run(run())
+
+def test_fetch_extracts_text():
+    fetcher = make_fetcher(lambda request: httpx.Response(200, headers={"Content-Type": "text/html"}, content=PAGE))
+    assert "Python developer" in fetch(fetcher)
+
+def test_revalidation_304_reuses_cached_text(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"Content-Type": "text/html", "ETag": '"v1"'}, content=PAGE)
+
+    # max_age=0: every fetch after the first revalidates instead of trusting the cache
+    first = fetch(make_fetcher(handler, tmp_path, max_age=0))
+    second = fetch(make_fetcher(handler, tmp_path, max_age=0))
+
+    assert second == first
+    assert len(requests) == 2
+    assert "If-None-Match" not in requests[0].headers
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+
+def test_fresh_cache_entry_skips_the_request(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, headers={"Content-Type": "text/html"}, content=PAGE)
+
+    fetch(make_fetcher(handler, tmp_path))
+    fetch(make_fetcher(handler, tmp_path))
+    assert len(requests) == 1
+
+def test_rejects_declared_oversized_page():
+    fetcher = make_fetcher(
+        lambda request: httpx.Response(200, headers={"Content-Type": "text/html"}, content=b"x" * 2048),
+        max_bytes=1024
+    )
+    with pytest.raises(FetchError, match="exceeds 1024 bytes"):
+        fetch(fetcher)
+
+def test_rejects_oversized_stream_without_content_length():
+    async def chunks():
+        for _ in range(8):
+            yield b"x" * 256
+
+    fetcher = make_fetcher(
+        lambda request: httpx.Response(200, headers={"Content-Type": "text/html"}, content=chunks()),
+        max_bytes=1024
+    )
+    with pytest.raises(FetchError, match="exceeds 1024 bytes"):
+        fetch(fetcher)
+
+def test_rejects_non_text_content_type():
+    fetcher = make_fetcher(
+        lambda request: httpx.Response(200, headers={"Content-Type": "application/pdf"}, content=b"%PDF-1.7")
+    )
+    with pytest.raises(FetchError, match="Unsupported content type application/pdf"):
+        fetch(fetcher)
+
+def test_http_error_status():
+    fetcher = make_fetcher(lambda request: httpx.Response(404))
+    with pytest.raises(FetchError, match="HTTP 404"):
+        fetch(fetcher)
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/admin",
+    "http://10.0.0.5/",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/",
+    "http://[::ffff:127.0.0.1]/",
+])
+def test_refuses_non_public_addresses(url):
+    fetcher = make_fetcher(lambda request: pytest.fail("request must not be sent"))
+    with pytest.raises(FetchError, match="non-public address"):
+        fetch(fetcher, url)
+
+def test_refuses_redirect_to_non_public_address():
+    def handler(request):
+        return httpx.Response(302, headers={"Location": "http://127.0.0.1:8000/metrics"})
+
+    with pytest.raises(FetchError, match="non-public address"):
+        fetch(make_fetcher(handler))
+
+def test_follows_redirects_up_to_the_limit():
+    def handler(request):
+        hop = int(request.url.params.get("hop", 0))
+        return httpx.Response(302, headers={"Location": f"https://{HOST}/posting/1?hop={hop + 1}"})
+
+    with pytest.raises(FetchError, match="Too many redirects"):
+        fetch(make_fetcher(handler, max_redirects=2))
+
+def test_per_host_limits_are_dropped_when_idle():
+    fetcher = make_fetcher(lambda request: httpx.Response(200, headers={"Content-Type": "text/plain"}, content=b"ok"))
+    fetch(fetcher)
+    assert fetcher._host_limits == {}
+
+PUBLIC_HOST = "careers.example.org"
+PUBLIC_ADDRESS = "93.184.216.34"
+
+def test_connects_to_the_vetted_address_and_keeps_the_name(monkeypatch):
+    resolutions = iter([[PUBLIC_ADDRESS], ["127.0.0.1"]])  # A rebinding resolver: public first, then loopback
+    requests = []
+
+    async def resolve(self, host, port):
+        return next(resolutions)
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, headers={"Content-Type": "text/plain"}, content=b"Python developer")
+
+    monkeypatch.setattr(PageFetcher, "_resolve", resolve)
+    assert fetch(make_fetcher(handler, allowed_hosts=[]), f"https://{PUBLIC_HOST}/jobs/1") == "Python developer"
+
+    (request,) = requests
+    assert request.url.host == PUBLIC_ADDRESS
+    assert request.headers["Host"] == PUBLIC_HOST
+    assert request.extensions["sni_hostname"] == PUBLIC_HOST
+
+def test_conditional_headers_only_go_to_the_cached_url(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path == "/posting/1":
+            if len(requests) == 1:
+                return httpx.Response(200, headers={"Content-Type": "text/html", "ETag": '"v1"'}, content=PAGE)
+            return httpx.Response(301, headers={"Location": "/posting/2"})
+        return httpx.Response(200, headers={"Content-Type": "text/html"}, content=PAGE)
+
+    fetch(make_fetcher(handler, tmp_path, max_age=0))
+    fetch(make_fetcher(handler, tmp_path, max_age=0))
+
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+    assert requests[2].url.path == "/posting/2"
+    assert "If-None-Match" not in requests[2].headers
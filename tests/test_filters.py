@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from app.filters import build_where, filter_fields, filter_mask, matches_filters, parse_duration
+from app.models import QueryFilters
+
+CATALOG = [
+    {"duration": "30 minutes", "remote_support": "Yes", "adaptive_support": "No", "test_type": ["Knowledge & Skills"]},
+    {"duration": "1 hour", "remote_support": "No", "adaptive_support": "Yes", "test_type": ["Personality & Behavior"]},
+    {"duration": "20-40 minutes", "remote_support": True, "adaptive_support": True,
+     "test_type": "Knowledge & Skills,Simulations"},
+    {"duration": "N/A", "remote_support": "Yes", "adaptive_support": "No", "test_type": []},
+]
+
+FILTERS = [
+    QueryFilters(max_duration=40),
+    QueryFilters(min_duration=30),
+    QueryFilters(remote_support=True),
+    QueryFilters(adaptive_support=False),
+    QueryFilters(test_types=["Simulations", "Personality & Behavior"]),
+    QueryFilters(max_duration=45, remote_support=True, test_types=["Knowledge & Skills"]),
+]
+
+@pytest.mark.parametrize("duration, expected", [
+    ("60 minutes", (60, 60)),
+    ("30-40 minutes", (30, 40)),
+    ("1 hour", (60, 60)),
+    ("1.5 hours", (90, 90)),
+    (25, (25, 25)),
+    ("N/A", None),
+    (None, None),
+])
+def test_parse_duration(duration, expected):
+    assert parse_duration(duration) == expected
+
+def test_build_where():
+    assert build_where(None) is None
+    assert build_where(QueryFilters(remote_support=True)) == {"is_remote": {"$eq": True}}
+    assert build_where(QueryFilters(max_duration=30, test_types=["Simulations", "Ability & Aptitude"])) == {"$and": [
+        {"duration_max": {"$lte": 30}},
+        {"duration_min": {"$gte": 0}},
+        {"$or": [{"type_ability_aptitude": {"$eq": True}}, {"type_simulations": {"$eq": True}}]},
+    ]}
+
+def test_matches_filters():
+    fields = [filter_fields(entry) for entry in CATALOG]
+    assert [matches_filters(f, QueryFilters(max_duration=40)) for f in fields] == [True, False, True, False]
+    assert [matches_filters(f, QueryFilters(min_duration=30)) for f in fields] == [True, True, False, False]
+    assert all(matches_filters(f, None) for f in fields)
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_filter_mask_agrees_with_matches_filters(filters):
+    fields = [filter_fields(entry) for entry in CATALOG]
+    keys = {key for f in fields for key in f}
+    columns = {key: np.array([f.get(key, False) for f in fields]) for key in keys}
+
+    mask = filter_mask(columns, len(fields), filters)
+
+    assert mask.tolist() == [matches_filters(f, filters) for f in fields]
@@ -0,0 +1,39 @@
+import pytest
+from app.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+def catalog() -> BM25Index:
+    index = BM25Index()
+    index.add("java", "Core Java programming test for Java developers")
+    index.add("cpp", "C++ programming test")
+    index.add("sales", "Sales personality questionnaire")
+    return index
+
+def test_tokenize_keeps_skill_tokens():
+    assert tokenize("C++, C# and SQL; a b") == ["c++", "c#", "and", "sql"]
+
+def test_bm25_ranks_term_matches_and_omits_the_rest():
+    results = catalog().search("java programming", top_k=5)
+    assert [doc_id for doc_id, _ in results] == ["java", "cpp"]
+    assert results[0][1] > results[1][1] > 0
+
+def test_bm25_replace_remove_and_filter():
+    index = catalog()
+    index.add("sales", "Java sales engineer")  # Replaces the old text
+    assert {doc_id for doc_id, _ in index.search("personality", top_k=5)} == set()
+    assert "sales" in {doc_id for doc_id, _ in index.search("java", top_k=5)}
+
+    index.remove("java")
+    assert len(index) == 2 and "java" not in index
+    assert [doc_id for doc_id, _ in index.search("java", top_k=5)] == ["sales"]
+    assert index.search("java", top_k=5, allowed=lambda doc_id: doc_id != "sales") == []
+
+def test_rrf_gives_one_to_a_document_ranked_first_everywhere():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["a", "c"]], weights=[1.0, 1.0], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+    assert fused[0][1] == pytest.approx(1.0)
+    assert all(0 < score < 1 for _, score in fused[1:])
+
+def test_rrf_weights_decide_between_disagreeing_rankings():
+    rankings = [["dense"], ["lexical"]]
+    assert reciprocal_rank_fusion(rankings, weights=[2.0, 1.0])[0][0] == "dense"
+    assert reciprocal_rank_fusion(rankings, weights=[1.0, 2.0])[0][0] == "lexical"
@@ -0,0 +1,22 @@
+import pytest
+from pydantic import ValidationError
+from app.config import settings
+from app.models import BatchQuery, Query
+
+@pytest.mark.parametrize("top_k", [0, -1, None, settings.max_candidates + 1])
+def test_query_rejects_invalid_top_k(top_k):
+    with pytest.raises(ValidationError):
+        Query(query="java developer", top_k=top_k)
+
+def test_query_accepts_top_k_up_to_max_candidates():
+    assert Query(query="java developer").top_k == 5
+    assert Query(query="java developer", top_k=settings.max_candidates).top_k == settings.max_candidates
+
+def test_batch_with_invalid_top_k_is_rejected_before_running():
+    with pytest.raises(ValidationError):
+        BatchQuery(queries=[{"query": "java developer"}, {"query": "sales", "top_k": 0}])
+
+def test_query_requires_query_or_url():
+    with pytest.raises(ValidationError):
+        Query(query="  ")
+    assert Query(url="https://example.com/job").query is None
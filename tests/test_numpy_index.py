@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from app.numpy_index import NumpyIndex
+
+N_ROWS, DIM, TOP_K = 2000, 64, 10
+
+def corpus():
+    rng = np.random.default_rng(0)
+    return [f"doc{i}" for i in range(N_ROWS)], rng.normal(size=(N_ROWS, DIM)), rng.normal(size=(20, DIM))
+
+def exact_top_k(embeddings, queries):
+    matrix = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return [set(np.argsort(-row)[:TOP_K]) for row in queries @ matrix.T]
+
+def test_float32_matches_exact_search():
+    ids, embeddings, queries = corpus()
+    results = NumpyIndex("float32").build(ids, embeddings).search(queries, TOP_K)
+    assert [{int(doc_id[3:]) for doc_id, _ in hits} for hits in results] == exact_top_k(embeddings, queries)
+    assert all(scores == sorted(scores, reverse=True) for scores in ([s for _, s in hits] for hits in results))
+
+@pytest.mark.parametrize("dtype, min_recall", [("float16", 0.99), ("int8", 0.9)])
+def test_quantized_recall_against_exact_search(dtype, min_recall):
+    ids, embeddings, queries = corpus()
+    index = NumpyIndex(dtype).build(ids, embeddings)
+    results = index.search(queries, TOP_K)
+
+    found = sum(len({int(doc_id[3:]) for doc_id, _ in hits} & exact) for hits, exact in
+                zip(results, exact_top_k(embeddings, queries)))
+    assert found / (len(queries) * TOP_K) >= min_recall
+    assert index.nbytes < NumpyIndex("float32").build(ids, embeddings).nbytes
+
+def test_mask_excludes_rows():
+    ids, embeddings, queries = corpus()
+    mask = np.arange(N_ROWS) % 2 == 0
+    results = NumpyIndex().build(ids, embeddings).search(queries, TOP_K, mask=mask)
+    assert all(int(doc_id[3:]) % 2 == 0 for hits in results for doc_id, _ in hits)
+
+def test_unknown_dtype():
+    with pytest.raises(ValueError, match="Unsupported dtype"):
+        NumpyIndex("int4")
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_saved_index_loads_memory_mapped(tmp_path, dtype):
+    ids, embeddings, queries = corpus()
+    fields = [{"duration_max": i % 90, "is_remote": i % 3 == 0} for i in range(N_ROWS)]
+    index = NumpyIndex(dtype).build(ids, embeddings, fields)
+    index.save(tmp_path / "snapshot")
+
+    loaded = NumpyIndex.load(tmp_path / "snapshot")
+
+    assert isinstance(loaded.matrix, np.memmap) and not loaded.matrix.flags.writeable
+    assert loaded.ids == ids
+    assert loaded.columns.keys() == index.columns.keys()
+    assert loaded.search(queries, TOP_K, mask=loaded.columns["is_remote"]) == \
+        index.search(queries, TOP_K, mask=index.columns["is_remote"])
@@ -0,0 +1,137 @@
+import asyncio
+import time
+import pytest
+from app.config import settings
+from app.fake_llm import FakeGenerativeModel
+from app.llm import GeminiProcessor
+from app.resilience import CircuitBreaker, CircuitOpen, retry_async
+
+COOLDOWN = 0.05
+
+def failing_breaker(**kwargs) -> CircuitBreaker:
+    """A breaker that has just opened after min_calls failures"""
+    breaker = CircuitBreaker("test", window=4, failure_ratio=0.5, min_calls=4, cooldown=COOLDOWN, **kwargs)
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record(False)
+    return breaker
+
+def test_breaker_stays_closed_below_min_calls():
+    breaker = CircuitBreaker("test", window=4, failure_ratio=0.5, min_calls=4)
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+def test_breaker_stays_closed_below_failure_ratio():
+    breaker = CircuitBreaker("test", window=4, failure_ratio=0.5, min_calls=4)
+    for success in (True, True, True, False):
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_breaker_opens_and_refuses_during_cooldown():
+    breaker = failing_breaker()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_breaker_half_open_allows_a_single_probe():
+    breaker = failing_breaker()
+    time.sleep(COOLDOWN * 1.5)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # The probe is still out
+
+def test_breaker_closes_after_successful_probe():
+    breaker = failing_breaker()
+    time.sleep(COOLDOWN * 1.5)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    # The failures from before the outage no longer count
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_breaker_reopens_after_failed_probe():
+    breaker = failing_breaker()
+    time.sleep(COOLDOWN * 1.5)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_breaker_ignores_late_results_while_open():
+    breaker = failing_breaker()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_retry_stops_after_the_attempt_limit():
+    calls, retried = [], []
+
+    async def fail():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(retry_async(fail, attempts=3, base_delay=0, max_delay=0,
+                                retryable=(ConnectionError,), on_retry=retried.append))
+    assert len(calls) == 3
+    assert len(retried) == 2
+
+def test_retry_returns_first_success():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("down")
+        return "ok"
+
+    assert asyncio.run(retry_async(flaky, attempts=3, base_delay=0, max_delay=0, retryable=(ConnectionError,))) == "ok"
+    assert len(calls) == 3
+
+def test_retry_raises_non_retryable_errors_at_once():
+    calls = []
+
+    async def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(retry_async(broken, attempts=3, base_delay=0, max_delay=0, retryable=(ConnectionError,)))
+    assert len(calls) == 1
+
+@pytest.fixture
+def llm_settings(monkeypatch):
+    monkeypatch.setattr(settings, "rerank_cache_enabled", False)
+    monkeypatch.setattr(settings, "llm_batching", False)
+    monkeypatch.setattr(settings, "llm_hedging", False)
+    monkeypatch.setattr(settings, "llm_max_retries", 2)
+    monkeypatch.setattr(settings, "llm_retry_base_delay", 0)
+    monkeypatch.setattr(settings, "llm_breaker_window", 4)
+    monkeypatch.setattr(settings, "llm_breaker_min_calls", 4)
+    monkeypatch.setattr(settings, "llm_breaker_cooldown", 60)
+    return settings
+
+def test_gemini_retries_transient_errors_up_to_the_limit(llm_settings):
+    model = FakeGenerativeModel(latency_ms=0, error_rate=1.0, seed=0)
+    processor = GeminiProcessor(model=model)
+    with pytest.raises(ConnectionError):
+        asyncio.run(processor._generate_async("prompt", {}))
+    assert model.calls == llm_settings.llm_max_retries + 1
+
+def test_gemini_skips_the_model_once_the_breaker_opens(llm_settings):
+    model = FakeGenerativeModel(latency_ms=0, error_rate=1.0, seed=0)
+    processor = GeminiProcessor(model=model)
+
+    async def run():
+        for _ in range(2):  # 2 x 3 attempts fail, the 4th failure opens the breaker
+            with pytest.raises((ConnectionError, CircuitOpen)):
+                await processor._generate_async("prompt", {})
+        calls = model.calls
+        with pytest.raises(CircuitOpen):
+            await processor._generate_async("prompt", {})
+        return calls
+
+    calls = asyncio.run(run())
+    assert processor.breaker.state == CircuitBreaker.OPEN
+    assert model.calls == calls == 4
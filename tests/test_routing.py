@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from app.models import Assessment
+from app.pipeline import RecommendationPipeline
+from app.routing import RerankGate, calibrate, confidence_features
+
+TOP_K, CANDIDATE_K = 3, 6
+DECISIVE = [0.9, 0.85, 0.8, 0.5, 0.45, 0.4]  # Clear gap after the top 3
+HEAD_ONLY = [0.9, 0.6, 0.59, 0.58, 0.57, 0.56]  # Only the first one stands out
+FLAT = [0.5, 0.5, 0.5, 0.5, 0.5, 0.5]
+
+def test_confidence_features():
+    features = confidence_features(DECISIVE, TOP_K, "java developer", CANDIDATE_K)
+    assert features["margin"] == pytest.approx(0.3 / 0.9)
+    assert 0 < features["entropy"] < confidence_features(FLAT, TOP_K, "java", CANDIDATE_K)["entropy"] == pytest.approx(1)
+    assert (features["query_words"], features["coverage"]) == (2, 1.0)
+
+@pytest.mark.parametrize("scores, query, expected", [
+    (DECISIVE, "java developer", ("skip", 0)),
+    (HEAD_ONLY, "java developer", ("shrink", 1)),
+    (FLAT, "java developer", ("full", 0)),
+    (DECISIVE, " ".join(["word"] * 20), ("shrink", 2)),  # Long queries always go to the reranker
+    (FLAT[:TOP_K], "java developer", ("skip", 0)),  # Filters left only top_k candidates
+])
+def test_gate_routes(scores, query, expected):
+    assert RerankGate().route(query, scores, TOP_K, CANDIDATE_K) == expected
+
+def test_gate_without_shrink_reranks_fully():
+    assert RerankGate(shrink=False).route("java developer", HEAD_ONLY, TOP_K, CANDIDATE_K) == ("full", 0)
+
+def test_calibrate_skips_only_where_precision_holds():
+    confident = {"margin": 0.3, "entropy": 0.2, "query_words": 2, "coverage": 1.0}
+    unsure = {"margin": 0.0, "entropy": 0.9, "query_words": 30, "coverage": 1.0}
+    samples = [{"features": confident, "first": 1.0, "reranked": 1.0},
+               {"features": unsure, "first": 0.0, "reranked": 1.0}]
+    result = calibrate(samples)
+    assert result["skip_rate"] == 0.5
+    assert result["precision_gated"] == result["precision_reranked"] == 1.0
+
+class StubVectorDB:
+    def __init__(self, scores):
+        self.scores = scores
+
+    def search(self, query, top_k, filters=None, search_ef=None):
+        return [
+            Assessment(url=f"https://example.com/{i}", name=f"Assessment {i}", adaptive_support=False,
+                       description=f"assessment {i}", duration="20 minutes", remote_support=True,
+                       test_type=["Knowledge & Skills"], score=score)
+            for i, score in enumerate(self.scores[:top_k])
+        ]
+
+class RecordingReranker:
+    """Reverses the candidates it gets and remembers them"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def refine_recommendations_async(self, query, assessments, top_k=None):
+        self.calls.append([a.url for a in assessments])
+        return list(reversed(assessments))[:top_k]
+
+@pytest.mark.parametrize("scores, reranked, expected", [
+    (DECISIVE, [], [0, 1, 2]),
+    (HEAD_ONLY, [[1, 2, 3, 4]], [0, 4, 3]),  # Reranks candidate_k(2) candidates after the pinned head
+    (FLAT, [[0, 1, 2, 3, 4, 5]], [5, 4, 3]),
+])
+def test_pipeline_follows_the_route(scores, reranked, expected):
+    reranker = RecordingReranker()
+    pipeline = RecommendationPipeline(StubVectorDB(scores), reranker, max_candidates=CANDIDATE_K,
+                                      rerank_gate=RerankGate())
+    try:
+        results = asyncio.run(pipeline.recommend("java developer", top_k=TOP_K))
+    finally:
+        pipeline.shutdown()
+
+    assert reranker.calls == [[f"https://example.com/{i}" for i in call] for call in reranked]
+    assert [a.url for a in results] == [f"https://example.com/{i}" for i in expected]
@@ -0,0 +1,41 @@
+import json
+import pytest
+from app.models import Assessment, BatchRecommendationResponse, RecommendationResponse
+from app.serialization import batch_response, recommendations_json, stream_event, with_json_prefix
+
+def catalog():
+    return [
+        with_json_prefix(Assessment(
+            url="https://example.com/java", name="Core Java (Entry Level)", adaptive_support=False,
+            description='Java 8 "basics" – syntax, OOP & collections', duration="30 minutes",
+            remote_support=True, test_type=["Knowledge & Skills"]
+        )),
+        with_json_prefix(Assessment(
+            url="https://example.com/opq", name="OPQ32r", adaptive_support=True, description="Personality",
+            duration="N/A", remote_support=False, test_type=["Personality & Behavior", "Competencies"]
+        )),
+    ]
+
+@pytest.mark.parametrize("scores", [[None, None], [0.8731, 0.1], [1.0, -0.25]])
+def test_prefix_encoding_matches_model_dump_json(scores):
+    # Scored copies, as search and the rerankers return them, keep the prefix
+    assessments = [a.model_copy(update={"score": score}) for a, score in zip(catalog(), scores)]
+    assert all(a._json_prefix is not None for a in assessments)
+
+    expected = RecommendationResponse(recommendations=assessments).model_dump_json().encode()
+
+    assert recommendations_json(assessments) == expected
+
+def test_assessment_without_prefix_is_encoded_in_full():
+    assessment = catalog()[0].model_copy(update={"score": 0.5, "name": "Renamed"})
+    assessment._json_prefix = None
+    assert recommendations_json([assessment]) == RecommendationResponse(recommendations=[assessment]).model_dump_json().encode()
+
+def test_batch_and_stream_bodies():
+    results = [catalog(), []]
+    assert batch_response(results).body == BatchRecommendationResponse(
+        results=[RecommendationResponse(recommendations=r) for r in results]
+    ).model_dump_json().encode()
+
+    event = json.loads(stream_event("candidates", catalog()))
+    assert event == {"event": "candidates", **RecommendationResponse(recommendations=catalog()).model_dump(mode="json")}
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+import pytest
+import app.database as database
+import app.main as main
+import app.rerankers as rerankers
+from app.config import settings
+from app.pipeline import RecommendationPipeline, build_pipeline
+
+class ClosingComponent:
+    """Vector DB and reranker stand-in that records close()"""
+
+    def __init__(self, *args, **kwargs):
+        self.closed = False
+
+    def search(self, query, top_k, filters=None, search_ef=None):
+        raise ConnectionError("catalog unavailable")
+
+    def close(self):
+        self.closed = True
+
+def starting_app():
+    return SimpleNamespace(state=SimpleNamespace(startup={"status": "starting", "warmup_seconds": None}))
+
+def test_failed_warmup_shuts_down_the_pipeline_it_built(monkeypatch):
+    built = []
+
+    def fake_build_pipeline(settings):
+        built.append(RecommendationPipeline(ClosingComponent(), ClosingComponent()))
+        return built[-1]
+
+    monkeypatch.setattr(settings, "warmup_query", "java developer")
+    monkeypatch.setattr(main, "build_pipeline", fake_build_pipeline)
+    app = starting_app()
+
+    with pytest.raises(ConnectionError):
+        main._load_components(app)
+
+    (pipeline,) = built
+    assert pipeline.vector_db.closed and pipeline.reranker.closed
+    assert pipeline._search_executor._shutdown
+    assert app.state.startup["status"] == "failed"
+    assert not hasattr(app.state, "pipeline")
+
+def test_build_pipeline_closes_the_vector_db_when_the_reranker_fails(monkeypatch):
+    vector_dbs = []
+
+    def failing_reranker(settings):
+        raise RuntimeError("no reranker")
+
+    monkeypatch.setattr(database, "VectorDB", lambda **kwargs: vector_dbs.append(ClosingComponent()) or vector_dbs[-1])
+    monkeypatch.setattr(rerankers, "create_reranker", failing_reranker)
+
+    with pytest.raises(RuntimeError, match="no reranker"):
+        build_pipeline(settings)
+    assert [vector_db.closed for vector_db in vector_dbs] == [True]
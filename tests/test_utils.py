@@ -0,0 +1,23 @@
+import pytest
+from app.utils import html_to_text
+
+def test_drops_scripts_navigation_and_footers():
+    html = (
+        "<html><head><style>p { color: red }</style></head><body>"
+        "<nav><a href='/'>Home</a></nav><h1>Python developer</h1><p>Remote &amp; hybrid</p>"
+        "<script>if (a < b) track();</script><footer><p>Cookies</p></footer></body></html>"
+    )
+    assert html_to_text(html) == "Python developer\nRemote & hybrid"
+
+@pytest.mark.parametrize("html", [
+    "<html><body><p>Before</p><script>var x = 1;<p>Python developer</p></body></html>",
+    "<p>Before</p><style>p { color: red }<p>Python developer</p>",
+    "<p>Before</p><noscript><p>Enable JavaScript<p>Python developer</p>",
+])
+def test_unclosed_skipped_element_keeps_the_rest_of_the_page(html):
+    assert html_to_text(html).endswith("Python developer")
+    assert html_to_text(html).startswith("Before")
+
+def test_unclosed_skipped_element_ends_with_its_parent():
+    html = "<div><p>Before</p><nav><a href='/'>Home</a></div><p>Python developer</p>"
+    assert html_to_text(html) == "Before\nPython developer"
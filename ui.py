@@ -1,9 +1,99 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+import asyncio
 import json
+import os
+import threading
+import time
 
 # Configuration
-FASTAPI_URL = "http://localhost:8000"
+# UI_MODE=http calls the API at FASTAPI_URL; UI_MODE=inprocess runs the recommendation
+# pipeline inside the Streamlit process (no API server, no HTTP hop)
+UI_MODE = os.getenv("UI_MODE", "http")
+FASTAPI_URL = os.getenv("FASTAPI_URL", "http://localhost:8000")
+CACHE_TTL = int(os.getenv("UI_CACHE_TTL", "600"))  # Seconds a (query, top_k) result is reused
+CONNECT_TIMEOUT = float(os.getenv("UI_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("UI_READ_TIMEOUT", "60"))  # Max gap between streamed events
+
+
+class APIError(Exception):
+    """The recommendation API answered with an error"""
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """One keep-alive connection pool shared by all sessions and reruns"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource(show_spinner="Loading the recommendation pipeline...")
+def inprocess_pipeline():
+    """The pipeline and the event loop it runs on, built once per process"""
+    # Heavy imports happen only in in-process mode
+    from app.config import settings
+    from app.pipeline import build_pipeline
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="pipeline-loop", daemon=True).start()
+    pipeline = build_pipeline(settings)
+    if settings.warmup_query:
+        pipeline.vector_db.search(settings.warmup_query, top_k=pipeline.candidate_k(5))
+    return pipeline, loop
+
+def results_cache_key(query: str, top_k: int) -> tuple:
+    """Key of the session's results cache; entries lapse when the CACHE_TTL time bucket changes"""
+    return query, top_k, int(time.time() // CACHE_TTL)
+
+def store_results(key: tuple, results: list):
+    """Keep the final recommendations for this session, dropping those from past time buckets"""
+    cache = st.session_state.setdefault("results_cache", {})
+    for stale in [k for k in cache if k[2] != key[2]]:
+        del cache[stale]
+    cache[key] = results
+
+def stream_http(query: str, top_k: int):
+    """(event, recommendations) pairs from the streaming endpoint"""
+    with http_session().post(
+        f"{FASTAPI_URL}/recommend/stream",
+        json={"query": query, "top_k": top_k},
+        stream=True,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+    ) as response:
+        if response.status_code != 200:
+            raise APIError(response.text)
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["event"] == "error":
+                raise APIError(event.get("detail"))
+            yield event["event"], event["recommendations"]
+
+def stream_inprocess(query: str, top_k: int):
+    """(event, recommendations) pairs straight from RecommendationPipeline.recommend_stream"""
+    pipeline, loop = inprocess_pipeline()
+    events = pipeline.recommend_stream(query, top_k=top_k)
+    try:
+        while True:
+            step = asyncio.run_coroutine_threadsafe(events.__anext__(), loop)
+            try:
+                event, assessments = step.result(READ_TIMEOUT)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                step.cancel()
+                raise
+            yield event, [assessment.model_dump() for assessment in assessments]
+    finally:
+        asyncio.run_coroutine_threadsafe(events.aclose(), loop)
+
+stream_recommendations = stream_inprocess if UI_MODE == "inprocess" else stream_http
+if UI_MODE == "inprocess":
+    inprocess_pipeline()  # Load on first page view rather than on the first query
 
 # UI Setup
 st.set_page_config(page_title="SHL Assessment Recommender", layout="wide")
@@ -19,39 +109,51 @@ with st.form("recommendation_form"):
     top_k = st.slider("Number of recommendations:", 1, 10, 5)
     submitted = st.form_submit_button("Get Recommendations")
 
+def render_results(container, results, preliminary=False):
+    """Draw the recommendation list into a placeholder, replacing what was there"""
+    with container.container():
+        if preliminary:
+            st.subheader("Top Matches")
+            st.caption("Refining with the reranker...")
+        else:
+            st.subheader("Recommended Assessments")
+        for i, assessment in enumerate(results, 1):
+            with st.expander(f"#{i}: {assessment['name']}"):
+                cols = st.columns([1,3])
+                with cols[0]:
+                    st.markdown(f"**Score:** {assessment['score']:.2f}")
+                    st.markdown(f"**Duration:** {assessment['duration']}")
+                    st.markdown(f"**Remote:** {'✅' if assessment['remote_support'] else '❌'}")
+                    st.markdown(f"**Adaptive:** {'✅' if assessment['adaptive_support'] else '❌'}")
+                    st.markdown(f"**Types:** {', '.join(assessment['test_type'])}")
+                
+                with cols[1]:
+                    st.markdown(f"**Description:** {assessment['description']}")
+                    st.markdown(f"[View Assessment]({assessment['url']})")
+        
+        if not preliminary:
+            # Additional visual feedback
+            st.success(f"Found {len(results)} recommendations!")
+
 if submitted and query:
-    with st.spinner("Finding the best assessments..."):
+    placeholder = st.empty()
+    cache_key = results_cache_key(query, top_k)
+    cached = st.session_state.get("results_cache", {}).get(cache_key)
+    if cached is not None:
+        render_results(placeholder, cached)
+    else:
+        # Stream: first-stage matches render as soon as retrieval is done,
+        # then get replaced by the reranked list
+        placeholder.info("Finding the best assessments...")
         try:
-            response = requests.post(
-                f"{FASTAPI_URL}/recommend",
-                json={"query": query, "top_k": top_k}
-            )
-            
-            if response.status_code == 200:
-                results = response.json()["recommendations"]
-                
-                # Display results in a clean table
-                st.subheader("Recommended Assessments")
-                for i, assessment in enumerate(results, 1):
-                    with st.expander(f"#{i}: {assessment['name']}"):
-                        cols = st.columns([1,3])
-                        with cols[0]:
-                            st.markdown(f"**Score:** {assessment['score']:.2f}")
-                            st.markdown(f"**Duration:** {assessment['duration']}")
-                            st.markdown(f"**Remote:** {'✅' if assessment['remote_support'] else '❌'}")
-                            st.markdown(f"**Adaptive:** {'✅' if assessment['adaptive_support'] else '❌'}")
-                            st.markdown(f"**Types:** {', '.join(assessment['test_type'])}")
-                        
-                        with cols[1]:
-                            st.markdown(f"**Description:** {assessment['description']}")
-                            st.markdown(f"[View Assessment]({assessment['url']})")
-                
-                # Additional visual feedback
-                st.success(f"Found {len(results)} recommendations!")
-                
-            else:
-                st.error(f"API Error: {response.text}")
-                
+            for event, recommendations in stream_recommendations(query, top_k):
+                if event == "candidates":
+                    render_results(placeholder, recommendations, preliminary=True)
+                elif event == "refined":
+                    render_results(placeholder, recommendations)
+                    store_results(cache_key, recommendations)
+        except APIError as e:
+            placeholder.error(f"API Error: {str(e)}")
         except Exception as e:
             st.error(f"Failed to get recommendations: {str(e)}")
 